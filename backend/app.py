@@ -1,11 +1,13 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, send_file
 from flask_cors import CORS
 from pymongo import MongoClient
 from werkzeug.security import generate_password_hash, check_password_hash
 from bson.objectid import ObjectId
-from pathlib import Path
 import datetime, jwt, os
 
+from utils.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, render as render_metrics
+from utils.telemetry import configure_logging, instrument_app
+
 # ---------- ENV CONFIG ----------
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 JWT_SECRET = os.getenv("JWT_SECRET", "SUPERSECRETKEY")
@@ -14,6 +16,8 @@ JWT_ALGO = "HS256"
 # ---------- FLASK ----------
 app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origins": "*"}})
+configure_logging()
+instrument_app(app)
 
 # ---------- MONGO ----------
 client = MongoClient(MONGO_URI)
@@ -84,51 +88,288 @@ def me():
 
 
 # ---------- ML MODELS ----------
-from ml.model0_load_data import load_tracking, load_match_metadata
-from ml.model1 import run_model1
-from ml.model2_real import run as run_model2
-from ml.model3_fixed import run_model3
+from config import Config
+import numpy as np
+
+from ml.match_store import cache_stats, get_match_metadata, get_events, get_tracking
+from ml.events import get_event_join, positions_around, events_around_frame
+from ml.match_registry import discover_matches, match_summary, require_match
+from ml.model0_load_data import MATCH_ID
+from ml.phases import get_phase_index, resolve_filter, FILTER_COLUMNS
+from utils.analysis_runner import run_queued, submit_analysis, inflight, reduce_result, plot_file, series_window
+from utils.jobs import jobs, JobCancelled, QueueFull
+from utils.profiling import ProfilerBusy
+from utils.result_cache import results
+
+
+def wants_async():
+    return request.args.get("async", "").lower() in ("1", "true", "yes")
+
+
+def wants_profile():
+    flag = request.headers.get("X-Profile") or request.args.get("profile") or ""
+    return flag.lower() in ("1", "true", "yes")
+
+
+def is_admin():
+    uid = verify_token(request)
+    if not uid or not Config.ADMIN_EMAILS:
+        return False
+    user = users.find_one({"_id": ObjectId(uid)})
+    return user is not None and user["email"] in Config.ADMIN_EMAILS
+
+
+def enqueue(kind, data, profile=False):
+    try:
+        job = submit_analysis(kind, data, profile)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except QueueFull as e:
+        return jsonify({"message": str(e)}), 429
+    return jsonify({
+        "message": "Analysis queued",
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/api/analysis/jobs/{job.id}",
+    }), 202
+
+
+def max_points_arg():
+    """?max_points= for per-frame series, Config.SERIES_MAX_POINTS when absent
+    (the full resolution is served by the series route)."""
+    value = request.args.get("max_points")
+    if value is None:
+        return Config.SERIES_MAX_POINTS
+    if not value.isdigit() or int(value) < 2:
+        raise ValueError("max_points must be an integer >= 2")
+    return int(value)
+
+
+def match_arg():
+    """?match_id= of a GET route (the default match when absent); ValueError if unknown."""
+    return require_match(request.args.get("match_id") or MATCH_ID)
+
+
+def respond(kind):
+    data = request.get_json(silent=True) or {}
+    profile = wants_profile()
+    if profile and not is_admin():
+        return jsonify({"message": "Profiling is restricted to admins"}), 403
+    if wants_async():
+        return enqueue(kind, data, profile)
+    try:
+        max_points = max_points_arg()
+        return jsonify(reduce_result(run_queued(kind, data, profile), max_points))
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except QueueFull as e:
+        return jsonify({"message": str(e)}), 429
+    except ProfilerBusy as e:
+        return jsonify({"message": str(e)}), 409
+    except JobCancelled:
+        return jsonify({"message": "Analysis cancelled"}), 409
+    except Exception:
+        app.logger.exception("%s analysis failed", kind)
+        return jsonify({"message": "Analysis failed"}), 500
 
 
 @app.post("/api/analysis/tactical-shape")
 def tactical_shape():
-    frames = load_tracking()
-    meta = load_match_metadata()
-    run_model1(frames, meta, "outputs/model1")
-    return jsonify({"message": "Model 1 complete", "folder": "/outputs/model1"})
+    return respond("tactical-shape")
 
 
 @app.post("/api/analysis/player-performance")
 def player_performance():
-    run_model2()  # model2_real already loads data & writes to model2_output_team
-    return jsonify({
-        "message": "Model 2 complete",
-        "output_folder": "/model2_output_team"
-    })
+    return respond("player-performance")
 
 
 @app.post("/api/analysis/pitch-control")
 def pitch_control():
-    frames = load_tracking()
-    meta = load_match_metadata()
-    run_model3(frames, meta, "outputs/model3")
-    return jsonify({"message": "Model 3 complete", "folder": "/outputs/model3"})
+    return respond("pitch-control")
+
+
+@app.post("/api/analysis/batch")
+def analysis_batch():
+    return respond("batch")
+
+
+@app.post("/api/analysis/season")
+def analysis_season():
+    """Model 2 over many matches (body: match_ids, default all) with per-player season totals."""
+    return respond("season")
+
+
+@app.get("/api/analysis/matches")
+def analysis_matches():
+    matches = []
+    for match_id, files in discover_matches().items():
+        meta = get_match_metadata(match_id) if "match" in files else None
+        matches.append(match_summary(match_id, files, meta))
+    return jsonify({"default": MATCH_ID, "matches": matches})
+
+
+@app.get("/api/analysis/results/<key>")
+def analysis_result(key):
+    try:
+        max_points = max_points_arg()
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    result = results.get(key)
+    if result is None:
+        return jsonify({"message": "Result not found"}), 404
+    return jsonify(reduce_result(result, max_points))
+
+
+@app.get("/api/analysis/results/<key>/series/<name>")
+def analysis_series(key, name):
+    start = request.args.get("start", type=float)
+    end = request.args.get("end", type=float)
+    points = min(max(request.args.get("points", 500, type=int), 3), 5000)
+    if start is not None and end is not None and start > end:
+        return jsonify({"message": "start must not be after end"}), 400
+    window = series_window(key, name, start, end, points)
+    if window is None:
+        return jsonify({"message": "Series not found"}), 404
+    return jsonify(window)
+
+
+@app.get("/api/analysis/results/<key>/plots/<path:name>")
+def analysis_plot(key, name):
+    path = plot_file(key, name)
+    if path is None:
+        return jsonify({"message": "Plot not found"}), 404
+    results.artifacts.touch(path.relative_to(results.artifacts.root).as_posix())
+    return send_file(path, mimetype="image/png")
+
+
+@app.get("/api/analysis/phases")
+def analysis_phases():
+    """Phase at ?frame=N, or the frame ranges matching a phase filter given as query args."""
+    try:
+        match_id = match_arg()
+        index = get_phase_index(match_id)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except FileNotFoundError:
+        return jsonify({"message": "No phases of play for this match"}), 404
+    frame = request.args.get("frame", type=int)
+    if frame is not None:
+        return jsonify({"frame": frame, "phase": index.phase_at(frame)})
+    try:
+        phase_filter = resolve_filter({k: request.args.getlist(k) for k in FILTER_COLUMNS if k in request.args},
+                                      get_match_metadata(match_id))
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    ranges = index.ranges(**(phase_filter or {}))
+    return jsonify({"filter": phase_filter, "n_frames": int((ranges[:, 1] - ranges[:, 0] + 1).sum()),
+                    "ranges": ranges.tolist()})
+
+
+@app.get("/api/analysis/events/positions")
+def event_positions():
+    """Positions around every event of ?event_type= at offsets from -before to +after seconds."""
+    before = request.args.get("before", 0.0, type=float)
+    after = request.args.get("after", 0.0, type=float)
+    step = request.args.get("step", 1.0, type=float)
+    if before < 0 or after < 0 or step <= 0 or (before + after) / step > 100:
+        return jsonify({"message": "need before, after >= 0, step > 0 and at most 100 offsets"}), 400
+    offsets = np.round(np.arange(-before, after + step / 2, step), 3).tolist()
+    limit = request.args.get("limit", Config.EVENT_POSITIONS_MAX_EVENTS, type=int)
+    if limit < 1:
+        return jsonify({"message": "limit must be at least 1"}), 400
+    limit = min(limit, Config.EVENT_POSITIONS_MAX_EVENTS, max(1, Config.EVENT_POSITIONS_MAX_SNAPSHOTS // len(offsets)))
+    try:
+        match_id = match_arg()
+        join = get_event_join(get_events(match_id), get_tracking(match_id))
+        return jsonify(positions_around(join, request.args.getlist("event_type") or None, offsets,
+                                        request.args.get("tolerance", 0.5, type=float), limit))
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except FileNotFoundError:
+        return jsonify({"message": "No dynamic events for this match"}), 404
+    except KeyError as e:
+        return jsonify({"message": f"Events have no column {e}"}), 400
+
+
+@app.get("/api/analysis/events/near")
+def events_near_frame():
+    frame = request.args.get("frame", type=int)
+    if frame is None:
+        return jsonify({"message": "frame is required"}), 400
+    try:
+        match_id = match_arg()
+        join = get_event_join(get_events(match_id), get_tracking(match_id))
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    except FileNotFoundError:
+        return jsonify({"message": "No dynamic events for this match"}), 404
+    result = events_around_frame(join, frame, request.args.get("window", 5.0, type=float))
+    if result is None:
+        return jsonify({"message": "Frame not found"}), 404
+    return jsonify(result)
+
+
+@app.post("/api/analysis/jobs")
+def create_analysis_job():
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"message": "Request body must be an object"}), 400
+    return enqueue(data.get("model"), data.get("params"))
+
+
+@app.get("/api/analysis/jobs/<job_id>")
+def analysis_job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"message": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+
+@app.delete("/api/analysis/jobs/<job_id>")
+def cancel_analysis_job(job_id):
+    job = jobs.cancel(job_id)
+    if job is None:
+        return jsonify({"message": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+
+@app.get("/api/analysis/cache")
+def analysis_cache():
+    return jsonify({"matches": cache_stats(), "results": results.stats(), "coalescing": inflight.stats()})
+
+
+@app.delete("/api/analysis/cache/results")
+def invalidate_results():
+    if not is_admin():
+        return jsonify({"message": "Clearing cached results is restricted to admins"}), 403
+    removed = results.invalidate(request.args.get("model"))
+    return jsonify({"message": "Cached results removed", "removed": removed})
 
 
 # ---------- STATIC IMAGE ROUTES (IMPORTANT) ----------
-@app.route("/model2_output_team/<path:filename>")
-def serve_player_performance_output(filename):
-    return send_from_directory("model2_output_team", filename)
+@app.route("/outputs/<path:filename>")
+def serve_analysis_output(filename):
+    return send_from_directory(Config.OUTPUT_DIR, filename)
+
+
+@app.route("/artifacts/<path:name>")
+def serve_artifact(name):
+    response = send_from_directory(results.artifacts.root, name)
+    results.artifacts.touch(name)
+    return response
 
 
 @app.get("/api/analysis/player-performance/images")
 def get_player_performance_graphs():
-    folder = Path("model2_output_team")
-    images = []
-    for img in folder.rglob("*.png"):
-        rel = img.relative_to(folder)
-        images.append("/model2_output_team/" + str(rel).replace("\\", "/"))
-    return jsonify({"images": images})
+    latest = results.latest("player-performance")
+    return jsonify({"images": latest["files"] if latest else []})
+
+
+# ---------- METRICS ----------
+@app.get("/metrics")
+def metrics():
+    """Prometheus text format: stage timings, frames, bytes, caches, job queue, route latency."""
+    return app.response_class(render_metrics(), content_type=METRICS_CONTENT_TYPE)
 
 
 # ---------- MAIN ----------
@@ -0,0 +1,62 @@
+"""Tracking JSONL decoding throughput, per decoder backend.
+
+    cd backend && python -m benchmarks.json_decoders [--file PATH] [--repeat 3]
+
+Prints lines/s and MB/s for the old line-by-line stdlib loop and, for every
+installed backend, iter_frames with full and projected frames (block split
+for orjson, text lines for the stdlib).
+"""
+import argparse
+import json
+import os
+import time
+
+from ml.model0_load_data import TRACKING_FILE
+from ml.tracking_json import BACKENDS, iter_frames
+
+
+def line_loop(path):
+    # the loader before tracking_json: text mode, strip, json.loads per line
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def cases():
+    yield "stdlib line loop", line_loop
+    for name in BACKENDS:
+        yield f"{name} iter_frames", lambda path, name=name: iter_frames(path, name, project=False)
+        yield f"{name} iter_frames + projection", lambda path, name=name: iter_frames(path, name, project=True)
+
+
+def measure(read, path, repeat):
+    """Best of repeat runs: (seconds, lines)."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        n = sum(1 for _ in read(path))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--file", default=str(TRACKING_FILE))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    size_mb = os.path.getsize(args.file) / 1e6
+    print(f"{args.file} ({size_mb:.1f} MB), best of {args.repeat}")
+    baseline = None
+    for label, read in cases():
+        seconds, lines = measure(read, args.file, args.repeat)
+        baseline = baseline or seconds
+        print(f"  {label:<32} {lines / seconds:>12,.0f} lines/s {size_mb / seconds:>8.1f} MB/s"
+              f" {baseline / seconds:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
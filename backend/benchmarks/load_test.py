@@ -0,0 +1,274 @@
+"""Load test of the Flask API: throughput and p50/p95/p99 latency per route.
+
+    cd backend && python -m benchmarks.load_test [--mix mixed] [--concurrency 1,4,16]
+                                                 [--duration 20] [--out load.json]
+
+By default the app is booted in this process on a free port, with Mongo
+replaced by mongomock (requirements-dev.txt) and Config.DATA_DIR pointed at a
+scratch folder holding a synthetic match (benchmarks.synthetic) and links to
+the bundled match files. Caches, results and artifacts go to scratch too, so
+nothing under ml/data or outputs is written. --url points the harness
+at a server that is already running instead (its match data and database
+are used as they are).
+
+A mix is a preset (see MIXES) or weights such as "login=1,me=4,tactical-shape=2".
+"""
+import argparse
+import json
+import logging
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import numpy as np
+
+from config import Config
+from ml.model0_load_data import MATCH_FILE, MATCH_ID, match_paths
+
+LOAD_MATCH_ID = "900000001"  # synthetic match written for the run
+N_USERS = 20
+PASSWORD = "load-test-password"
+
+
+# route name -> (method, path, body(ctx, rng)); ctx has match_id and a user/token
+def _analysis(kind, **fixed):
+    return ("POST", f"/api/analysis/{kind}", lambda ctx, rng: dict(fixed, match_id=ctx["match_id"]))
+
+
+ROUTES = {
+    "login": ("POST", "/api/auth/login", lambda ctx, rng: {"email": ctx["email"], "password": PASSWORD}),
+    "me": ("GET", "/api/auth/me", None),
+    "matches": ("GET", "/api/analysis/matches", None),
+    "phases": ("GET", "/api/analysis/phases?match_id={match_id}&frame=1000", None),
+    "tactical-shape": _analysis("tactical-shape", n_minutes=5),
+    "player-performance": _analysis("player-performance"),
+    "pitch-control": _analysis("pitch-control", n_minutes=5),
+    # a different window each time, so every request computes
+    "tactical-shape-uncached": ("POST", "/api/analysis/tactical-shape",
+                                lambda ctx, rng: {"match_id": ctx["match_id"], "n_minutes": rng.randint(1, 600) / 20}),
+}
+
+MIXES = {
+    "auth": {"login": 1, "me": 4},
+    "analysis": {"tactical-shape": 3, "player-performance": 2, "pitch-control": 2, "matches": 1, "phases": 1,
+                 "tactical-shape-uncached": 1},
+    "mixed": {"login": 1, "me": 4, "matches": 1, "tactical-shape": 3, "player-performance": 2,
+              "pitch-control": 2, "phases": 1, "tactical-shape-uncached": 1},
+}
+
+
+def parse_mix(text):
+    if text in MIXES:
+        return MIXES[text]
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ROUTES:
+            raise SystemExit(f"Unknown route {name!r} (have: {', '.join(ROUTES)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+# ------------------------------------------------
+# HTTP
+# ------------------------------------------------
+def call(base_url, method, path, body=None, token=None, timeout=300):
+    """(status, seconds, parsed JSON or None)."""
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(base_url + path, data=data, method=method)
+    if data is not None:
+        req.add_header("Content-Type", "application/json")
+    if token:
+        req.add_header("Authorization", f"Bearer {token}")
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            status, raw = resp.status, resp.read()
+    except urllib.error.HTTPError as e:
+        status, raw = e.code, e.read()
+    except (urllib.error.URLError, OSError):
+        return 0, time.perf_counter() - start, None
+    elapsed = time.perf_counter() - start
+    try:
+        return status, elapsed, json.loads(raw)
+    except ValueError:
+        return status, elapsed, None
+
+
+def sign_up(base_url, n_users):
+    """Register (or reuse) load-test users and log them in; returns [{email, token}]."""
+    users = []
+    for i in range(n_users):
+        email = f"load-{i}@example.test"
+        call(base_url, "POST", "/api/auth/register", {"name": f"Load {i}", "email": email, "password": PASSWORD})
+        status, _, body = call(base_url, "POST", "/api/auth/login", {"email": email, "password": PASSWORD})
+        if status != 200:
+            raise SystemExit(f"Could not log in load-test user {email} (HTTP {status})")
+        users.append({"email": email, "token": body["token"]})
+    return users
+
+
+# ------------------------------------------------
+# Local server
+# ------------------------------------------------
+class LocalServer:
+    """The app on a free local port, Mongo in memory, a synthetic match in a scratch data directory."""
+
+    def __init__(self, minutes, seed):
+        self.minutes = minutes
+        self.seed = seed
+        self.scratch = Path(tempfile.mkdtemp(prefix="gaffer-load-"))
+        self.data_dir = self.scratch / "data"
+        self.paths = match_paths(LOAD_MATCH_ID, self.data_dir)
+        self.server = None
+
+    def __enter__(self):
+        try:
+            import mongomock
+        except ImportError:
+            raise SystemExit("The local load test needs mongomock: pip install -r requirements-dev.txt (or use --url)")
+        from werkzeug.serving import make_server
+        from benchmarks.synthetic import generate_frames, write_jsonl
+
+        self.data_dir.mkdir()
+        for path in match_paths(MATCH_ID).values():
+            # the bundled match stays analysable; its cache is built in scratch if used
+            if path.exists():
+                (self.data_dir / path.name).symlink_to(path.resolve())
+        with open(MATCH_FILE, "r", encoding="utf-8") as fh:
+            meta = json.load(fh)
+        print(f"Writing a {self.minutes:g} min synthetic match {LOAD_MATCH_ID}...")
+        write_jsonl(self.paths["tracking"], generate_frames(meta, self.minutes, seed=self.seed))
+        meta["id"] = int(LOAD_MATCH_ID)
+        with open(self.paths["match"], "w", encoding="utf-8") as fh:
+            json.dump(meta, fh)
+        shutil.copyfile(match_paths(MATCH_ID)["phases"], self.paths["phases"])
+
+        # match data, caches and results must not land in (or be served from) the real folders
+        Config.DATA_DIR = str(self.data_dir)
+        Config.OUTPUT_DIR = str(self.scratch / "outputs")
+        import app as server
+        server.users = mongomock.MongoClient()[Config.MONGO_DB_NAME]["users"]
+
+        # no access log or stage records per request
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+        logging.getLogger().setLevel(logging.WARNING)
+        self.server = make_server("127.0.0.1", 0, server.app, threaded=True)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        return self
+
+    def __exit__(self, *exc):
+        if self.server is not None:
+            self.server.shutdown()
+        shutil.rmtree(self.scratch, ignore_errors=True)
+
+
+# ------------------------------------------------
+# Load
+# ------------------------------------------------
+def drive(base_url, mix, concurrency, duration, users, match_id, seed=0):
+    """Run `concurrency` clients for `duration` seconds; returns ([(route, status, seconds)], elapsed)."""
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    samples = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(i):
+        rng = random.Random(seed * 1000 + i)
+        user = users[i % len(users)] if users else {"email": None, "token": None}
+        ctx = {"match_id": match_id, **user}
+        local = []
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            method, path, body = ROUTES[name]
+            status, seconds, _ = call(base_url, method, path.format(**ctx), body(ctx, rng) if body else None,
+                                      user["token"])
+            local.append((name, status, seconds))
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return samples, time.perf_counter() - start
+
+
+def summarise(samples, elapsed):
+    """Throughput and latency percentiles per route (and overall), latencies in ms."""
+    def stats(rows):
+        ms = np.array([s for _, _, s in rows]) * 1000
+        ok = sum(1 for _, status, _ in rows if 200 <= status < 300)
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99]) if len(ms) else (np.nan,) * 3
+        return {"requests": len(rows), "errors": len(rows) - ok, "rps": round(len(rows) / elapsed, 2),
+                "p50_ms": round(float(p50), 1), "p95_ms": round(float(p95), 1), "p99_ms": round(float(p99), 1)}
+
+    routes = {}
+    for row in samples:
+        routes.setdefault(row[0], []).append(row)
+    return {"elapsed_s": round(elapsed, 2), "total": stats(samples),
+            "routes": {name: stats(rows) for name, rows in sorted(routes.items())}}
+
+
+def print_summary(concurrency, summary):
+    print(f"\nconcurrency {concurrency}: {summary['total']['rps']} req/s over {summary['elapsed_s']} s")
+    print(f"  {'route':<26} {'reqs':>6} {'errs':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, s in list(summary["routes"].items()) + [("TOTAL", summary["total"])]:
+        print(f"  {name:<26} {s['requests']:>6} {s['errors']:>5} {s['rps']:>8} "
+              f"{s['p50_ms']:>9} {s['p95_ms']:>9} {s['p99_ms']:>9}")
+
+
+def run(base_url, mix, levels, duration, match_id, warmup=True):
+    users = sign_up(base_url, N_USERS) if {"login", "me"} & set(mix) else []
+    if warmup:
+        # first requests load the match and fill the result cache; keep them out of the numbers
+        drive(base_url, {n: 1 for n in mix}, 1, min(duration, 5), users, match_id)
+    report = {}
+    for level in levels:
+        samples, elapsed = drive(base_url, mix, level, duration, users, match_id, seed=level)
+        report[str(level)] = summarise(samples, elapsed)
+        print_summary(level, report[str(level)])
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Flask API.")
+    parser.add_argument("--mix", default="mixed", help=f"preset ({', '.join(MIXES)}) or name=weight,...")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated client counts")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per concurrency level")
+    parser.add_argument("--url", help="load an already running server instead of booting one")
+    parser.add_argument("--match-id", help="match to analyse (default: the synthetic one, or the server default)")
+    parser.add_argument("--minutes", type=float, default=20.0, help="length of the synthetic match")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-warmup", action="store_true")
+    parser.add_argument("--out", help="write the report as JSON")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    levels = [int(c) for c in args.concurrency.split(",") if c]
+    settings = {"mix": mix, "duration_s": args.duration}
+    if args.url:
+        report = run(args.url.rstrip("/"), mix, levels, args.duration, args.match_id or MATCH_ID, not args.no_warmup)
+    else:
+        with LocalServer(args.minutes, args.seed) as local:
+            settings.update(minutes=args.minutes, seed=args.seed)
+            report = run(local.url, mix, levels, args.duration, args.match_id or LOAD_MATCH_ID, not args.no_warmup)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump({"settings": settings, "levels": report}, fh, indent=2)
+        print(f"\nReport written to {args.out}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""Micro-benchmarks of the analysis hot paths on synthetic tracking data.
+
+    cd backend && python -m benchmarks.suite [--minutes 5,90] [--repeat 3]
+                                             [--out benchmarks/baseline.json]
+                                             [--compare OLD.json] [--tolerance 0.2]
+
+For each match length a deterministic synthetic match (benchmarks.synthetic)
+is written to a scratch folder, its columnar cache next to it, and every
+benchmark is timed on it, best of --repeat runs. Results are written as JSON
+to --out; with --compare, any benchmark more than --tolerance slower than in
+the earlier file is reported and the exit status is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from ml.model0_load_data import MATCH_FILE, build_tracking_cache, cache_path, open_tracking_cache
+from ml.model1 import compute_team_compactness, compute_defensive_line_height
+from ml.model2_real import compute_distances_and_sprints, compute_distances_and_sprints_vectorized
+from ml.model3_fixed import compute_pitch_control, map_players_to_teams
+from ml.player_registry import get_registry
+from ml.tracking_json import backend_name, iter_frames
+from benchmarks.synthetic import FPS, generate_frames, write_jsonl
+
+SEED = 0
+DROPOUT = 0.02
+
+
+def benchmarks(path, meta):
+    """(name, fn) pairs timed on one synthetic match; fn returns nothing useful."""
+    registry = get_registry(meta)
+    home = registry.home_team_id
+    frames = open_tracking_cache(path)
+    home_players, away_players = map_players_to_teams(frames, meta)
+
+    def consume(it):
+        for _ in it:
+            pass
+
+    return [
+        ("load_tracking/jsonl", lambda: consume(iter_frames(path))),
+        ("load_tracking/build_cache", lambda: build_tracking_cache(path)),
+        ("load_tracking/open_cache", lambda: open_tracking_cache(path).has_players().sum()),
+        ("compute_team_compactness", lambda: compute_team_compactness(frames, home, registry, workers=1)),
+        ("compute_defensive_line_height", lambda: compute_defensive_line_height(frames, home, registry, meta)),
+        ("compute_distances_and_sprints", lambda: compute_distances_and_sprints(frames, FPS)),
+        ("compute_distances_and_sprints/vectorized", lambda: compute_distances_and_sprints_vectorized(frames, FPS)),
+        ("compute_pitch_control", lambda: compute_pitch_control(frames, home_players, away_players, (50, 50), meta)),
+    ]
+
+
+def time_best(fn, repeat):
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return {"best_s": round(min(runs), 6), "mean_s": round(sum(runs) / len(runs), 6), "runs": len(runs)}
+
+
+def run(minutes_list, repeat, log=print):
+    with open(MATCH_FILE, "r", encoding="utf-8") as fh:
+        meta = json.load(fh)
+    scratch = Path(tempfile.mkdtemp(prefix="gaffer-bench-"))
+    results = {}
+    try:
+        for minutes in minutes_list:
+            size = f"{minutes:g}min"
+            path = scratch / f"bench{minutes:g}_tracking_extrapolated.jsonl"
+            n_frames = write_jsonl(path, generate_frames(meta, minutes, DROPOUT, SEED))
+            build_tracking_cache(path)
+            results[size] = {"frames": n_frames, "benchmarks": {}}
+            for name, fn in benchmarks(path, meta):
+                timing = time_best(fn, repeat)
+                results[size]["benchmarks"][name] = timing
+                log(f"  {size:>6} {name:<42} {timing['best_s'] * 1000:>10.1f} ms")
+            shutil.rmtree(cache_path(path), ignore_errors=True)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return results
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "json_decoder": backend_name(),
+        "seed": SEED,
+        "dropout": DROPOUT,
+    }
+
+
+def regressions(current, baseline, tolerance):
+    """(size, name, old_s, new_s) for every benchmark slower than baseline by more than tolerance."""
+    out = []
+    for size, entry in current.items():
+        old = (baseline.get(size) or {}).get("benchmarks", {})
+        for name, timing in entry["benchmarks"].items():
+            if name in old and timing["best_s"] > old[name]["best_s"] * (1 + tolerance):
+                out.append((size, name, old[name]["best_s"], timing["best_s"]))
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the analysis hot paths on synthetic tracking data.")
+    parser.add_argument("--minutes", default="5,90", help="comma-separated match lengths")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", default=str(Path(__file__).with_name("baseline.json")))
+    parser.add_argument("--compare", help="earlier results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as fh:
+            baseline = json.load(fh)
+
+    minutes = [float(m) for m in args.minutes.split(",") if m]
+    print(f"Benchmarking {', '.join(f'{m:g} min' for m in minutes)}, best of {args.repeat}")
+    report = {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "environment": environment(),
+              "results": run(minutes, args.repeat)}
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"Results written to {args.out}")
+
+    if baseline is not None:
+        slower = regressions(report["results"], baseline["results"], args.tolerance)
+        for size, name, old, new in slower:
+            print(f"  REGRESSION {size} {name}: {old * 1000:.1f} ms -> {new * 1000:.1f} ms ({new / old:.2f}x)")
+        if slower:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
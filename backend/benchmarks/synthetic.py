@@ -0,0 +1,150 @@
+"""Deterministic SkillCorner-style tracking data for benchmarks.
+
+    cd backend && python -m benchmarks.synthetic OUT.jsonl [--minutes 90] [--dropout 0.02] [--seed 0]
+
+Frames follow the extrapolated tracking schema (frame, timestamp, period,
+ball_data, possession, player_data[player_id/x/y/is_detected]) at 25 fps over
+two periods. Players are the starters of a match.json (the bundled match by
+default), each moving around a formation slot that shifts with the ball, with
+sides swapped at half-time as home_team_side says. The same seed always
+gives the same file.
+"""
+import argparse
+import json
+
+import numpy as np
+from scipy.signal import lfilter
+
+from ml.model0_load_data import MATCH_FILE
+
+FPS = 25
+FIRST_FRAME = 10
+PERIOD_GAP_FRAMES = 10
+GAP_FRAMES = 25  # a dropped-out player stays missing this long
+
+# distance from a team's own goal line, as a fraction of the pitch length
+DEPTH = {"Central Defender": 0.2, "Full Back": 0.25, "Midfield": 0.45,
+         "Wide Attacker": 0.65, "Center Forward": 0.75, "Other": 0.45}
+GOALKEEPER_DEPTH = 0.03
+
+
+def starters(meta):
+    """(player ids, is_home, depth fraction) for the 22 starting players."""
+    home_id = meta["home_team"]["id"]
+    players = [p for p in meta["players"] if p.get("start_time") == "00:00:00"]
+    players.sort(key=lambda p: (p["team_id"] != home_id, p["id"]))
+    depth = [GOALKEEPER_DEPTH if (p.get("player_role") or {}).get("acronym") == "GK"
+             else DEPTH.get((p.get("player_role") or {}).get("position_group"), DEPTH["Other"]) for p in players]
+    return (np.array([p["id"] for p in players]), np.array([p["team_id"] == home_id for p in players]),
+            np.array(depth))
+
+
+def formation(is_home, depth, length, width):
+    """Anchor (x, y) per player for a home side attacking towards +x; players
+    at the same depth are spread evenly across the pitch."""
+    anchors = np.zeros((len(depth), 2))
+    for home in (True, False):
+        for d in np.unique(depth[is_home == home]):
+            rows = np.flatnonzero((is_home == home) & (depth == d))
+            anchors[rows, 0] = -length / 2 + d * length
+            anchors[rows, 1] = np.linspace(-width / 2, width / 2, len(rows) + 2)[1:-1]
+    anchors[~is_home, 0] *= -1
+    return anchors
+
+
+def smooth_path(rng, shape, speed, tau_v=2.0, tau_p=20.0):
+    """Positions (along axis 0) that move like a player: velocity is AR(1) noise
+    with time constant tau_v (s) and per-axis std speed (m/s), and the position
+    relaxes back towards zero over tau_p seconds."""
+    a = np.exp(-1.0 / (FPS * tau_v))
+    velocity = lfilter([1.0], [1.0, -a], rng.normal(0.0, speed * np.sqrt(1 - a * a), shape), axis=0)
+    return lfilter([1.0 / FPS], [1.0, -(1 - 1.0 / (FPS * tau_p))], velocity, axis=0)
+
+
+def period_positions(rng, n, anchors, home_sign, length, width):
+    """Ball (n x 3) and player (n x players x 2) positions for one period."""
+    ball = smooth_path(rng, (n, 3), 4.0, tau_v=3.0, tau_p=30.0)
+    ball[:, 0] = np.clip(ball[:, 0], -length / 2, length / 2)
+    ball[:, 1] = np.clip(ball[:, 1], -width / 2, width / 2)
+    ball[:, 2] = np.abs(ball[:, 2]) / 4
+
+    # the whole team follows the ball: 40% of its x, 20% of its y
+    shift = np.stack([0.4 * ball[:, 0], 0.2 * ball[:, 1]], axis=1)[:, None, :]
+    xy = anchors[None] * np.array([home_sign, 1.0]) + shift + smooth_path(rng, (n, len(anchors), 2), 1.8)
+    xy[..., 0] = np.clip(xy[..., 0], -length / 2 - 2, length / 2 + 2)
+    xy[..., 1] = np.clip(xy[..., 1], -width / 2 - 2, width / 2 + 2)
+    return ball, xy
+
+
+def dropout_mask(rng, shape, rate):
+    """True where a player is missing: gaps of GAP_FRAMES covering about rate of the frames."""
+    if rate <= 0:
+        return np.zeros(shape, dtype=bool)
+    starts = rng.random(shape) < rate / GAP_FRAMES
+    covered = lfilter(np.ones(GAP_FRAMES), [1.0], starts.astype(float), axis=0)
+    return covered > 0.5
+
+
+def clock(seconds):
+    h, rem = divmod(seconds, 3600)
+    m, s = divmod(rem, 60)
+    return f"{int(h):02d}:{int(m):02d}:{s:05.2f}"
+
+
+def generate_frames(meta=None, minutes=90.0, dropout=0.02, seed=0):
+    """Frame dicts for a match of `minutes` (split over two periods)."""
+    if meta is None:
+        with open(MATCH_FILE, "r", encoding="utf-8") as fh:
+            meta = json.load(fh)
+    rng = np.random.default_rng(seed)
+    length, width = float(meta.get("pitch_length") or 105), float(meta.get("pitch_width") or 68)
+    ids, is_home, depth = starters(meta)
+    anchors = formation(is_home, depth, length, width)
+    sides = meta.get("home_team_side") or ["left_to_right", "right_to_left"]
+
+    per_period = int(round(minutes * 60 * FPS / 2))
+    frame = FIRST_FRAME
+    for period in (1, 2):
+        home_sign = 1.0 if sides[period - 1] == "left_to_right" else -1.0
+        ball, xy = period_positions(rng, per_period, anchors, home_sign, length, width)
+        missing = dropout_mask(rng, (per_period, len(ids)), dropout)
+        xy = np.round(xy, 2).tolist()
+        ball = np.round(ball, 2).tolist()
+        for i in range(per_period):
+            yield {
+                "frame": frame,
+                "timestamp": clock(i / FPS),
+                "period": period,
+                "ball_data": {"x": ball[i][0], "y": ball[i][1], "z": ball[i][2], "is_detected": True},
+                "possession": {"player_id": None, "group": None},
+                "player_data": [{"x": x, "y": y, "player_id": int(pid), "is_detected": True}
+                                for pid, (x, y), gone in zip(ids, xy[i], missing[i]) if not gone],
+            }
+            frame += 1
+        frame += PERIOD_GAP_FRAMES
+
+
+def write_jsonl(path, frames):
+    """Write frames one JSON object per line; returns how many were written."""
+    n = 0
+    with open(path, "w", encoding="utf-8") as fh:
+        for fr in frames:
+            fh.write(json.dumps(fr))
+            fh.write("\n")
+            n += 1
+    return n
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic SkillCorner-style tracking JSONL.")
+    parser.add_argument("out")
+    parser.add_argument("--minutes", type=float, default=90.0)
+    parser.add_argument("--dropout", type=float, default=0.02, help="fraction of player-frames missing")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    n = write_jsonl(args.out, generate_frames(minutes=args.minutes, dropout=args.dropout, seed=args.seed))
+    print(f"Wrote {n:,} frames to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,3 +11,32 @@ class Config:
     JWT_SECRET = os.getenv("JWT_SECRET", "super-secret-jwt")
     JWT_ALGO = "HS256"
     OUTPUT_DIR = os.path.join(BASE_DIR, "outputs")
+    # match files (<match_id>_<suffix>); their columnar caches go in a cache/ folder inside it
+    DATA_DIR = os.getenv("DATA_DIR", os.path.join(BASE_DIR, "ml", "data"))
+    # memory budget for parsed match data shared by all analysis requests
+    MATCH_CACHE_MB = int(os.getenv("MATCH_CACHE_MB", "1024"))
+    # process-pool size for convex-hull compactness (0 = one per CPU, 1 = serial)
+    COMPACTNESS_WORKERS = int(os.getenv("COMPACTNESS_WORKERS", "0"))
+    # contiguous frame shards (processes) for full-match Model 2 distances (0 = one per CPU, 1 = serial)
+    MODEL2_SHARDS = int(os.getenv("MODEL2_SHARDS", "0"))
+    # tracking JSONL decoder: "auto" (orjson when installed), "orjson" or "stdlib"
+    JSON_DECODER = os.getenv("JSON_DECODER", "auto")
+    # background analysis jobs: concurrent runs and how many may wait
+    ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "2"))
+    ANALYSIS_QUEUE_LIMIT = int(os.getenv("ANALYSIS_QUEUE_LIMIT", "20"))
+    # disk budget for cached analysis results (PNGs + JSON) under OUTPUT_DIR/results
+    RESULT_CACHE_MB = int(os.getenv("RESULT_CACHE_MB", "512"))
+    # how often (seconds) the result store is garbage-collected in the background
+    RESULT_GC_SECONDS = int(os.getenv("RESULT_GC_SECONDS", "300"))
+    # per-frame series in analysis responses are reduced to this many values unless ?max_points= says otherwise
+    SERIES_MAX_POINTS = int(os.getenv("SERIES_MAX_POINTS", "2000"))
+    # /events/positions: most events per response (?limit= is clamped to it) and most event x offset snapshots
+    EVENT_POSITIONS_MAX_EVENTS = int(os.getenv("EVENT_POSITIONS_MAX_EVENTS", "1000"))
+    EVENT_POSITIONS_MAX_SNAPSHOTS = int(os.getenv("EVENT_POSITIONS_MAX_SNAPSHOTS", "20000"))
+    # process-pool size for season batches; also how many matches are in memory at once (0 = one per CPU)
+    SEASON_WORKERS = int(os.getenv("SEASON_WORKERS", "2"))
+    # log records go to stderr as "json" (one object per line) or "text"
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    # comma-separated emails of users allowed to profile analyses (?profile=1 / X-Profile: 1)
+    ADMIN_EMAILS = {e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()}
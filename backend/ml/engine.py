@@ -0,0 +1,130 @@
+# engine.py - Fused metrics engine
+# Builds the dense slot-indexed position array once and derives every requested
+# metric from it, so a full dashboard refresh walks the frame data a single time.
+
+import numpy as np
+
+from ml.model0_load_data import TrackingArrays
+from ml.player_registry import get_registry
+from ml.phases import select_phase_frames, phase_segments
+from ml.model1 import hull_areas, compute_defensive_line
+from ml.model2_real import step_distances, HIGH_INTENSITY_THRESHOLD
+from ml.timeseries import as_series
+from ml.model3_fixed import GRID_RESOLUTIONS, DEFAULT_RESOLUTION, pitch_extent, resolve_grid, occupancy_counts
+from utils.telemetry import stage
+
+
+MODEL_VERSION = "4"
+FPS = 25
+METRICS = ("compactness", "defensive_line", "occupancy", "distances")
+
+
+# ------------------------------------------------
+# Frame selection
+# ------------------------------------------------
+def select_frames(frames, n_minutes=None, fps=FPS, phase=None, meta=None):
+    """Frames with player data, limited to the first n_minutes (None = all),
+    counting only frames inside the matching phases when phase is given."""
+    if phase:
+        frames = select_phase_frames(select_frames(frames), phase, meta)
+        return frames if n_minutes is None else frames[:int(n_minutes * 60 * fps)]
+    if isinstance(frames, TrackingArrays):
+        idx = np.flatnonzero(frames.has_players())
+    else:
+        frames = list(frames)
+        idx = [i for i, f in enumerate(frames) if f.get("player_data")]
+    if n_minutes is not None:
+        idx = idx[:int(n_minutes * 60 * fps)]
+    if isinstance(frames, TrackingArrays):
+        return frames[idx]
+    return [frames[i] for i in idx]
+
+
+# ------------------------------------------------
+# Per-metric kernels on (frames x slots x 2) arrays
+# ------------------------------------------------
+def occupancy_grids(xy, team_masks, extent, resolutions):
+    """Presence counts per team for each resolution, binned in bulk with bincount."""
+    points = {}
+    for team, mask in team_masks.items():
+        pts = xy[:, mask].reshape(-1, 2)
+        points[team] = pts[~np.isnan(pts).any(axis=1)]
+    grids = {}
+    for name in resolutions:
+        size = resolve_grid(GRID_RESOLUTIONS[name], extent)
+        counts = {team: occupancy_counts(pts, extent, size) for team, pts in points.items()}
+        grids[name] = {"grid_size": list(size), **counts}
+    return grids
+
+
+def distance_table(xy, fps=FPS, segment_starts=None):
+    """Per-slot total distance (m) and high-intensity frame count."""
+    steps = step_distances(xy, segment_starts)
+    with np.errstate(invalid="ignore"):
+        sprint_frames = (steps / (1.0 / fps) >= HIGH_INTENSITY_THRESHOLD).sum(axis=0)
+    seen = (~np.isnan(xy).any(axis=2)).any(axis=0)
+    return np.nansum(steps, axis=0), sprint_frames, seen
+
+
+# ------------------------------------------------
+# Engine
+# ------------------------------------------------
+def compute_metrics(frames, meta, metrics=METRICS, n_minutes=None, fps=FPS, resolutions=(DEFAULT_RESOLUTION,),
+                    phase=None):
+    """Compute every requested metric from a single traversal of the frames.
+
+    phase restricts the frames to matching phases of play (see ml.phases).
+    Returns a JSON-ready dict keyed by metric name.
+    """
+    unknown = set(metrics) - set(METRICS)
+    if unknown:
+        raise ValueError(f"Unknown metrics: {', '.join(sorted(unknown))}")
+    unknown = set(resolutions) - set(GRID_RESOLUTIONS)
+    if unknown:
+        raise ValueError(f"Unknown grid resolutions: {', '.join(sorted(unknown))}")
+
+    registry = get_registry(meta)
+    with stage("engine.select_frames") as info:
+        frames = select_frames(frames, n_minutes, fps, phase, meta)
+        xy = registry.dense_positions(frames)
+        info["frames"] = len(xy)
+    team_masks = {"home": registry.is_home, "away": ~registry.is_home}
+    results = {"n_frames": len(xy), "fps": fps}
+
+    if "compactness" in metrics:
+        with stage("engine.compactness", frames=len(xy)):
+            areas = hull_areas([xy[:, mask] for mask in team_masks.values()])
+            results["compactness"] = {team: as_series(a) for team, a in zip(team_masks, areas)}
+
+    if "defensive_line" in metrics:
+        with stage("engine.defensive_line", frames=len(xy)):
+            team_ids = {"home": registry.home_team_id, "away": registry.away_team_id}
+            lines = compute_defensive_line(frames, meta, registry, list(team_ids.values()), xy)
+            results["defensive_line"] = {
+                team: {"height": as_series(lines[tid]["height"]), "depth": as_series(lines[tid]["depth"])}
+                for team, tid in team_ids.items()
+            }
+
+    if "occupancy" in metrics:
+        with stage("engine.occupancy", frames=len(xy), resolutions=list(resolutions)):
+            results["occupancy"] = {}
+            for name, g in occupancy_grids(xy, team_masks, pitch_extent(meta), resolutions).items():
+                control = g["home"] / (g["home"] + g["away"] + 1e-6)
+                results["occupancy"][name] = {
+                    "grid_size": g["grid_size"],
+                    "home": g["home"].T.tolist(),
+                    "away": g["away"].T.tolist(),
+                    "pitch_control": control.T.tolist(),
+                }
+
+    if "distances" in metrics:
+        with stage("engine.distances", frames=len(xy)):
+            totals, sprint_frames, seen = distance_table(xy, fps, phase_segments(frames, phase, meta))
+            results["distances"] = [
+                {"player_id": int(registry.ids[j]), "name": registry.names[j],
+                 "side": "home" if registry.is_home[j] else "away",
+                 "distance_km": float(totals[j]) / 1000.0, "sprint_seconds": int(sprint_frames[j]) / fps}
+                for j in np.flatnonzero(seen)
+            ]
+
+    return results
@@ -0,0 +1,183 @@
+# events.py - join dynamic events to tracking frames by match clock
+# Events and frames are each sorted once by (period, seconds into the period);
+# every lookup after that is a vectorised searchsorted over those keys, so
+# attaching frames to thousands of events costs a handful of array operations
+# instead of a scan of the tracking data per event.
+
+import threading
+import numpy as np
+
+from ml.model0_load_data import TrackingArrays, parse_clock
+
+# where each period's clock starts when a feed counts the match clock cumulatively
+PERIOD_CLOCK_START = {1: 0.0, 2: 45 * 60.0, 3: 90 * 60.0, 4: 105 * 60.0}
+PERIOD_SPAN = 10_000.0  # seconds; keeps periods apart in one sortable key
+
+
+def period_seconds(period, seconds):
+    """Seconds into the period, whether the clock restarts each period or runs on.
+
+    The convention is read once per period from its earliest time: if no time
+    in the period is before the period's cumulative start, the clock runs on
+    and the start comes off every time in it; otherwise the times already
+    count from the start of the period and are left as they are.
+    """
+    period = np.asarray(period, dtype=np.int64)
+    seconds = np.asarray(seconds, dtype=float)
+    out = seconds.copy()
+    for p, start in PERIOD_CLOCK_START.items():
+        rows = period == p
+        times = seconds[rows]
+        times = times[~np.isnan(times)]
+        if start and len(times) and times.min() >= start:
+            out[rows] -= start
+    return out
+
+
+def clock_key(period, seconds):
+    return np.asarray(period, dtype=float) * PERIOD_SPAN + period_seconds(period, seconds)
+
+
+def frame_clock(frames):
+    """(period, seconds) per frame, for columnar or dict frames."""
+    if isinstance(frames, TrackingArrays):
+        return np.asarray(frames.period, dtype=np.int64), np.asarray(frames.timestamp, dtype=float)
+    period = np.array([f.get("period") or 0 for f in frames], dtype=np.int64)
+    seconds = np.array([parse_clock(f.get("timestamp")) for f in frames], dtype=float)
+    return period, seconds
+
+
+class EventFrameJoin:
+    """Dynamic events and tracking frames on one sorted match clock.
+
+    events: DataFrame with period and time_start (MM:SS.s or seconds); frames:
+    TrackingArrays (or frame dicts). Frames without a timestamp are skipped.
+    """
+
+    def __init__(self, events, frames):
+        self.events = events.reset_index(drop=True)
+        self.frames = frames
+
+        period, seconds = frame_clock(frames)
+        keys = clock_key(period, seconds)
+        ok = ~np.isnan(keys)
+        rows = np.flatnonzero(ok)
+        order = np.argsort(keys[ok], kind="stable")
+        self.frame_rows = rows[order]      # frame row, in clock order
+        self.frame_keys = keys[ok][order]
+
+        ev_seconds = np.array([parse_clock(t) for t in self.events["time_start"]], dtype=float)
+        ev_keys = clock_key(self.events["period"].fillna(0).to_numpy(), ev_seconds)
+        self.event_order = np.argsort(ev_keys, kind="stable")   # event row, in clock order
+        self.event_keys = ev_keys[self.event_order]
+        self._ev_keys = ev_keys
+
+    def event_rows(self, event_type=None, column="event_type"):
+        """Event rows (original order) of one type, or all of them."""
+        if event_type is None:
+            return np.arange(len(self.events))
+        wanted = event_type if isinstance(event_type, (list, tuple, set)) else [event_type]
+        return np.flatnonzero(self.events[column].isin(list(wanted)).to_numpy())
+
+    def frames_at(self, event_rows, offsets=(0.0,), tolerance=0.5):
+        """Frame row nearest to each event time + offset: (events x offsets), -1 if
+        no frame lies within tolerance seconds (or the event has no time)."""
+        targets = self._ev_keys[np.asarray(event_rows, dtype=np.int64)][:, None] + np.asarray(offsets, dtype=float)[None, :]
+        flat = targets.ravel()
+        n = len(self.frame_keys)
+        if not n:
+            return np.full(targets.shape, -1, dtype=np.int64)
+        hi = np.clip(np.searchsorted(self.frame_keys, flat), 0, n - 1)
+        lo = np.clip(hi - 1, 0, n - 1)
+        nearer = np.where(np.abs(self.frame_keys[lo] - flat) <= np.abs(self.frame_keys[hi] - flat), lo, hi)
+        with np.errstate(invalid="ignore"):
+            ok = np.abs(self.frame_keys[nearer] - flat) <= tolerance
+        return np.where(ok, self.frame_rows[nearer], -1).reshape(targets.shape)
+
+    def events_near(self, frame_rows, window=5.0):
+        """For each frame row, the event rows within +/- window seconds of it."""
+        period, seconds = frame_clock(self.frames[np.asarray(frame_rows, dtype=np.int64)]
+                                      if isinstance(self.frames, TrackingArrays)
+                                      else [self.frames[i] for i in frame_rows])
+        keys = clock_key(period, seconds)
+        lo = np.searchsorted(self.event_keys, keys - window, side="left")
+        hi = np.searchsorted(self.event_keys, keys + window, side="right")
+        return [self.event_order[a:b] for a, b in zip(lo, hi)]
+
+    def snapshots(self, event_rows, offsets=(0.0,), tolerance=0.5):
+        """Player positions around events in bulk.
+
+        Returns (rows, xy, ball): rows (events x offsets) frame rows (-1 = none),
+        xy (events x offsets x players x 2) NaN where untracked, ball
+        (events x offsets x 3). Players are the columns of frames.player_ids.
+        """
+        rows = self.frames_at(event_rows, offsets, tolerance)
+        frames = self.frames
+        if not isinstance(frames, TrackingArrays):
+            raise TypeError("snapshots need columnar TrackingArrays frames")
+        safe = np.maximum(rows, 0)
+        xy = np.asarray(frames.xy[safe.ravel()]).reshape(rows.shape + frames.xy.shape[1:])
+        ball = np.asarray(frames.ball[safe.ravel()]).reshape(rows.shape + (3,))
+        xy[rows < 0] = np.nan
+        ball[rows < 0] = np.nan
+        return rows, xy, ball
+
+
+_cached = None  # (events, frames, join) for the data currently in the match store
+_lock = threading.Lock()
+
+
+def get_event_join(events, frames):
+    """The join for these events and frames, rebuilt only when either object changes."""
+    global _cached
+    with _lock:
+        if _cached is None or _cached[0] is not events or _cached[1] is not frames:
+            _cached = (events, frames, EventFrameJoin(events, frames))
+        return _cached[2]
+
+
+# ------------------------------------------------
+# JSON views
+# ------------------------------------------------
+EVENT_FIELDS = ("event_id", "event_type", "event_subtype", "period", "time_start", "frame_start",
+                "player_id", "player_name", "team_id", "team_shortname")
+
+
+def _json_rows(df):
+    df = df[[c for c in EVENT_FIELDS if c in df.columns]]
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+def _json_array(values, decimals=2):
+    return np.where(np.isnan(values), None, np.round(values, decimals)).tolist()
+
+
+def positions_around(join, event_type=None, offsets=(0.0,), tolerance=0.5, limit=None):
+    """Player and ball positions at each offset (seconds) around every event of a type, JSON-ready."""
+    rows = join.event_rows(event_type)[:limit]
+    frame_rows, xy, ball = join.snapshots(rows, offsets, tolerance)
+    frame_numbers = np.where(frame_rows >= 0, np.asarray(join.frames.frame)[np.maximum(frame_rows, 0)], -1)
+    events = _json_rows(join.events.iloc[rows])
+    xy, ball = _json_array(xy), _json_array(ball)
+    return {
+        "player_ids": np.asarray(join.frames.player_ids).tolist(),
+        "offsets": list(offsets),
+        "n_events": len(rows),
+        "events": [
+            {"event": events[i],
+             "frames": [int(f) if f >= 0 else None for f in frame_numbers[i]],
+             "positions": xy[i],
+             "ball": ball[i]}
+            for i in range(len(rows))
+        ],
+    }
+
+
+def events_around_frame(join, frame, window=5.0):
+    """Events within +/- window seconds of a tracking frame number, JSON-ready."""
+    numbers = np.asarray(join.frames.frame) if isinstance(join.frames, TrackingArrays) \
+        else np.array([f.get("frame") for f in join.frames])
+    row = int(np.searchsorted(numbers, frame))
+    if row >= len(numbers) or numbers[row] != frame:
+        return None
+    return {"frame": int(frame), "window": window, "events": _json_rows(join.events.iloc[join.events_near([row], window)[0]])}
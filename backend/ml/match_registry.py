@@ -0,0 +1,62 @@
+# match_registry.py - the matches available under the data directory
+# A match is whatever set of <match_id>_<suffix> files (see MATCH_FILES) sits in
+# the data folder; dropping in another match's files makes it analysable without
+# touching the code. The folder is rescanned on each call - it holds a handful
+# of files per match, so a listing costs far less than reading any of them.
+
+from pathlib import Path
+
+from ml.model0_load_data import CACHE_DIRNAME, MATCH_FILES, cache_path, default_data_dir, match_paths
+
+# cache folders are named after the tracking file: <match_id>_tracking_extrapolated
+TRACKING_STEM = Path(MATCH_FILES["tracking"]).stem
+
+
+def discover_matches(data_dir=None):
+    """{match_id: {kind: path}} for every match with at least one file present
+    in data_dir (default Config.DATA_DIR).
+
+    Tracking counts as present when only its columnar cache is on this machine.
+    """
+    data_dir = Path(data_dir) if data_dir is not None else default_data_dir()
+    found = {}
+    for path in sorted(data_dir.glob("*_*")):
+        for kind, suffix in MATCH_FILES.items():
+            if path.name.endswith(f"_{suffix}") and path.is_file():
+                found.setdefault(path.name[:-len(suffix) - 1], {})[kind] = path
+    for path in sorted((data_dir / CACHE_DIRNAME).glob(f"*_{TRACKING_STEM}")):
+        match_id = path.name[:-len(TRACKING_STEM) - 1]
+        tracking = match_paths(match_id, data_dir)["tracking"]
+        if (cache_path(tracking) / "source.json").exists():
+            found.setdefault(match_id, {}).setdefault("tracking", tracking)
+    return found
+
+
+def is_analysable(files):
+    return "tracking" in files and "match" in files
+
+
+def match_ids(data_dir=None):
+    """Ids of the matches that have tracking data and metadata."""
+    return [m for m, files in discover_matches(data_dir).items() if is_analysable(files)]
+
+
+def require_match(match_id, data_dir=None):
+    """match_id as a string, or ValueError if the data directory does not hold it."""
+    match_id = str(match_id)
+    if match_id not in match_ids(data_dir):
+        raise ValueError(f"Unknown match: {match_id}")
+    return match_id
+
+
+def match_summary(match_id, files, meta=None):
+    """JSON description of one match for the match list."""
+    out = {"match_id": match_id, "files": sorted(files), "analysable": is_analysable(files)}
+    if meta:
+        out.update(
+            date=meta.get("date_time"),
+            home_team=(meta.get("home_team") or {}).get("name"),
+            away_team=(meta.get("away_team") or {}).get("name"),
+            score=[meta.get("home_team_score"), meta.get("away_team_score")],
+        )
+    return out
@@ -0,0 +1,154 @@
+# match_store.py - process-wide cache of parsed match data
+# Every analysis route and model asks this store for frames / metadata instead of
+# re-reading the files, so repeated dashboard clicks reuse one parsed copy.
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+from config import Config
+from ml.model0_load_data import (
+    MATCH_ID, MATCH_FILES, TrackingArrays, match_paths,
+    load_tracking, load_match_metadata, load_events, cache_path,
+)
+from utils.metrics import CACHE_REQUESTS, MATCH_CACHE_BYTES
+from utils.single_flight import SingleFlight
+
+
+def _file_version(path):
+    """mtime of a data file; falls back to the columnar cache stamp when the JSONL is absent."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        if path.name.endswith(MATCH_FILES["tracking"]):
+            try:
+                return os.stat(cache_path(path) / "source.json").st_mtime_ns
+            except FileNotFoundError:
+                pass
+        return None
+
+
+def estimate_size(value, _sample=50):
+    """Rough in-memory size in bytes (frame lists are sampled, not walked)."""
+    if isinstance(value, TrackingArrays):
+        return value.nbytes
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        if len(value) > _sample:
+            step = len(value) // _sample
+            sampled = sum(estimate_size(v) for v in value[::step][:_sample])
+            return sys.getsizeof(value) + sampled * len(value) // _sample
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class MatchStore:
+    """LRU cache of loaded match data, bounded by an approximate memory budget.
+
+    Entries are keyed by (match_id, kind, file mtime), so editing a data file
+    simply makes the old entry unreachable until it is evicted. Concurrent
+    misses for the same key share one load.
+    """
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._lock = threading.Lock()
+        self._loads = SingleFlight()
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, match_id, kind, path, loader):
+        key = (str(match_id), kind, _file_version(path))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        value, _ = self._loads.do(key, lambda: self._load(key, loader))
+        return value
+
+    def _load(self, key, loader):
+        value = loader()
+        size = estimate_size(value)
+        with self._lock:
+            if key not in self._entries:
+                self._drop_stale(key)
+                self._entries[key] = (value, size)
+                self.used_bytes += size
+                self._evict()
+        return value
+
+    def peek(self, match_id, kind, path):
+        """Cached value or None, without loading or touching the counters."""
+        key = (str(match_id), kind, _file_version(path))
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[0] if entry is not None else None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.used_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": [{"match_id": k[0], "kind": k[1], "bytes": size}
+                            for k, (_, size) in self._entries.items()],
+                "used_bytes": self.used_bytes,
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _drop_stale(self, key):
+        # older versions of the same file can never be hit again
+        for old in [k for k in self._entries if k[:2] == key[:2]]:
+            self.used_bytes -= self._entries.pop(old)[1]
+
+    def _evict(self):
+        # always keep the newest entry, even if it alone exceeds the budget
+        while self.used_bytes > self.budget_bytes and len(self._entries) > 1:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.used_bytes -= size
+            self.evictions += 1
+
+
+store = MatchStore(Config.MATCH_CACHE_MB * 1024 * 1024)
+CACHE_REQUESTS.collect(lambda: {("match", "hit"): store.hits, ("match", "miss"): store.misses})
+MATCH_CACHE_BYTES.collect(lambda: {(): store.used_bytes})
+
+
+def get_tracking(match_id=MATCH_ID):
+    return store.get(match_id, "tracking", match_paths(match_id)["tracking"],
+                     lambda: load_tracking(match_id=match_id))
+
+
+def peek_tracking(match_id=MATCH_ID):
+    """Resident frames, or None so windowed models stream just their window."""
+    return store.peek(match_id, "tracking", match_paths(match_id)["tracking"])
+
+
+def get_match_metadata(match_id=MATCH_ID):
+    return store.get(match_id, "metadata", match_paths(match_id)["match"],
+                     lambda: load_match_metadata(match_id))
+
+
+def get_events(match_id=MATCH_ID):
+    return store.get(match_id, "events", match_paths(match_id)["events"],
+                     lambda: load_events(match_id))
+
+
+def cache_stats():
+    return store.stats()
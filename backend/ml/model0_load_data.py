@@ -1,58 +1,603 @@
+import os
+import re
 import json
+import hashlib
+import logging
+import shutil
+import tempfile
+import threading
+import numpy as np
 import pandas as pd
 from pathlib import Path
 
-BASE = Path(__file__).resolve().parent / "data"
+from config import Config
+from ml.tracking_json import decode_lines, iter_frames, iter_records
+from utils.telemetry import configure_logging, stage
 
-TRACKING_FILE = BASE / "1925299_tracking_extrapolated.jsonl"
-MATCH_FILE = BASE / "1925299_match.json"
-EVENTS_FILE = BASE / "1925299_dynamic_events.csv"
-PHASES_FILE = BASE / "1925299_phases_of_play.csv"
+MATCH_ID = "1925299"  # default match when a request does not name one
 
+# the files of one match are <match_id>_<suffix> under the data directory
+MATCH_FILES = {
+    "tracking": "tracking_extrapolated.jsonl",
+    "match": "match.json",
+    "events": "dynamic_events.csv",
+    "phases": "phases_of_play.csv",
+}
 
-def load_tracking():
-    print("Loading tracking data JSONL...")
 
-    frames = []
-    with open(TRACKING_FILE, "r", encoding="utf-8") as f:
+def default_data_dir():
+    """Config.DATA_DIR, read on every call so a run can repoint it."""
+    return Path(Config.DATA_DIR)
 
-        for line in f:
-            line = line.strip()
-            if not line:
+
+def match_paths(match_id=MATCH_ID, data_dir=None):
+    data_dir = Path(data_dir) if data_dir is not None else default_data_dir()
+    return {kind: data_dir / f"{match_id}_{suffix}" for kind, suffix in MATCH_FILES.items()}
+
+
+def match_id_of(meta):
+    """Match id named by loaded metadata (SkillCorner's match.json "id")."""
+    if meta and meta.get("id") is not None:
+        return str(meta["id"])
+    return MATCH_ID
+
+
+TRACKING_FILE = match_paths()["tracking"]
+MATCH_FILE = match_paths()["match"]
+EVENTS_FILE = match_paths()["events"]
+PHASES_FILE = match_paths()["phases"]
+
+# Columnar tracking cache (one folder of memory-mapped .npy arrays per match),
+# kept in a cache/ folder next to the tracking files
+CACHE_DIRNAME = "cache"
+CACHE_FORMAT = 1
+CACHE_ARRAYS = ("frame", "timestamp", "period", "player_ids", "xy", "ball", "valid")
+
+# one lock per derived file (cache folder / index), so threads build each one once
+_build_locks = {}
+_build_locks_guard = threading.Lock()
+
+
+def _build_lock(path):
+    with _build_locks_guard:
+        return _build_locks.setdefault(str(path), threading.RLock())
+
+
+# ------------------------------------------------
+# Timestamp helpers
+# ------------------------------------------------
+def parse_clock(value):
+    """'HH:MM:SS.ss' (or 'MM:SS.s') -> seconds, NaN when missing."""
+    if value is None or value == "":
+        return np.nan
+    if isinstance(value, (int, float)):
+        return float(value)
+    seconds = 0.0
+    for part in str(value).split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def format_clock(seconds):
+    if seconds is None or np.isnan(seconds):
+        return None
+    h, rem = divmod(float(seconds), 3600)
+    m, s = divmod(rem, 60)
+    return f"{int(h):02d}:{int(m):02d}:{s:05.2f}"
+
+
+# ------------------------------------------------
+# Columnar tracking arrays
+# ------------------------------------------------
+class TrackingArrays:
+    """Column view over a match's tracking data.
+
+    Behaves like the list of frame dicts returned by the JSONL loader
+    (len, indexing, slicing, iteration) so existing code keeps working,
+    while array-aware code reads the columns directly:
+
+        frame      (F,)       int64
+        timestamp  (F,)       float64 seconds, NaN when missing
+        period     (F,)       int8, 0 when missing
+        player_ids (P,)       int64, column order of xy/valid
+        xy         (F, P, 2)  float64, NaN where the player is not tracked
+        ball       (F, 3)     float64 x/y/z, NaN when missing
+        valid      (F, P)     bool
+    """
+
+    def __init__(self, frame, timestamp, period, player_ids, xy, ball, valid):
+        self.frame = frame
+        self.timestamp = timestamp
+        self.period = period
+        self.player_ids = player_ids
+        self.xy = xy
+        self.ball = ball
+        self.valid = valid
+
+    def __len__(self):
+        return len(self.frame)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._frame_dict(i)
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            if key < 0:
+                key += len(self)
+            if not 0 <= key < len(self):
+                raise IndexError("frame index out of range")
+            return self._frame_dict(int(key))
+        # slices stay zero-copy views, masks/index arrays copy only the selection
+        return TrackingArrays(self.frame[key], self.timestamp[key], self.period[key],
+                              self.player_ids, self.xy[key], self.ball[key], self.valid[key])
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in CACHE_ARRAYS)
+
+    def has_players(self):
+        """Boolean mask of frames with at least one tracked player."""
+        return self.valid.any(axis=1)
+
+    def frame_positions(self, i):
+        """(player_ids, xy) of the players tracked in frame i."""
+        mask = self.valid[i]
+        return self.player_ids[mask], np.asarray(self.xy[i][mask], dtype=float)
+
+    def _frame_dict(self, i):
+        pids, xy = self.frame_positions(i)
+        bx, by, bz = (None if np.isnan(v) else float(v) for v in self.ball[i])
+        return {
+            "frame": int(self.frame[i]),
+            "timestamp": format_clock(self.timestamp[i]),
+            "period": int(self.period[i]) or None,
+            "ball_data": {"x": bx, "y": by, "z": bz},
+            "player_data": [{"x": float(x), "y": float(y), "player_id": int(pid)}
+                            for pid, (x, y) in zip(pids, xy)],
+        }
+
+
+def frame_positions(frames):
+    """Yield (player_ids, xy) per frame for frame dicts or TrackingArrays."""
+    if isinstance(frames, TrackingArrays):
+        for i in range(len(frames)):
+            yield frames.frame_positions(i)
+        return
+    for f in frames:
+        pids, xy = [], []
+        for p in f.get("player_data") or []:
+            if p.get("player_id") is None or p.get("x") is None or p.get("y") is None:
+                continue
+            pids.append(p["player_id"])
+            xy.append((p["x"], p["y"]))
+        yield np.array(pids), np.array(xy, dtype=float).reshape(-1, 2)
+
+
+def _source_stamp(path):
+    st = os.stat(path)
+    return {"format": CACHE_FORMAT, "source": path.name, "mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+
+def data_fingerprint(match_id=MATCH_ID):
+    """Identity of a match's data from file stamps alone (nothing is read or parsed)."""
+    paths = match_paths(match_id)
+    stamps = {}
+    for name in ("tracking", "match", "phases"):
+        path = paths[name]
+        if path.exists():
+            stamps[name] = _source_stamp(path)
+        elif name == "tracking":
+            # only the columnar cache is on this machine: use the stamp it was built from
+            try:
+                with open(cache_path(path) / "source.json", "r", encoding="utf-8") as fh:
+                    stamps[name] = json.load(fh)
+            except (OSError, ValueError):
+                stamps[name] = None
+        else:
+            stamps[name] = None
+    return hashlib.sha256(json.dumps(stamps, sort_keys=True).encode()).hexdigest()
+
+
+def cache_path(tracking_file=TRACKING_FILE):
+    tracking_file = Path(tracking_file)
+    return tracking_file.parent / CACHE_DIRNAME / tracking_file.stem
+
+
+def build_tracking_cache(tracking_file=TRACKING_FILE):
+    """Parse the tracking JSONL once and write it as columnar .npy arrays."""
+    tracking_file = Path(tracking_file)
+    target = cache_path(tracking_file)
+    with _build_lock(target), stage("load.build_cache", file=tracking_file.name) as info:
+        frame, timestamp, period, ball = [], [], [], []
+        offsets, lengths = [], []
+        rows = []  # per frame: (player_ids, xs, ys)
+        pid_set = set()
+        for start, size, fr in iter_records(tracking_file):
+            offsets.append(start); lengths.append(size)
+            frame.append(fr.get("frame", -1))
+            timestamp.append(parse_clock(fr.get("timestamp")))
+            period.append(fr.get("period") or 0)
+            b = fr.get("ball_data") or {}
+            ball.append([np.nan if b.get(k) is None else b[k] for k in ("x", "y", "z")])
+
+            pids, xs, ys = [], [], []
+            for p in fr.get("player_data") or []:
+                if p.get("player_id") is None or p.get("x") is None or p.get("y") is None:
+                    continue
+                pids.append(p["player_id"]); xs.append(p["x"]); ys.append(p["y"])
+            pid_set.update(pids)
+            rows.append((pids, xs, ys))
+
+        player_ids = np.array(sorted(pid_set), dtype=np.int64)
+        col = {pid: j for j, pid in enumerate(player_ids.tolist())}
+        xy = np.full((len(rows), len(player_ids), 2), np.nan, dtype=np.float64)
+        valid = np.zeros((len(rows), len(player_ids)), dtype=bool)
+        for i, (pids, xs, ys) in enumerate(rows):
+            if not pids:
                 continue
-            frames.append(json.loads(line))
+            cols = [col[pid] for pid in pids]
+            xy[i, cols, 0] = xs
+            xy[i, cols, 1] = ys
+            valid[i, cols] = True
+
+        arrays = {
+            "frame": np.array(frame, dtype=np.int64),
+            "timestamp": np.array(timestamp, dtype=np.float64),
+            "period": np.array(period, dtype=np.int8),
+            "player_ids": player_ids,
+            "xy": xy,
+            "ball": np.array(ball, dtype=np.float64).reshape(-1, 3),
+            "valid": valid,
+        }
+
+        # write into a scratch folder of our own and swap it in, so readers never see half a cache
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = Path(tempfile.mkdtemp(prefix=f"{target.name}.tmp-", dir=target.parent))
+        try:
+            for name, arr in arrays.items():
+                np.save(tmp / f"{name}.npy", arr)
+            with open(tmp / "source.json", "w", encoding="utf-8") as fh:
+                json.dump(_source_stamp(tracking_file), fh)
+            info["bytes_written"] = sum(f.stat().st_size for f in tmp.iterdir())
+            shutil.rmtree(target, ignore_errors=True)
+            try:
+                os.replace(tmp, target)
+            except OSError:
+                # another process swapped its build in first; fine if it is current
+                if not cache_is_fresh(tracking_file):
+                    raise
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+        # the byte-offset index falls out of the same pass, so refresh it too
+        _save_frame_index(tracking_file, arrays["frame"], arrays["period"], arrays["timestamp"],
+                          np.array(offsets, dtype=np.int64), np.array(lengths, dtype=np.int64))
+
+        info.update(frames=len(rows), players=len(player_ids), bytes_read=os.path.getsize(tracking_file))
+    return target
+
+
+def cache_is_fresh(tracking_file=TRACKING_FILE):
+    target = cache_path(tracking_file)
+    try:
+        with open(target / "source.json", "r", encoding="utf-8") as fh:
+            stamp = json.load(fh)
+    except (OSError, ValueError):
+        return False
+    if not Path(tracking_file).exists():
+        # raw JSONL not on this machine: the cache is all we have
+        return stamp.get("format") == CACHE_FORMAT
+    return stamp == _source_stamp(Path(tracking_file))
 
-    print(f"Loaded {len(frames):,} tracking frames.")
+
+def open_tracking_cache(tracking_file=TRACKING_FILE):
+    """Memory-map the columnar cache, rebuilding it if the JSONL changed."""
+    if not cache_is_fresh(tracking_file):
+        with _build_lock(cache_path(tracking_file)):
+            if not cache_is_fresh(tracking_file):  # another thread may have just built it
+                build_tracking_cache(tracking_file)
+    target = cache_path(tracking_file)
+    return TrackingArrays(**{name: np.load(target / f"{name}.npy", mmap_mode="r")
+                             for name in CACHE_ARRAYS})
+
+
+# ------------------------------------------------
+# Byte-offset frame index (sidecar next to the JSONL)
+# ------------------------------------------------
+_FRAME_RE = re.compile(rb'"frame"\s*:\s*(-?\d+)')
+_PERIOD_RE = re.compile(rb'"period"\s*:\s*(null|\d+)')
+_TIMESTAMP_RE = re.compile(rb'"timestamp"\s*:\s*(?:null|"([^"]*)")')
+
+
+class FrameIndex:
+    """frame / period / timestamp -> byte offset of each line in the JSONL.
+
+    Rows follow file order; within a period timestamps increase, so clock
+    lookups are a binary search over that period's block of rows.
+    """
+
+    def __init__(self, frame, period, timestamp, offset, length):
+        self.frame = frame
+        self.period = period
+        self.timestamp = timestamp
+        self.offset = offset
+        self.length = length
+
+    def __len__(self):
+        return len(self.frame)
+
+    def row_of_frame(self, frame):
+        """Row of the first line whose frame number is >= frame."""
+        return int(np.searchsorted(self.frame, frame, side="left"))
+
+    def rows_for_window(self, start=None, end=None, period=None):
+        """[(lo, hi), ...] row ranges covering the window, one per period block.
+
+        The match clock restarts every period, so without a period the window
+        is taken from each period in turn (as read_window does).
+        """
+        if period is None and start is None and end is None:
+            return [(0, len(self))]
+        periods = [period] if period is not None else sorted(p for p in set(self.period.tolist()) if p)
+        ranges = []
+        for p in periods:
+            rows = np.flatnonzero(self.period == p)
+            if not len(rows):
+                continue
+            lo, hi = int(rows[0]), int(rows[-1]) + 1
+            ts = self.timestamp[lo:hi]
+            a = lo + int(np.searchsorted(ts, start, side="left")) if start is not None else lo
+            b = lo + int(np.searchsorted(ts, end, side="left")) if end is not None else hi
+            if a < b:
+                ranges.append((a, b))
+        return ranges
+
+    def range_bytes(self, ranges):
+        """Bytes of the JSONL covered by row ranges."""
+        return int(sum(self.offset[hi - 1] + self.length[hi - 1] - self.offset[lo] for lo, hi in ranges if lo < hi))
+
+
+def index_path(tracking_file=TRACKING_FILE):
+    tracking_file = Path(tracking_file)
+    return tracking_file.with_name(f"{tracking_file.stem}.index.npz")
+
+
+def _save_frame_index(tracking_file, frame, period, timestamp, offset, length):
+    target = index_path(tracking_file)
+    fd, tmp = tempfile.mkstemp(prefix=f"{target.stem}.tmp-", suffix=".npz", dir=target.parent)
+    os.close(fd)
+    try:
+        np.savez(tmp, frame=frame, period=period, timestamp=timestamp, offset=offset, length=length,
+                 source=np.array(json.dumps(_source_stamp(Path(tracking_file)))))
+        os.replace(tmp, target)
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+    return target
+
+
+def build_frame_index(tracking_file=TRACKING_FILE):
+    """Scan the JSONL for line offsets without decoding the frames."""
+    tracking_file = Path(tracking_file)
+    with stage("load.build_index", file=tracking_file.name) as info:
+        frame, period, timestamp, offset, length = [], [], [], [], []
+        with open(tracking_file, "rb") as f:
+            pos = 0
+            for raw in f:
+                start, pos = pos, pos + len(raw)
+                if not raw.strip():
+                    continue
+                m_frame, m_period, m_ts = _FRAME_RE.search(raw), _PERIOD_RE.search(raw), _TIMESTAMP_RE.search(raw)
+                if m_frame and m_period and m_ts:
+                    frame.append(int(m_frame.group(1)))
+                    period.append(0 if m_period.group(1) == b"null" else int(m_period.group(1)))
+                    ts = m_ts.group(1)
+                    timestamp.append(parse_clock(ts.decode() if ts is not None else None))
+                else:
+                    # unusual key layout: fall back to a real decode for this line
+                    fr = json.loads(raw)
+                    frame.append(fr.get("frame", -1))
+                    period.append(fr.get("period") or 0)
+                    timestamp.append(parse_clock(fr.get("timestamp")))
+                offset.append(start); length.append(len(raw))
+
+        target = _save_frame_index(tracking_file, np.array(frame, dtype=np.int64), np.array(period, dtype=np.int8),
+                                   np.array(timestamp, dtype=np.float64), np.array(offset, dtype=np.int64),
+                                   np.array(length, dtype=np.int64))
+        info.update(frames=len(frame), bytes_read=pos)
+    return target
+
+
+def _read_frame_index(tracking_file):
+    try:
+        with np.load(index_path(tracking_file)) as z:
+            if json.loads(str(z["source"])) != _source_stamp(Path(tracking_file)):
+                return None
+            return FrameIndex(z["frame"], z["period"], z["timestamp"], z["offset"], z["length"])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def load_frame_index(tracking_file=TRACKING_FILE, build=True):
+    """The sidecar index, (re)built when missing or older than the JSONL."""
+    index = _read_frame_index(tracking_file)
+    if index is None and build:
+        with _build_lock(index_path(tracking_file)):
+            index = _read_frame_index(tracking_file)  # another thread may have just built it
+            if index is None:
+                build_frame_index(tracking_file)
+                index = _read_frame_index(tracking_file)
+    return index
+
+
+def _iter_index_rows(tracking_file, index, ranges):
+    """Seek to each row range and decode only those lines."""
+    with open(tracking_file, "rb") as f:
+        for lo, hi in ranges:
+            if lo >= hi:
+                continue
+            f.seek(int(index.offset[lo]))
+            end = int(index.offset[hi - 1] + index.length[hi - 1])
+            yield from decode_lines(_range_lines(f, end))
+
+
+def _range_lines(f, end):
+    while f.tell() < end:
+        line = f.readline().strip()
+        if line:
+            yield line
+
+
+# ------------------------------------------------
+# Windowed reads
+# ------------------------------------------------
+def _in_window(period, seconds, start, end, want_period):
+    """-1 outside the window, 0 inside, 1 past it for good (reading can stop).
+
+    The clock restarts every period, so without want_period the window
+    recurs in each period and reading only stops at the end of the file.
+    """
+    if want_period is not None:
+        if not period or period < want_period:
+            return -1
+        if period > want_period:
+            return 1
+    if start is None and end is None:
+        return 0
+    if seconds is None or np.isnan(seconds):
+        return -1
+    if start is not None and seconds < start:
+        return -1
+    if end is not None and seconds >= end:
+        return 1 if want_period is not None else -1
+    return 0
+
+
+def iter_tracking(start=None, end=None, period=None, valid_only=True,
+                  max_frames=None, tracking_file=TRACKING_FILE, use_index=True):
+    """Lazily yield frame dicts from the JSONL for a window of the match.
+
+    start/end are match-clock seconds ([start, end)) read from each frame's
+    timestamp, in every period unless one is given (the clock restarts each
+    period). valid_only skips frames without player data. Reading stops as
+    soon as the window of the given period (or max_frames) is complete.
+    With use_index (and a fresh sidecar index) the reader seeks straight to
+    the window instead of scanning from the start of the file.
+    """
+    if max_frames is not None and max_frames <= 0:
+        return
+    index = load_frame_index(tracking_file, build=False) if use_index else None
+    if index is not None:
+        lines = _iter_index_rows(tracking_file, index, index.rows_for_window(start, end, period))
+    else:
+        lines = iter_frames(tracking_file)
+    yielded = 0
+    for fr in lines:
+        where = _in_window(fr.get("period"), parse_clock(fr.get("timestamp")), start, end, period)
+        if where > 0:
+            return
+        if where < 0 or (valid_only and not fr.get("player_data")):
+            continue
+        yield fr
+        yielded += 1
+        if max_frames is not None and yielded >= max_frames:
+            return
+
+
+def read_window(start=None, end=None, period=None, valid_only=True,
+                max_frames=None, tracking_file=TRACKING_FILE):
+    """Frames for a window: a slice of the columnar cache if it is fresh,
+    otherwise only the needed part of the JSONL streamed via iter_tracking."""
+    if not cache_is_fresh(tracking_file):
+        return list(iter_tracking(start, end, period, valid_only, max_frames, tracking_file))
+
+    arrays = open_tracking_cache(tracking_file)
+    mask = np.ones(len(arrays), dtype=bool)
+    if period is not None:
+        mask &= arrays.period == period
+    if start is not None or end is not None:
+        ts = arrays.timestamp
+        with np.errstate(invalid="ignore"):
+            if start is not None:
+                mask &= ts >= start
+            if end is not None:
+                mask &= ts < end
+    if valid_only:
+        mask &= arrays.has_players()
+    idx = np.flatnonzero(mask)
+    if max_frames is not None:
+        idx = idx[:max(max_frames, 0)]
+    if len(idx) and idx[-1] - idx[0] + 1 == len(idx):
+        return arrays[idx[0]:idx[-1] + 1]  # contiguous: keep it a zero-copy view
+    return arrays[idx]
+
+
+# ------------------------------------------------
+# Loaders
+# ------------------------------------------------
+def load_tracking(use_cache=True, start=None, end=None, period=None, match_id=MATCH_ID):
+    """Tracking frames for the match.
+
+    With use_cache (default) this returns TrackingArrays backed by the
+    memory-mapped columnar cache; otherwise the JSONL is decoded into a
+    list of frame dicts as before.
+
+    Passing a window (start/end match-clock seconds and/or period) returns
+    only its frames: a slice of the cache when it is fresh, otherwise the
+    lines found through the sidecar frame index. Without a period the window
+    is taken from every period, since the clock restarts in each.
+    """
+    tracking_file = match_paths(match_id)["tracking"]
+    with stage("load.tracking", match_id=match_id) as info:
+        if start is not None or end is not None or period is not None:
+            if use_cache and cache_is_fresh(tracking_file):
+                info["source"] = "cache_window"
+                frames = read_window(start, end, period, valid_only=False, tracking_file=tracking_file)
+            else:
+                index = load_frame_index(tracking_file)
+                rows = index.rows_for_window(start, end, period)
+                info.update(source="index_window", bytes_read=index.range_bytes(rows))
+                frames = list(_iter_index_rows(tracking_file, index, rows))
+        elif use_cache:
+            info["source"] = "cache"
+            frames = open_tracking_cache(tracking_file)
+        else:
+            info.update(source="jsonl", bytes_read=os.path.getsize(tracking_file))
+            frames = list(iter_frames(tracking_file))
+        info["frames"] = len(frames)
     return frames
 
 
-def load_match_metadata():
-    print("Loading match metadata...")
-    with open(MATCH_FILE, "r", encoding="utf-8") as f:
-        meta = json.load(f)
-    print("Match metadata loaded.")
+def load_match_metadata(match_id=MATCH_ID):
+    path = match_paths(match_id)["match"]
+    with stage("load.metadata", match_id=match_id, bytes_read=os.path.getsize(path)):
+        with open(path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
     return meta
 
 
-
-def load_events():
-    print("Loading dynamic events CSV...")
-    df_events = pd.read_csv(EVENTS_FILE)
-    print(f"Loaded {len(df_events):,} events.")
+def load_events(match_id=MATCH_ID):
+    path = match_paths(match_id)["events"]
+    with stage("load.events", match_id=match_id, bytes_read=os.path.getsize(path)) as info:
+        df_events = pd.read_csv(path)
+        info["rows"] = len(df_events)
     return df_events
 
 
-def load_phases():
-    print("Loading phases of play CSV...")
-    df_phases = pd.read_csv(PHASES_FILE)
-    print(f"Loaded {len(df_phases):,} phases.")
+def load_phases(match_id=MATCH_ID):
+    path = match_paths(match_id)["phases"]
+    with stage("load.phases", match_id=match_id, bytes_read=os.path.getsize(path)) as info:
+        df_phases = pd.read_csv(path)
+        info["rows"] = len(df_phases)
     return df_phases
 
 
 if __name__ == "__main__":
+    configure_logging(fmt="text")
     tracking = load_tracking()
     meta = load_match_metadata()
     events = load_events()
     phases = load_phases()
 
-    print("\nEverything loaded successfully!")
+    logging.getLogger(__name__).info("Everything loaded successfully!")
@@ -1,75 +1,302 @@
 # model1.py - Dynamic Tactical Shape Analysis (5-minute window)
 # Uses model0_load_data.py for loading
 
+import os
+import logging
 import numpy as np
-import matplotlib.pyplot as plt
 from pathlib import Path
 from scipy.spatial import ConvexHull
-from ml.model0_load_data import load_tracking, load_match_metadata
+from itertools import islice
+from concurrent.futures.process import BrokenProcessPool
+from config import Config
+from ml.model0_load_data import (
+    load_tracking, load_match_metadata, frame_positions, read_window, TrackingArrays, match_id_of, match_paths,
+)
+from ml.player_registry import get_registry
+from ml.phases import select_phase_frames, phase_segments
+from ml.model2_real import step_distances
+from ml.plotting import pyplot
+from ml.pools import discard_pool, get_pool
+from ml.timeseries import as_array, as_series
+from utils.telemetry import configure_logging, stage
 
 
+MODEL_VERSION = "6"  # bump when outputs change so cached results are not reused
 FPS = 25  # SkillCorner default
+PARALLEL_MIN_FRAMES = 5000  # below this, pool start-up costs more than it saves
+CHUNKS_PER_WORKER = 4
+
+log = logging.getLogger(__name__)
 
 # ------------------------------------------------
 # Select valid frames and limit to first N minutes
 # ------------------------------------------------
-def select_valid_frames(frames, n_minutes=5):
-    valid_frames = [f for f in frames if f.get("player_data") and len(f["player_data"]) > 0]
-    max_frames = int(n_minutes * 60 * FPS)
-    return valid_frames[:max_frames]
+def select_valid_frames(frames=None, n_minutes=5, phase=None, meta=None):
+    """Frames with player data, up to n_minutes of them (None = all).
+
+    With a phase filter only frames inside the matching phases of play count.
+    """
+    max_frames = int(n_minutes * 60 * FPS) if n_minutes is not None else None
+    if phase:
+        return select_phase_frames(select_valid_frames(frames, None, meta=meta), phase, meta)[:max_frames]
+    if frames is None:
+        # nothing in memory: read just the window, stopping once it is full
+        return read_window(valid_only=True, max_frames=max_frames,
+                           tracking_file=match_paths(match_id_of(meta))["tracking"])
+    if isinstance(frames, TrackingArrays):
+        return frames[np.flatnonzero(frames.has_players())[:max_frames]]
+    valid_frames = (f for f in frames if f.get("player_data") and len(f["player_data"]) > 0)
+    return list(islice(valid_frames, max_frames))
+
+def team_position_array(frames, team_id=None, registry=None):
+    """(frames x players x 2) positions of one team (all players without a team/registry)."""
+    if registry is not None and len(registry):
+        xy = registry.dense_positions(frames)
+        return xy[:, registry.team_slots(team_id)] if team_id is not None else xy
+    if isinstance(frames, TrackingArrays):
+        return np.asarray(frames.xy, dtype=float)
+    per_frame = list(frame_positions(frames))
+    col = {}
+    for pids, _ in per_frame:
+        for pid in pids.tolist():
+            col.setdefault(pid, len(col))
+    xy = np.full((len(per_frame), len(col), 2), np.nan)
+    for i, (pids, players) in enumerate(per_frame):
+        for pid, point in zip(pids.tolist(), players):
+            xy[i, col[pid]] = point
+    return xy
 
 # ------------------------------------------------
 # Team Compactness (Convex Hull area)
 # ------------------------------------------------
+def _hull_areas(xy):
+    """Hull area per frame for one (frames x players x 2) block; runs in pool workers."""
+    areas = np.full(len(xy), np.nan)
+    valid = ~np.isnan(xy).any(axis=2)
+    for i in range(len(xy)):
+        players = xy[i][valid[i]]
+        if len(players) < 3:
+            continue
+        try:
+            areas[i] = ConvexHull(players).volume  # in 2-D .volume is the area, .area the perimeter
+        except Exception:
+            pass
+    return areas
+
+
+def resolve_workers(workers=None):
+    workers = Config.COMPACTNESS_WORKERS if workers is None else workers
+    return workers if workers and workers > 0 else (os.cpu_count() or 1)
+
+
+def hull_areas(blocks, workers=None):
+    """Hull areas for several (frames x players x 2) blocks, e.g. one per team.
+
+    Frames are split into chunks and spread over a process pool; results come
+    back in order. Small windows (or workers=1) stay serial.
+    """
+    workers = resolve_workers(workers)
+    total = sum(len(b) for b in blocks)
+    if workers <= 1 or total < PARALLEL_MIN_FRAMES:
+        return [_hull_areas(b) for b in blocks]
+
+    n_chunks = max(1, workers * CHUNKS_PER_WORKER // len(blocks))
+    chunks = [np.array_split(b, n_chunks) for b in blocks]
+    try:
+        flat = list(get_pool("compactness", workers).map(_hull_areas, [c for cs in chunks for c in cs]))
+    except BrokenProcessPool:
+        log.warning("Compactness pool failed, falling back to serial mode.")
+        discard_pool("compactness")
+        return [_hull_areas(b) for b in blocks]
+    return [np.concatenate(flat[i * n_chunks:(i + 1) * n_chunks]) for i in range(len(blocks))]
+
+
+def compute_team_compactness(frames, team_id=None, registry=None, workers=None):
+    # Use all players when no team_id / registry is given
+    xy = team_position_array(frames, team_id, registry)
+    return hull_areas([xy], workers)[0].tolist()
+
+
+def compute_compactness_by_team(frames, registry, team_ids, workers=None, xy=None):
+    """Compactness for several teams from one position array, hulls computed once per team/frame."""
+    if xy is None:
+        xy = registry.dense_positions(frames)
+    areas = hull_areas([xy[:, registry.team_slots(t)] for t in team_ids], workers)
+    return {t: a.tolist() for t, a in zip(team_ids, areas)}
+
+
 # ------------------------------------------------
-# Team Compactness (Convex Hull area)
+# Defensive Line Height
 # ------------------------------------------------
-def compute_team_compactness(frames, team_id=None):
-    compactness = []
+def frame_periods(frames):
+    if isinstance(frames, TrackingArrays):
+        return np.asarray(frames.period, dtype=int)
+    return np.array([f.get("period") or 0 for f in frames], dtype=int)
 
-    for f in frames:
-        # Use all players, ignore team_id if not present
-        players = [[p["x"], p["y"]] for p in f["player_data"] if p.get("x") is not None]
 
-        if len(players) < 3:
-            compactness.append(np.nan)
-            continue
+def _defended_half(xy):
+    """+1.0 if the mean x of xy is on the -x half, -1.0 if on the +x half, None if nothing is tracked."""
+    if xy is None or not np.isfinite(xy[..., 0]).any():
+        return None
+    return 1.0 if np.nanmean(xy[..., 0]) <= 0 else -1.0
 
-        try:
-            hull = ConvexHull(np.array(players))
-            compactness.append(hull.area)
-        except:
-            compactness.append(np.nan)
 
-    return compactness
+def attack_signs(meta, side, periods, xy=None, keeper_xy=None):
+    """Per frame: +1 where the team attacks left-to-right (own goal at -x), else -1.
+
+    Uses match.json home_team_side per period, so the back line flips at
+    half-time. Without it (or without a side to read it for), the team is
+    assumed to defend the half its goalkeeper (keeper_xy), else its players
+    (xy), occupy in that period; a period with neither is taken as the
+    previous one flipped. Guessed orientations are logged as a warning.
+    """
+    home_sides = (meta or {}).get("home_team_side") or []
+    signs = np.ones(len(periods))
+    guessed = []
+    previous = None
+    for period in np.unique(periods):
+        sel = periods == period
+        home_dir = home_sides[period - 1] if 1 <= period <= len(home_sides) else None
+        if side in ("home", "away") and home_dir in ("left_to_right", "right_to_left"):
+            home_sign = 1.0 if home_dir == "left_to_right" else -1.0
+            sign = home_sign if side == "home" else -home_sign
+        else:
+            sign = _defended_half(None if keeper_xy is None else keeper_xy[sel])
+            if sign is None:
+                sign = _defended_half(None if xy is None else xy[sel])
+            if sign is None:
+                sign = 1.0 if previous is None else -previous
+            guessed.append(int(period))
+        signs[sel] = previous = sign
+    if guessed:
+        log.warning("no home_team_side for %s in period(s) %s; attacking direction inferred from positions",
+                    side or "unknown side", guessed)
+    return signs
+
+
+def defensive_line_arrays(xy, signs, pitch_length=105.0, n_defenders=4):
+    """Line height and depth for every frame at once.
+
+    xy is one team's (frames x players x 2) array. The back line is the
+    n_defenders players closest to their own goal, picked with a partial
+    sort. Height is the line's mean distance from the goal line. Depth is
+    the gap between its deepest and highest player.
+    """
+    n_frames = len(xy)
+    k = min(n_defenders, xy.shape[1])
+    if k == 0:
+        return np.full(n_frames, np.nan), np.full(n_frames, np.nan)
+
+    forward = xy[..., 0] * signs[:, None]               # distance "up the pitch" from the centre line
+    forward = np.where(np.isnan(forward), np.inf, forward)
+    back = np.partition(forward, k - 1, axis=1)[:, :k]  # k deepest players, unordered
+    tracked = np.isfinite(back)
+    count = tracked.sum(axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(tracked, back, 0.0).sum(axis=1) / count
+        height = np.where(count > 0, pitch_length / 2 + mean, np.nan)
+        depth = np.where(count > 0,
+                         np.where(tracked, back, -np.inf).max(axis=1) - np.where(tracked, back, np.inf).min(axis=1),
+                         np.nan)
+    return height, depth
+
+
+def compute_defensive_line(frames, meta, registry, team_ids, xy=None):
+    """{team_id: {"height": array, "depth": array}} from one position array, goalkeepers excluded."""
+    if xy is None:
+        xy = registry.dense_positions(frames)
+    periods = frame_periods(frames)
+    outfield = ~registry.goalkeeper_mask()
+    pitch_length = float((meta or {}).get("pitch_length") or 105.0)
+    lines = {}
+    for team_id in team_ids:
+        slots = registry.team_slots(team_id)
+        team_xy = xy[:, slots[outfield[slots]]]
+        side = "home" if team_id == registry.home_team_id else "away"
+        signs = attack_signs(meta, side, periods, team_xy, xy[:, slots[~outfield[slots]]])
+        height, depth = defensive_line_arrays(team_xy, signs, pitch_length)
+        lines[team_id] = {"height": height, "depth": depth}
+    return lines
+
+
+def compute_defensive_line_height(frames, team_id=None, registry=None, meta=None):
+    if team_id is not None and registry is not None and len(registry):
+        return compute_defensive_line(frames, meta, registry, [team_id])[team_id]["height"].tolist()
+
+    # Use all players when no team_id / registry is given
+    xy = team_position_array(frames)
+    height, _ = defensive_line_arrays(xy, attack_signs(meta, None, frame_periods(frames), xy))
+    return height.tolist()
 
 
 # ------------------------------------------------
-# Defensive Line Height
+# Numeric results
 # ------------------------------------------------
-def compute_defensive_line_height(frames, team_id=None):
-    heights = []
+def _nanmean_rows(values):
+    counts = (~np.isnan(values)).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.nansum(values, axis=1) / counts
 
-    for f in frames:
-        # Use all players, ignore team_id
-        players = [p for p in f["player_data"] if p.get("x") is not None]
 
-        if len(players) == 0:
-            heights.append(np.nan)
-            continue
+def compute_model1(frames, meta, n_minutes=5, phase=None):
+    """Compactness, defensive line and mean speed series per team, JSON-ready.
 
-        players_sorted = sorted(players, key=lambda p: p["x"])
-        def_line = players_sorted[:4]  # take first 4 as defensive line
-        avg_y = np.mean([p["y"] for p in def_line]) if def_line else np.nan
-        heights.append(avg_y)
+    phase restricts the frames to matching phases of play (see ml.phases).
 
-    return heights
+    {"fps", "n_frames", "teams": {"A"/"B": {"team_id", "name"}},
+     "series": {metric: {"A": [...], "B": [...]}}} with None for missing frames.
+    """
+    with stage("model1.select_frames") as info:
+        frames = select_valid_frames(frames, n_minutes, phase, meta)
+        info["frames"] = len(frames)
+
+    teamA = meta["home_team"]["id"]
+    teamB = meta["away_team"]["id"]
+    registry = get_registry(meta)
+    xy = registry.dense_positions(frames)
+
+    with stage("model1.compactness", frames=len(frames)):
+        compactness = compute_compactness_by_team(frames, registry, [teamA, teamB], xy=xy)
+
+    with stage("model1.defensive_line", frames=len(frames)):
+        lines = compute_defensive_line(frames, meta, registry, [teamA, teamB], xy)
+
+    # team mean speed (m/s) over the players on the pitch in each frame
+    with stage("model1.speed", frames=len(frames)):
+        speeds = step_distances(xy, phase_segments(frames, phase, meta)) * FPS
+
+    sides = {"A": teamA, "B": teamB}
+    return {
+        "fps": FPS,
+        "n_frames": len(frames),
+        "teams": {side: {"team_id": tid, "name": (meta.get("home_team" if side == "A" else "away_team") or {}).get("name")}
+                  for side, tid in sides.items()},
+        "series": {
+            "compactness": {side: as_series(compactness[tid]) for side, tid in sides.items()},
+            "def_line_height": {side: as_series(lines[tid]["height"]) for side, tid in sides.items()},
+            "def_line_depth": {side: as_series(lines[tid]["depth"]) for side, tid in sides.items()},
+            "speed": {side: as_series(_nanmean_rows(speeds[:, registry.team_slots(tid)])) for side, tid in sides.items()},
+        },
+    }
 
 
 # ------------------------------------------------
 # Plotting
 # ------------------------------------------------
+# image name -> (series, side, title)
+PLOTS = {
+    "compactness_A.png": ("compactness", "A", "Compactness"),
+    "compactness_B.png": ("compactness", "B", "Compactness"),
+    "def_line_A.png": ("def_line_height", "A", "Defensive Line Height"),
+    "def_line_B.png": ("def_line_height", "B", "Defensive Line Height"),
+    "def_depth_A.png": ("def_line_depth", "A", "Defensive Line Depth"),
+    "def_depth_B.png": ("def_line_depth", "B", "Defensive Line Depth"),
+}
+
+
 def plot_metric(metric, title, save_path):
+    plt = pyplot()
     plt.figure(figsize=(10, 4))
     plt.plot(metric, linewidth=2)
     plt.title(title)
@@ -79,38 +306,34 @@ def plot_metric(metric, title, save_path):
     plt.savefig(save_path)
     plt.close()
 
-# ------------------------------------------------
-# Main Runner
-# ------------------------------------------------
-def run_model1(frames, meta, out_dir, n_minutes=5):
-    out_dir.mkdir(parents=True, exist_ok=True)
-
-    frames = select_valid_frames(frames, n_minutes)
-    print(f"Using {len(frames)} valid frames.")
-
-    teamA = meta["home_team"]["id"]
-    teamB = meta["away_team"]["id"]
 
-    print("Computing compactness...")
-    compA = compute_team_compactness(frames, teamA)
-    compB = compute_team_compactness(frames, teamB)
+def plot_names(data):
+    return list(PLOTS)
 
-    plot_metric(compA, f"Team {teamA} Compactness", out_dir / "compactness_A.png")
-    plot_metric(compB, f"Team {teamB} Compactness", out_dir / "compactness_B.png")
 
-    print("Computing defensive line height...")
-    dlA = compute_defensive_line_height(frames, teamA)
-    dlB = compute_defensive_line_height(frames, teamB)
+def render_plot(data, name, save_path):
+    """Render one image of PLOTS from compute_model1 output."""
+    series, side, title = PLOTS[name]
+    plot_metric(as_array(data["series"][series][side]), f"Team {data['teams'][side]['team_id']} {title}", save_path)
 
-    plot_metric(dlA, f"Team {teamA} Defensive Line Height", out_dir / "def_line_A.png")
-    plot_metric(dlB, f"Team {teamB} Defensive Line Height", out_dir / "def_line_B.png")
 
-    print("Model 1 complete! Outputs saved in:", out_dir)
+# ------------------------------------------------
+# Main Runner
+# ------------------------------------------------
+def run_model1(frames, meta, out_dir, n_minutes=5):
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    data = compute_model1(frames, meta, n_minutes)
+    for name in plot_names(data):
+        render_plot(data, name, out_dir / name)
+    log.info("Model 1 complete! Outputs saved in: %s", out_dir)
+    return data
 
 # ------------------------------------------------
 # CLI
 # ------------------------------------------------
 if __name__ == "__main__":
+    configure_logging(fmt="text")
     frames = load_tracking()
     meta = load_match_metadata()
     OUTPUT = Path("model1_output")
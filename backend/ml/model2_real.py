@@ -3,25 +3,34 @@
 Model 2 (team split)
 - Computes total distance and high-intensity sprint time per player for the full match (n_minutes=None)
 - Splits metrics by team (home vs away) using match metadata when available
-- Saves per-team plots and JSON summaries
+- Saves per-team plots and JSON summaries (compute_model2 gives the numbers alone)
 """
-import matplotlib
-matplotlib.use("Agg")   # disable GUI backend
-
 import numpy as np
-import matplotlib.pyplot as plt
 from pathlib import Path
 import json
+import logging
+import os
 import re
+from concurrent.futures.process import BrokenProcessPool
 from typing import List, Dict, Tuple, Optional, Any
 
-from ml.model0_load_data import load_tracking, load_match_metadata
+from config import Config
+from ml.model0_load_data import TrackingArrays
+from ml.match_store import get_tracking, get_match_metadata
+from ml.player_registry import get_registry
+from ml.phases import select_phase_frames, phase_segments
+from ml.plotting import pyplot
+from ml.pools import discard_pool, get_pool
+from utils.telemetry import configure_logging, stage
 
 # Config
+MODEL_VERSION = "3"
 FPS = 25
 HIGH_INTENSITY_THRESHOLD = 5.0
 OUTPUT = Path("model2_output_team")
-OUTPUT.mkdir(parents=True, exist_ok=True)
+SHARD_MIN_FRAMES = 20000  # below this, pool start-up costs more than it saves
+
+log = logging.getLogger(__name__)
 
 
 # --- Helper to sanitize team names so Windows does not crash ---
@@ -95,7 +104,27 @@ def map_meta_player_names(meta: dict) -> Dict[Any, str]:
     return name_map
 
 
-# --- Core calculation ---
+def iter_player_rows(frames):
+    """Yield, per frame, a list of (pid, x, y, team_label) for tracked players."""
+    if isinstance(frames, TrackingArrays):
+        # columnar cache: ids and coordinates are already clean
+        for i in range(len(frames)):
+            mask = frames.valid[i]
+            xy = frames.xy[i][mask].tolist()
+            yield [(pid, x, y, None) for pid, (x, y) in zip(frames.player_ids[mask].tolist(), xy)]
+        return
+    for frame in frames:
+        pd = frame.get("player_data", []) or frame.get("players", []) or []
+        rows = []
+        for p in pd:
+            pid, x, y, team_label = extract_player_fields(p)
+            if pid is None or x is None or y is None:
+                continue
+            rows.append((pid, x, y, team_label))
+        yield rows
+
+
+# --- Core calculation (reference loop, kept for parity checks) ---
 def compute_distances_and_sprints(frames: List[dict], fps: int) -> Tuple[Dict[Any,float], Dict[Any,int], Dict[Any,str]]:
     dt = 1.0 / fps
     last_pos = {}
@@ -103,12 +132,8 @@ def compute_distances_and_sprints(frames: List[dict], fps: int) -> Tuple[Dict[An
     sprints = {}
     pid_team = {}
 
-    for frame in frames:
-        pd = frame.get("player_data", []) or frame.get("players", []) or []
-        for p in pd:
-            pid, x, y, team_label = extract_player_fields(p)
-            if pid is None or x is None or y is None:
-                continue
+    for rows in iter_player_rows(frames):
+        for pid, x, y, team_label in rows:
             try: pid_key = int(pid)
             except: pid_key = pid
             if team_label is not None and pid_key not in pid_team:
@@ -130,10 +155,181 @@ def compute_distances_and_sprints(frames: List[dict], fps: int) -> Tuple[Dict[An
     return distances, sprints, pid_team
 
 
-# --- Main Runner ---
-def run(n_minutes: Optional[float] = None):
-    frames = load_tracking()
-    meta = load_match_metadata() or {}
+# --- Vectorized calculation ---
+def build_position_array(frames) -> Tuple[List[Any], np.ndarray, Dict[Any, str]]:
+    """Dense (frames x players x 2) positions, NaN where a player is not tracked."""
+    if isinstance(frames, TrackingArrays):
+        return frames.player_ids.tolist(), np.asarray(frames.xy, dtype=float), {}
+
+    rows_per_frame = list(iter_player_rows(frames))
+    col = {}
+    pid_team = {}
+    for rows in rows_per_frame:
+        for pid, _, _, team_label in rows:
+            try: pid_key = int(pid)
+            except: pid_key = pid
+            if pid_key not in col:
+                col[pid_key] = len(col)
+            if team_label is not None and pid_key not in pid_team:
+                pid_team[pid_key] = team_label
+
+    xy = np.full((len(rows_per_frame), len(col), 2), np.nan)
+    for i, rows in enumerate(rows_per_frame):
+        for pid, x, y, _ in rows:
+            try: pid_key = int(pid)
+            except: pid_key = pid
+            xy[i, col[pid_key]] = (x, y)
+    return list(col), xy, pid_team
+
+
+def step_distances(xy: np.ndarray, segment_starts=None) -> np.ndarray:
+    """Per-frame step length for every player (frames x players).
+
+    A step runs from the player's last tracked position to the current one,
+    so gaps are bridged exactly like the reference loop; NaN where there is
+    no step (player missing, or first sighting). Steps never cross a
+    segment start (e.g. between two selected phases of play).
+    """
+    n_frames, n_players = xy.shape[:2]
+    valid = ~np.isnan(xy).any(axis=2)
+    seen_at = np.where(valid, np.arange(n_frames)[:, None], -1)
+    last_seen = np.maximum.accumulate(seen_at, axis=0)
+    prev = np.vstack([np.full((1, n_players), -1), last_seen[:-1]])
+    first = np.zeros(n_frames, dtype=np.int64)
+    if segment_starts is not None and len(segment_starts):
+        first[segment_starts] = segment_starts
+        first = np.maximum.accumulate(first)
+    has_step = valid & (prev >= first[:, None])
+    d = xy - xy[np.where(has_step, prev, 0), np.arange(n_players)[None, :]]
+    return np.where(has_step, np.hypot(d[..., 0], d[..., 1]), np.nan)
+
+
+def compute_distances_and_sprints_vectorized(frames, fps: int, segment_starts=None) -> Tuple[Dict[Any,float], Dict[Any,int], Dict[Any,str]]:
+    """NumPy version of compute_distances_and_sprints (same outputs)."""
+    pids, xy, pid_team = build_position_array(frames)
+    dt = 1.0 / fps
+    steps = step_distances(xy, segment_starts)
+    with np.errstate(invalid="ignore"):
+        speeds = steps / dt
+        sprint_counts = (speeds >= HIGH_INTENSITY_THRESHOLD).sum(axis=0)
+    totals = np.nansum(steps, axis=0)
+    seen = (~np.isnan(xy).any(axis=2)).any(axis=0)
+
+    distances = {}
+    sprints = {}
+    for j, pid in enumerate(pids):
+        if seen[j]:
+            distances[pid] = float(totals[j])
+            sprints[pid] = int(sprint_counts[j])
+    return distances, sprints, pid_team
+
+
+# --- Sharded calculation (map over contiguous frame ranges, stitch at the seams) ---
+def shard_partial(xy: np.ndarray, fps: int, segment_starts=None, offset: int = 0) -> dict:
+    """Map step: totals for one contiguous shard of frames, plus the first and
+    last tracked position of every player so the reduce step can add the steps
+    that cross into the next shard. Frame indices are global (shard + offset)."""
+    n_frames, n_players = xy.shape[:2]
+    steps = step_distances(xy, segment_starts)
+    with np.errstate(invalid="ignore"):
+        sprints = (steps / (1.0 / fps) >= HIGH_INTENSITY_THRESHOLD).sum(axis=0)
+    valid = ~np.isnan(xy).any(axis=2)
+    seen = valid.any(axis=0)
+    first = valid.argmax(axis=0)
+    last = n_frames - 1 - valid[::-1].argmax(axis=0)
+    cols = np.arange(n_players)
+    return {
+        "distance": np.nansum(steps, axis=0),
+        "sprints": sprints,
+        "first": np.where(seen, first + offset, -1),
+        "last": np.where(seen, last + offset, -1),
+        "first_xy": xy[first, cols],
+        "last_xy": xy[last, cols],
+    }
+
+
+def reduce_shards(partials: List[dict], fps: int, segment_starts=None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Reduce step: (distance, sprint frames, seen) per player from shard partials in frame order.
+
+    A shard's first sighting of a player is a step from wherever that player was
+    last seen in an earlier shard - exactly the step the serial pass takes -
+    unless a segment start lies between the two frames.
+    """
+    n_players = len(partials[0]["distance"])
+    seg = np.asarray(segment_starts if segment_starts is not None else [], dtype=np.int64)
+    dt = 1.0 / fps
+    distance = np.zeros(n_players)
+    sprints = np.zeros(n_players, dtype=np.int64)
+    carry_at = np.full(n_players, -1)
+    carry_xy = np.full((n_players, 2), np.nan)
+    for part in partials:
+        link = (carry_at >= 0) & (part["first"] >= 0)
+        if len(seg):
+            link &= np.searchsorted(seg, carry_at, side="right") == np.searchsorted(seg, part["first"], side="right")
+        d = part["first_xy"] - carry_xy
+        step = np.where(link, np.hypot(d[:, 0], d[:, 1]), 0.0)
+        with np.errstate(invalid="ignore"):
+            sprints += link & (step / dt >= HIGH_INTENSITY_THRESHOLD)
+        distance = distance + step + part["distance"]
+        sprints += part["sprints"]
+        moved = part["last"] >= 0
+        carry_at = np.where(moved, part["last"], carry_at)
+        carry_xy[moved] = part["last_xy"][moved]
+    return distance, sprints, carry_at >= 0
+
+
+def resolve_shards(shards=None):
+    shards = Config.MODEL2_SHARDS if shards is None else shards
+    return shards if shards and shards > 0 else (os.cpu_count() or 1)
+
+
+def compute_distances_and_sprints_sharded(frames, fps: int, segment_starts=None,
+                                          shards: Optional[int] = None) -> Tuple[Dict[Any,float], Dict[Any,int], Dict[Any,str]]:
+    """compute_distances_and_sprints_vectorized split into contiguous frame
+    shards on a process pool (same outputs). Short windows, or shards=1, stay serial."""
+    shards = resolve_shards(shards)
+    if shards <= 1 or len(frames) < SHARD_MIN_FRAMES:
+        return compute_distances_and_sprints_vectorized(frames, fps, segment_starts)
+
+    pids, xy, pid_team = build_position_array(frames)
+    seg = np.asarray(segment_starts if segment_starts is not None else [], dtype=np.int64)
+    bounds = np.linspace(0, len(xy), min(shards, len(xy)) + 1).astype(np.int64)
+    jobs = [(xy[lo:hi], fps, seg[(seg > lo) & (seg < hi)] - lo, int(lo)) for lo, hi in zip(bounds[:-1], bounds[1:])]
+    try:
+        partials = list(get_pool("model2-shards", shards).map(shard_partial, *zip(*jobs)))
+    except BrokenProcessPool:
+        log.warning("Model 2 shard pool failed, falling back to serial mode.")
+        discard_pool("model2-shards")
+        return compute_distances_and_sprints_vectorized(frames, fps, segment_starts)
+    totals, sprint_counts, seen = reduce_shards(partials, fps, seg)
+
+    distances = {}
+    sprints = {}
+    for j, pid in enumerate(pids):
+        if seen[j]:
+            distances[pid] = float(totals[j])
+            sprints[pid] = int(sprint_counts[j])
+    return distances, sprints, pid_team
+
+
+# --- Numeric results ---
+def team_names(meta: dict) -> Tuple[str, str]:
+    home_name_raw = meta.get("home_team") or meta.get("home_name") or meta.get("home") or "TeamA"
+    away_name_raw = meta.get("away_team") or meta.get("away_name") or meta.get("away") or "TeamB"
+    return clean_team_name(home_name_raw), clean_team_name(away_name_raw)
+
+
+def compute_model2(frames, meta: Optional[dict], n_minutes: Optional[float] = None, phase: Optional[dict] = None,
+                   shards: Optional[int] = None) -> dict:
+    """Per-player distance, sprint time and fatigue split by team, JSON-ready.
+
+    {"fps_used", "teams": {"A"/"B": {"name", "players": [{"player_id", "name",
+    "distance_km", "sprint_seconds", "fatigue_score"}, ...]}}}
+    phase restricts the frames to matching phases of play (see ml.phases);
+    no distance is counted between two separate phases. shards is passed to
+    compute_distances_and_sprints_sharded (1 = serial).
+    """
+    meta = meta or {}
 
     fps_meta = None
     for k in ("fps","frame_rate","frameRate","sample_rate"):
@@ -141,22 +337,26 @@ def run(n_minutes: Optional[float] = None):
             try: fps_meta = int(meta.get(k)); break
             except: pass
     fps_use = fps_meta or FPS
-    print(f"Using FPS = {fps_use}")
 
-    valid_frames = frames if n_minutes is None else frames[: int(n_minutes * 60 * fps_use)]
+    with stage("model2.select_frames", fps=fps_use) as info:
+        valid_frames = select_phase_frames(frames, phase, meta)
+        if n_minutes is not None:
+            valid_frames = valid_frames[: int(n_minutes * 60 * fps_use)]
+        info["frames"] = len(valid_frames)
+    home_name, away_name = team_names(meta)
     if len(valid_frames) == 0:
-        raise RuntimeError("No valid frames found. Check your tracking loader output.")
+        # nothing selected (e.g. no phase matches the filter): empty player tables
+        return {"fps_used": fps_use, "teams": {"A": {"name": home_name, "players": []},
+                                               "B": {"name": away_name, "players": []}}}
 
-    distances, sprint_frames, pid_team_map_from_frames = compute_distances_and_sprints(valid_frames, fps_use)
+    with stage("model2.distances", frames=len(valid_frames)):
+        segments = phase_segments(valid_frames, phase, meta)
+        distances, sprint_frames, pid_team_map_from_frames = compute_distances_and_sprints_sharded(valid_frames, fps_use, segments, shards)
     sprint_seconds = {pid: int(frames_count) * (1.0 / fps_use) for pid, frames_count in sprint_frames.items()}
 
-    home_name_raw = meta.get("home_team") or meta.get("home_name") or meta.get("home") or "TeamA"
-    away_name_raw = meta.get("away_team") or meta.get("away_name") or meta.get("away") or "TeamB"
-
-    home_name = clean_team_name(home_name_raw)
-    away_name = clean_team_name(away_name_raw)
-
+    registry = get_registry(meta)
     id_to_name = map_meta_player_names(meta)
+    id_to_name.update({int(pid): name for pid, name in zip(registry.ids, registry.names)})
 
     home_ids = meta.get("home_players") or meta.get("home_team_player_ids") or meta.get("home_squad") or []
     away_ids = meta.get("away_players") or meta.get("away_team_player_ids") or meta.get("away_squad") or []
@@ -175,6 +375,11 @@ def run(n_minutes: Optional[float] = None):
     for pid in home_ids: pid_to_team[pid] = "A"
     for pid in away_ids: pid_to_team[pid] = "B"
 
+    for pid in set(distances) | set(sprint_seconds):
+        side = registry.side_of(pid)
+        if side is not None and pid not in pid_to_team:
+            pid_to_team[pid] = "A" if side == "home" else "B"
+
     for pid, label in pid_team_map_from_frames.items():
         if pid not in pid_to_team:
             if label in ("home","Home","H","h",1,"1"):
@@ -199,52 +404,88 @@ def run(n_minutes: Optional[float] = None):
         team_metrics[team]["sprints_seconds"][pid] = sprint_seconds.get(pid, 0.0)
         team_metrics[team]["ids"].append(pid)
 
-    for team in ("A","B"):
-        tname = team_metrics[team]["name"]
-        out_dir = OUTPUT / f"team_{team}_{tname}"
-        out_dir.mkdir(parents=True, exist_ok=True)
-
-        def plot(values_map, title, ylabel, filename, color):
-            plt.figure(figsize=(12,5))
-            items = sorted(values_map.items(), key=lambda kv: kv[1], reverse=True)
-            ids = [kv[0] for kv in items]
-            vals = [kv[1] for kv in items]
-            labels = [id_to_name.get(pid, str(pid)) for pid in ids]
-            plt.bar(range(len(vals)), vals, color=color)
-            plt.xticks(range(len(vals)), labels, rotation=45, ha="right")
-            plt.title(title); plt.ylabel(ylabel)
-            plt.tight_layout(); plt.savefig(out_dir / filename, dpi=150); plt.close()
-
-        plot(team_metrics[team]["distances"], f"Distance (km) — {tname}", "Distance (km)",
-             f"player_total_distance_{tname}.png", "#FF9999")
-        plot(team_metrics[team]["sprints_seconds"], f"Sprint Time (s) — {tname}", "Sprint Seconds",
-             f"player_sprint_seconds_{tname}.png", "#9FC5FF")
-
-        fatigue_map = {pid: (team_metrics[team]["distances"][pid] + team_metrics[team]["sprints_seconds"][pid] * 0.02)
-                       for pid in team_metrics[team]["ids"]}
-        plot(fatigue_map, f"Fatigue Score — {tname}", "Score",
-             f"player_fatigue_{tname}.png", "#FFD39F")
+    teams = {}
+    for team in ("A", "B"):
+        m = team_metrics[team]
+        teams[team] = {"name": m["name"], "players": [
+            {"player_id": pid, "name": id_to_name.get(pid), "distance_km": m["distances"][pid],
+             "sprint_seconds": m["sprints_seconds"][pid],
+             "fatigue_score": m["distances"][pid] + m["sprints_seconds"][pid] * 0.02}
+            for pid in m["ids"]
+        ]}
+    return {"fps_used": fps_use, "teams": teams}
+
+
+# --- Plotting ---
+# image kind -> (field, title, ylabel, color); images are team_<A|B>_<name>/player_<kind>_<name>.png
+PLOTS = {
+    "total_distance": ("distance_km", "Distance (km)", "Distance (km)", "#FF9999"),
+    "sprint_seconds": ("sprint_seconds", "Sprint Time (s)", "Sprint Seconds", "#9FC5FF"),
+    "fatigue": ("fatigue_score", "Fatigue Score", "Score", "#FFD39F"),
+}
+
+
+def plot_names(data: dict) -> List[str]:
+    return [f"team_{team}_{t['name']}/player_{kind}_{t['name']}.png"
+            for team, t in data["teams"].items() for kind in PLOTS]
+
+
+def render_plot(data: dict, name: str, save_path: Path):
+    """Render one image of plot_names(data) from compute_model2 output."""
+    folder, filename = name.split("/", 1)
+    team = folder.split("_")[1]
+    t = data["teams"][team]
+    kind = filename[len("player_"):-len(f"_{t['name']}.png")]
+    field, title, ylabel, color = PLOTS[kind]
+
+    plt = pyplot()
+    plt.figure(figsize=(12,5))
+    items = sorted(t["players"], key=lambda p: p[field], reverse=True)
+    vals = [p[field] for p in items]
+    labels = [p["name"] or str(p["player_id"]) for p in items]
+    plt.bar(range(len(vals)), vals, color=color)
+    plt.xticks(range(len(vals)), labels, rotation=45, ha="right")
+    plt.title(f"{title} — {t['name']}"); plt.ylabel(ylabel)
+    plt.tight_layout(); plt.savefig(save_path, dpi=150); plt.close()
 
+
+# --- Main Runner ---
+def run_model2(frames, meta: Optional[dict], out_dir: Path = OUTPUT, n_minutes: Optional[float] = None):
+    out_dir = Path(out_dir)
+    data = compute_model2(frames, meta, n_minutes)
+
+    for name in plot_names(data):
+        (out_dir / name).parent.mkdir(parents=True, exist_ok=True)
+        render_plot(data, name, out_dir / name)
+
+    for team, t in data["teams"].items():
+        tname = t["name"]
+        players = t["players"]
         summary = {
             "team_name": tname,
-            "num_players_analyzed": len(team_metrics[team]["ids"]),
-            "distances_km": {str(pid): team_metrics[team]["distances"][pid] for pid in team_metrics[team]["ids"]},
-            "sprint_seconds": {str(pid): team_metrics[team]["sprints_seconds"][pid] for pid in team_metrics[team]["ids"]},
-            "fatigue_score": {str(pid): fatigue_map[pid] for pid in fatigue_map},
-            "id_to_name": {str(pid): id_to_name.get(pid, None) for pid in team_metrics[team]["ids"]}
+            "num_players_analyzed": len(players),
+            "distances_km": {str(p["player_id"]): p["distance_km"] for p in players},
+            "sprint_seconds": {str(p["player_id"]): p["sprint_seconds"] for p in players},
+            "fatigue_score": {str(p["player_id"]): p["fatigue_score"] for p in players},
+            "id_to_name": {str(p["player_id"]): p["name"] for p in players}
         }
-        with open(out_dir / f"summary_{tname}.json", "w", encoding="utf-8") as fh:
+        with open(out_dir / f"team_{team}_{tname}" / f"summary_{tname}.json", "w", encoding="utf-8") as fh:
             json.dump(summary, fh, indent=2)
 
-    combined = {"fps_used": fps_use, "teams": {
-        "A": {"name": home_name, "num_players": len(team_metrics["A"]["ids"])},
-        "B": {"name": away_name, "num_players": len(team_metrics["B"]["ids"])}
+    combined = {"fps_used": data["fps_used"], "teams": {
+        team: {"name": t["name"], "num_players": len(t["players"])} for team, t in data["teams"].items()
     }}
-    with open(OUTPUT / "combined_summary.json", "w", encoding="utf-8") as fh:
+    with open(out_dir / "combined_summary.json", "w", encoding="utf-8") as fh:
         json.dump(combined, fh, indent=2)
 
-    print("Model2 team-split complete. Outputs are in:", OUTPUT.resolve())
+    log.info("Model2 team-split complete. Outputs are in: %s", out_dir.resolve())
+    return data
+
+
+def run(n_minutes: Optional[float] = None):
+    run_model2(get_tracking(), get_match_metadata(), OUTPUT, n_minutes)
 
 
 if __name__ == "__main__":
+    configure_logging(fmt="text")
     run(n_minutes=None)
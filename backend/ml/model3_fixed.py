@@ -1,65 +1,148 @@
 # model3_fixed.py - Pitch Control Heatmap (Working)
+import logging
 import numpy as np
-import matplotlib.pyplot as plt
 from pathlib import Path
-from ml.model0_load_data import load_tracking, load_match_metadata
+from itertools import islice
+from ml.model0_load_data import (
+    load_tracking, load_match_metadata, frame_positions, read_window, TrackingArrays, match_id_of, match_paths,
+)
+from ml.player_registry import get_registry
+from ml.phases import select_phase_frames
+from ml.plotting import pyplot
+from utils.telemetry import configure_logging, stage
 
 
+MODEL_VERSION = "3"
 FPS = 25
 FIELD_X = (-52.5, 52.5)  # meters
 FIELD_Y = (-34, 34)      # meters
+GRID_RESOLUTIONS = {
+    "coarse": (25, 16),
+    "medium": (50, 32),
+    "fine": None,  # 1 m cells over the pitch from match.json
+}
+DEFAULT_RESOLUTION = "medium"
+
+log = logging.getLogger(__name__)
 
 # ------------------------------------------------
 # Helpers
 # ------------------------------------------------
-def select_valid_frames(frames, n_minutes=5):
-    max_frames = int(n_minutes * 60 * FPS)
-    valid_frames = [f for f in frames if f.get("player_data") and len(f["player_data"]) > 0]
-    return valid_frames[:max_frames]
+def select_valid_frames(frames=None, n_minutes=5, phase=None, meta=None):
+    """Frames with player data, up to n_minutes of them (None = all).
+
+    With a phase filter only frames inside the matching phases of play count.
+    """
+    max_frames = int(n_minutes * 60 * FPS) if n_minutes is not None else None
+    if phase:
+        return select_phase_frames(select_valid_frames(frames, None, meta=meta), phase, meta)[:max_frames]
+    if frames is None:
+        # nothing in memory: read just the window, stopping once it is full
+        return read_window(valid_only=True, max_frames=max_frames,
+                           tracking_file=match_paths(match_id_of(meta))["tracking"])
+    if isinstance(frames, TrackingArrays):
+        return frames[np.flatnonzero(frames.has_players())[:max_frames]]
+    valid_frames = (f for f in frames if f.get("player_data") and len(f["player_data"]) > 0)
+    return list(islice(valid_frames, max_frames))
 
 def map_players_to_teams(frames, meta):
-    """Map player IDs to home/away sets without relying on metadata players."""
-    all_players = set()
-    for f in frames:
-        for p in f.get("player_data", []):
-            pid = p.get("player_id")
-            if pid is not None:
-                all_players.add(pid)
-    all_players = list(all_players)
+    """Map player IDs to home/away sets, from the match.json roster when available."""
+    registry = get_registry(meta)
+    if len(registry) and registry.home_team_id is not None:
+        return (registry.team_player_ids(registry.home_team_id),
+                registry.team_player_ids(registry.away_team_id))
+
+    # no roster: split whoever appears in the tracking data in half
+    if isinstance(frames, TrackingArrays):
+        all_players = frames.player_ids[frames.valid.any(axis=0)].tolist()
+    else:
+        all_players = set()
+        for f in frames:
+            for p in f.get("player_data", []):
+                pid = p.get("player_id")
+                if pid is not None:
+                    all_players.add(pid)
+        all_players = list(all_players)
     mid = len(all_players) // 2
     home_players = set(all_players[:mid])
     away_players = set(all_players[mid:])
     return home_players, away_players
 
-def compute_pitch_control(frames, home_players, away_players, grid_size=(50, 50)):
+def pitch_extent(meta=None):
+    """((x_min, x_max), (y_min, y_max)) in meters, from match.json pitch size when present."""
+    length = (meta or {}).get("pitch_length")
+    width = (meta or {}).get("pitch_width")
+    if length and width:
+        return (-length / 2, length / 2), (-width / 2, width / 2)
+    return FIELD_X, FIELD_Y
+
+def resolve_grid(size, extent):
+    """Grid (nx, ny); None means 1 m cells over the pitch."""
+    if size is None:
+        (x0, x1), (y0, y1) = extent
+        return int(round(x1 - x0)), int(round(y1 - y0))
+    return int(size[0]), int(size[1])
+
+def split_points(frames, home_players):
+    """All tracked (x, y) samples, stacked as (N x 2) for home and for everyone else."""
+    if isinstance(frames, TrackingArrays):
+        home_cols = np.isin(frames.player_ids, list(home_players))
+        home = np.asarray(frames.xy[:, home_cols][frames.valid[:, home_cols]], dtype=float)
+        away = np.asarray(frames.xy[:, ~home_cols][frames.valid[:, ~home_cols]], dtype=float)
+        return home.reshape(-1, 2), away.reshape(-1, 2)
+
+    home, away = [], []
+    for pids, xy in frame_positions(frames):
+        is_home = np.isin(pids, list(home_players)) if len(pids) else np.zeros(0, dtype=bool)
+        home.append(xy[is_home]); away.append(xy[~is_home])
+    stack = lambda parts: np.concatenate(parts) if parts else np.zeros((0, 2))
+    return stack(home), stack(away)
+
+def occupancy_counts(points, extent, grid_size):
+    """Bin (N x 2) points into an (nx, ny) count grid with one bincount."""
+    (x0, x1), (y0, y1) = extent
+    nx, ny = grid_size
+    xi = np.clip(((points[:, 0] - x0) / (x1 - x0) * nx).astype(int), 0, nx - 1)
+    yi = np.clip(((points[:, 1] - y0) / (y1 - y0) * ny).astype(int), 0, ny - 1)
+    return np.bincount(xi * ny + yi, minlength=nx * ny).reshape(nx, ny).astype(float)
+
+def compute_occupancy_grids(frames, home_players, away_players=None, meta=None, resolutions=None):
+    """Home/away occupancy and pitch control at several resolutions from one pass.
+
+    Positions are gathered once; each resolution is then a single bincount.
+    Grids are returned transposed ((ny, nx), y up) ready for imshow.
+    Anyone not in home_players counts for the away side.
+    """
+    extent = pitch_extent(meta)
+    home_pts, away_pts = split_points(frames, home_players)
+    grids = {}
+    for name, size in (resolutions or GRID_RESOLUTIONS).items():
+        size = resolve_grid(size, extent)
+        home = occupancy_counts(home_pts, extent, size)
+        away = occupancy_counts(away_pts, extent, size)
+        grids[name] = {
+            "grid_size": size,
+            "home": home.T,
+            "away": away.T,
+            "pitch_control": (home / (home + away + 1e-6)).T,  # fraction controlled by home
+        }
+    return grids, extent
+
+def compute_pitch_control(frames, home_players, away_players, grid_size=(50, 50), meta=None):
     """Simple pitch control approximation: count presence in grid."""
-    x_bins = np.linspace(FIELD_X[0], FIELD_X[1], grid_size[0])
-    y_bins = np.linspace(FIELD_Y[0], FIELD_Y[1], grid_size[1])
-    pc_home = np.zeros(grid_size)
-    pc_away = np.zeros(grid_size)
-
-    for f in frames:
-        for p in f.get("player_data", []):
-            pid = p.get("player_id")
-            x, y = p.get("x"), p.get("y")
-            if x is None or y is None or pid is None:
-                continue
-            xi = np.digitize(x, x_bins) - 1
-            yi = np.digitize(y, y_bins) - 1
-            xi = np.clip(xi, 0, grid_size[0]-1)
-            yi = np.clip(yi, 0, grid_size[1]-1)
-            if pid in home_players:
-                pc_home[xi, yi] += 1
-            else:
-                pc_away[xi, yi] += 1
-
-    # Normalize to 0-1
-    pc_sum = pc_home / (pc_home + pc_away + 1e-6)  # fraction controlled by home
-    return pc_sum.T  # transpose for plotting
-
-def plot_pitch_control(pc_grid, save_path):
+    grids, _ = compute_occupancy_grids(frames, home_players, away_players, meta, {"grid": grid_size})
+    return grids["grid"]["pitch_control"]
+
+def grids_to_json(grids):
+    return {name: {"grid_size": list(g["grid_size"]),
+                   **{kind: g[kind].tolist() for kind in ("home", "away", "pitch_control")}}
+            for name, g in grids.items()}
+
+def plot_pitch_control(pc_grid, save_path, extent=(FIELD_X, FIELD_Y)):
+    (x0, x1), (y0, y1) = extent
+    plt = pyplot()
     plt.figure(figsize=(12, 8))
-    plt.imshow(pc_grid, origin='lower', extent=(FIELD_X[0], FIELD_X[1], FIELD_Y[0], FIELD_Y[1]),
+    plt.imshow(pc_grid, origin='lower', extent=(x0, x1, y0, y1),
                cmap='coolwarm', vmin=0, vmax=1, aspect='auto')
     plt.colorbar(label='Pitch Control (Home Team)')
     plt.title("Pitch Control Heatmap")
@@ -69,26 +152,56 @@ def plot_pitch_control(pc_grid, save_path):
     plt.tight_layout()
     plt.savefig(save_path)
     plt.close()
-    print(f"Pitch Control heatmap saved: {save_path}")
+    log.info("Pitch Control heatmap saved: %s", save_path)
+
+def plot_names(data):
+    return ["pitch_control.png"] + [f"pitch_control_{name}.png" for name in data["grids"]]
+
+def render_plot(data, name, save_path):
+    """Render one image of plot_names(data) from compute_model3 output."""
+    grids = data["grids"]
+    shown = name[len("pitch_control_"):-len(".png")] if name != "pitch_control.png" else (
+        DEFAULT_RESOLUTION if DEFAULT_RESOLUTION in grids else next(iter(grids)))
+    plot_pitch_control(np.array(grids[shown]["pitch_control"]), save_path, data["extent"])
+
+# ------------------------------------------------
+# Numeric results
+# ------------------------------------------------
+def compute_model3(frames, meta, n_minutes=5, resolutions=None, phase=None):
+    """Occupancy and pitch-control grids per resolution, JSON-ready:
+    {"n_frames", "extent": [[x0, x1], [y0, y1]], "grids": grids_to_json(...)}.
+    phase restricts the frames to matching phases of play (see ml.phases)."""
+    with stage("model3.select_frames") as info:
+        frames = select_valid_frames(frames, n_minutes, phase, meta)
+        info["frames"] = len(frames)
+
+    with stage("model3.pitch_control", frames=len(frames)):
+        home_players, away_players = map_players_to_teams(frames, meta)
+        grids, extent = compute_occupancy_grids(frames, home_players, away_players, meta, resolutions or GRID_RESOLUTIONS)
+    return {"n_frames": len(frames), "extent": [list(extent[0]), list(extent[1])], "grids": grids_to_json(grids)}
 
 # ------------------------------------------------
 # Main Runner
 # ------------------------------------------------
-def run_model3(frames, meta, out_dir, n_minutes=5):
+def run_model3(frames, meta, out_dir, n_minutes=5, resolutions=None):
+    """Writes pitch_control.png and the raw grids (pitch_control_grids.npz); returns compute_model3 output."""
+    out_dir = Path(out_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
-    frames = select_valid_frames(frames, n_minutes)
-    print(f"Using {len(frames)} valid frames for pitch control.")
+    data = compute_model3(frames, meta, n_minutes, resolutions)
 
-    home_players, away_players = map_players_to_teams(frames, meta)
-    pc_grid = compute_pitch_control(frames, home_players, away_players)
-    plot_pitch_control(pc_grid, out_dir / "pitch_control.png")
+    render_plot(data, "pitch_control.png", out_dir / "pitch_control.png")
+    np.savez_compressed(out_dir / "pitch_control_grids.npz",
+                        **{f"{name}_{kind}": np.array(g[kind]) for name, g in data["grids"].items()
+                           for kind in ("home", "away", "pitch_control")})
 
-    print("Model 3 complete! Outputs saved in:", out_dir)
+    log.info("Model 3 complete! Outputs saved in: %s", out_dir)
+    return data
 
 # ------------------------------------------------
 # CLI
 # ------------------------------------------------
 if __name__ == "__main__":
+    configure_logging(fmt="text")
     frames = load_tracking()
     meta = load_match_metadata()
     OUTPUT = Path("model3_output_fixed")
@@ -0,0 +1,160 @@
+# phases.py - interval index over the phases of play
+# Phases are [frame_start, frame_end] intervals from <match>_phases_of_play.csv.
+# The index maps frames to phases with a binary search and turns a phase filter
+# ("out-of-possession low block for the away team") into merged frame ranges, so
+# metrics can be computed over just those frames.
+
+import numpy as np
+
+from ml.model0_load_data import MATCH_ID, TrackingArrays, load_phases, match_id_of, match_paths
+from ml.match_store import store
+
+# phase filter keys -> phases table column
+FILTER_COLUMNS = {
+    "in_possession": "team_in_possession_phase_type",
+    "out_of_possession": "team_out_of_possession_phase_type",
+    "team_in_possession": "team_in_possession_id",
+}
+
+
+class PhaseIndex:
+    def __init__(self, phases):
+        """phases: DataFrame with frame_start / frame_end and the FILTER_COLUMNS."""
+        phases = phases.sort_values("frame_start").reset_index(drop=True)
+        self.starts = phases["frame_start"].to_numpy(dtype=np.int64)
+        self.ends = phases["frame_end"].to_numpy(dtype=np.int64)
+        self.columns = {col: phases[col].to_numpy() for col in FILTER_COLUMNS.values() if col in phases}
+
+    def __len__(self):
+        return len(self.starts)
+
+    def phase_of(self, frames):
+        """Phase row for each frame number (-1 outside every phase), O(log n) per frame."""
+        frames = np.asarray(frames, dtype=np.int64)
+        rows = np.searchsorted(self.starts, frames, side="right") - 1
+        inside = (rows >= 0) & (frames <= self.ends[np.maximum(rows, 0)])
+        return np.where(inside, rows, -1)
+
+    def phase_at(self, frame):
+        row = int(self.phase_of([frame])[0])
+        if row < 0:
+            return None
+        out = {"frame_start": int(self.starts[row]), "frame_end": int(self.ends[row])}
+        out.update({col: values[row].item() if hasattr(values[row], "item") else values[row]
+                    for col, values in self.columns.items()})
+        return out
+
+    def select(self, in_possession=None, out_of_possession=None, team_in_possession=None):
+        """Boolean mask over phases; each argument is a value or a list of values."""
+        mask = np.ones(len(self), dtype=bool)
+        for key, wanted in (("in_possession", in_possession), ("out_of_possession", out_of_possession),
+                            ("team_in_possession", team_in_possession)):
+            if wanted is None:
+                continue
+            column = self.columns.get(FILTER_COLUMNS[key])
+            if column is None:
+                raise ValueError(f"phases table has no {FILTER_COLUMNS[key]} column")
+            wanted = wanted if isinstance(wanted, (list, tuple, set)) else [wanted]
+            mask &= np.isin(column, list(wanted))
+        return mask
+
+    def ranges(self, **phase_filter):
+        """Inclusive (k x 2) frame ranges of matching phases, touching ranges merged."""
+        mask = self.select(**phase_filter)
+        starts, ends = self.starts[mask], self.ends[mask]
+        if not len(starts):
+            return np.empty((0, 2), dtype=np.int64)
+        # a new range begins wherever a phase does not touch the previous one
+        new = np.ones(len(starts), dtype=bool)
+        new[1:] = starts[1:] > np.maximum.accumulate(ends)[:-1] + 1
+        merged_ends = np.maximum.reduceat(ends, np.flatnonzero(new))
+        return np.column_stack([starts[new], merged_ends])
+
+
+def range_of(frame_numbers, ranges):
+    """Index of the range each frame number falls in, -1 if none."""
+    frame_numbers = np.asarray(frame_numbers, dtype=np.int64)
+    if not len(ranges):
+        return np.full(len(frame_numbers), -1)
+    rows = np.searchsorted(ranges[:, 0], frame_numbers, side="right") - 1
+    inside = (rows >= 0) & (frame_numbers <= ranges[np.maximum(rows, 0), 1])
+    return np.where(inside, rows, -1)
+
+
+def frame_numbers(frames):
+    if isinstance(frames, TrackingArrays):
+        return np.asarray(frames.frame, dtype=np.int64)
+    return np.array([f.get("frame", -1) for f in frames], dtype=np.int64)
+
+
+def frames_in_ranges(frames, ranges):
+    """The frames whose frame number lies in one of the ranges.
+
+    For columnar frames each range is located with a binary search over the
+    (sorted) frame column and the rows are sliced out, so frames outside the
+    ranges are never touched.
+    """
+    if isinstance(frames, TrackingArrays):
+        numbers = np.asarray(frames.frame, dtype=np.int64)
+        lo = np.searchsorted(numbers, ranges[:, 0], side="left")
+        hi = np.searchsorted(numbers, ranges[:, 1], side="right")
+        rows = np.concatenate([np.arange(a, b) for a, b in zip(lo, hi)]) if len(ranges) else np.empty(0, int)
+        return frames[rows.astype(np.int64)]
+    frames = list(frames)
+    keep = range_of(frame_numbers(frames), ranges) >= 0
+    return [f for f, k in zip(frames, keep) if k]
+
+
+def segment_starts(frames, ranges):
+    """Positions in frames where a new (non-contiguous) phase range begins.
+
+    Movement must not be measured across these boundaries: the player did not
+    travel from the end of one selected phase to the start of the next.
+    """
+    ids = range_of(frame_numbers(frames), ranges)
+    return np.flatnonzero(np.diff(ids) != 0) + 1
+
+
+def resolve_filter(phase_filter, meta=None):
+    """Phase filter from a request: "home"/"away" become team ids, unknown keys are rejected."""
+    if not phase_filter:
+        return None
+    unknown = set(phase_filter) - set(FILTER_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown phase filter keys: {', '.join(sorted(unknown))}")
+    for key, value in phase_filter.items():
+        values = value if isinstance(value, list) else [value]
+        if not all(isinstance(v, (str, int)) and not isinstance(v, bool) for v in values):
+            raise ValueError(f"Phase filter {key} must be a string, a number or a list of them")
+    out = dict(phase_filter)
+    team = out.get("team_in_possession")
+    if team is not None:
+        sides = {side: ((meta or {}).get(f"{side}_team") or {}).get("id") for side in ("home", "away")}
+        teams = [sides.get(t, t) for t in (team if isinstance(team, (list, tuple)) else [team])]
+        # ids from a query string arrive as text
+        teams = [int(t) if isinstance(t, str) and t.isdigit() else t for t in teams]
+        out["team_in_possession"] = teams if isinstance(team, (list, tuple)) else teams[0]
+    return out
+
+
+def get_phase_index(match_id=MATCH_ID):
+    return store.get(match_id, "phases", match_paths(match_id)["phases"],
+                     lambda: PhaseIndex(load_phases(match_id)))
+
+
+def phase_ranges(phase_filter, meta=None):
+    """Frame ranges of the filter in the match meta describes."""
+    phase_filter = resolve_filter(phase_filter, meta)
+    return get_phase_index(match_id_of(meta)).ranges(**phase_filter) if phase_filter else None
+
+
+def select_phase_frames(frames, phase_filter, meta=None):
+    """Frames inside the phases matching phase_filter (all frames without a filter)."""
+    ranges = phase_ranges(phase_filter, meta)
+    return frames if ranges is None else frames_in_ranges(frames, ranges)
+
+
+def phase_segments(frames, phase_filter, meta=None):
+    """segment_starts for frames selected with phase_filter (none without a filter)."""
+    ranges = phase_ranges(phase_filter, meta)
+    return np.empty(0, dtype=np.int64) if ranges is None else segment_starts(frames, ranges)
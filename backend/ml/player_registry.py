@@ -0,0 +1,123 @@
+# player_registry.py - one dense player table per match, built from match.json
+# Maps each tracking player id to a slot 0..S-1 (home players first), with team,
+# name and role, so array code can index by slot instead of probing dicts.
+
+import threading
+import numpy as np
+
+from ml.model0_load_data import TrackingArrays
+
+
+class PlayerRegistry:
+    def __init__(self, meta):
+        meta = meta or {}
+        self.match_id = meta.get("id")
+        self.home_team_id = (meta.get("home_team") or {}).get("id")
+        self.away_team_id = (meta.get("away_team") or {}).get("id")
+
+        players = [p for p in meta.get("players") or [] if p.get("id") is not None]
+        # home side first, then by id, so slots are stable across calls
+        players.sort(key=lambda p: (p.get("team_id") != self.home_team_id, p["id"]))
+
+        self.ids = np.array([p["id"] for p in players], dtype=np.int64)
+        self.team_ids = np.array([p.get("team_id") or -1 for p in players], dtype=np.int64)
+        self.is_home = self.team_ids == (self.home_team_id if self.home_team_id is not None else -2)
+        self.names = [p.get("short_name") or " ".join(filter(None, [p.get("first_name"), p.get("last_name")]))
+                      or str(p["id"]) for p in players]
+        self.roles = [(p.get("player_role") or {}).get("acronym") for p in players]
+        self.position_groups = [(p.get("player_role") or {}).get("position_group") for p in players]
+        self.numbers = [p.get("number") for p in players]
+        self.trackable_objects = [p.get("trackable_object") for p in players]
+
+        self.slot = {int(pid): i for i, pid in enumerate(self.ids)}
+        # some feeds key player_data by trackable_object instead of player id
+        for i, obj in enumerate(self.trackable_objects):
+            if obj is not None and obj not in self.slot:
+                self.slot[int(obj)] = i
+
+    def __len__(self):
+        return len(self.ids)
+
+    def slot_of(self, pid):
+        try:
+            return self.slot.get(int(pid), -1)
+        except (TypeError, ValueError):
+            return -1
+
+    def slots_for(self, player_ids):
+        """Slot per tracking id, -1 for ids not in match.json."""
+        return np.array([self.slot_of(pid) for pid in player_ids], dtype=np.int64)
+
+    def team_of(self, pid):
+        i = self.slot_of(pid)
+        return int(self.team_ids[i]) if i >= 0 else None
+
+    def side_of(self, pid):
+        """'home', 'away' or None."""
+        i = self.slot_of(pid)
+        if i < 0:
+            return None
+        return "home" if self.is_home[i] else "away"
+
+    def name_of(self, pid, default=None):
+        i = self.slot_of(pid)
+        return self.names[i] if i >= 0 else default
+
+    def team_slots(self, team_id):
+        return np.flatnonzero(self.team_ids == team_id)
+
+    def team_player_ids(self, team_id):
+        return set(self.ids[self.team_slots(team_id)].tolist())
+
+    def goalkeeper_mask(self):
+        return np.array([role == "GK" or group == "Goalkeeper"
+                         for role, group in zip(self.roles, self.position_groups)], dtype=bool)
+
+    def dense_positions(self, frames):
+        """(frames x slots x 2) positions indexed by slot, NaN where not tracked.
+
+        Players missing from match.json are dropped.
+        """
+        if isinstance(frames, TrackingArrays):
+            slots = self.slots_for(frames.player_ids.tolist())
+            known = slots >= 0
+            xy = np.full((len(frames), len(self), 2), np.nan)
+            xy[:, slots[known]] = frames.xy[:, known]
+            return xy
+
+        frames = list(frames)
+        xy = np.full((len(frames), len(self), 2), np.nan)
+        for i, f in enumerate(frames):
+            for p in f.get("player_data") or []:
+                j = self.slot_of(p.get("player_id"))
+                if j >= 0 and p.get("x") is not None and p.get("y") is not None:
+                    xy[i, j] = (p["x"], p["y"])
+        return xy
+
+    def to_dict(self):
+        return {
+            "match_id": self.match_id,
+            "home_team_id": self.home_team_id,
+            "away_team_id": self.away_team_id,
+            "players": [
+                {"slot": i, "id": int(self.ids[i]), "team_id": int(self.team_ids[i]),
+                 "side": "home" if self.is_home[i] else "away", "name": self.names[i],
+                 "role": self.roles[i], "number": self.numbers[i]}
+                for i in range(len(self))
+            ],
+        }
+
+
+_registries = {}
+_lock = threading.Lock()
+
+
+def get_registry(meta):
+    """PlayerRegistry for a match, built once per match/roster."""
+    meta = meta or {}
+    key = (meta.get("id"), tuple(p.get("id") for p in meta.get("players") or []))
+    with _lock:
+        registry = _registries.get(key)
+        if registry is None:
+            registry = _registries[key] = PlayerRegistry(meta)
+        return registry
@@ -0,0 +1,15 @@
+# plotting.py - lazy matplotlib access for the models
+# Models compute numbers without touching matplotlib; pyplot is imported (with
+# the headless Agg backend) only when an image is actually rendered.
+
+_plt = None
+
+
+def pyplot():
+    global _plt
+    if _plt is None:
+        import matplotlib
+        matplotlib.use("Agg")  # disable GUI backend
+        import matplotlib.pyplot as plt
+        _plt = plt
+    return _plt
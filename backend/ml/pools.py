@@ -0,0 +1,31 @@
+# pools.py - long-lived process pools for the models
+# A pool is started on first use and kept, so later requests do not pay the
+# process start-up again. Each use (compactness, Model 2 shards) has its own
+# pool so it keeps its own configured size.
+
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+_pools = {}  # name -> (workers, pool)
+_lock = threading.Lock()
+
+
+def get_pool(name, workers):
+    """The pool for name, (re)started with workers processes if needed."""
+    with _lock:
+        current = _pools.get(name)
+        if current is not None and current[0] == workers:
+            return current[1]
+        if current is not None:
+            current[1].shutdown(wait=False)
+        pool = ProcessPoolExecutor(max_workers=workers)
+        _pools[name] = (workers, pool)
+        return pool
+
+
+def discard_pool(name):
+    """Drop a broken pool so the next get_pool starts a fresh one."""
+    with _lock:
+        current = _pools.pop(name, None)
+    if current is not None:
+        current[1].shutdown(wait=False)
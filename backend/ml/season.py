@@ -0,0 +1,129 @@
+# season.py - player totals over many matches
+# Each match is analysed in a worker process that loads it, runs Model 2 and
+# hands back only the per-player rows, so the parent never holds tracking data.
+# At most `workers` matches are submitted at a time: memory is bounded by the
+# pool size, not by how many matches the season has.
+
+import hashlib
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from config import Config
+from ml.model0_load_data import data_fingerprint, load_tracking, load_match_metadata
+from ml.model2_real import compute_model2
+
+MODEL_VERSION = "1"  # bump when outputs change so cached results are not reused
+TOTAL_FIELDS = ("distance_km", "sprint_seconds")
+
+log = logging.getLogger(__name__)
+
+
+def season_fingerprint(match_ids):
+    """Identity of the data behind a season: the fingerprints of all its matches."""
+    blob = ",".join(f"{m}:{data_fingerprint(m)}" for m in sorted(match_ids))
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def match_player_rows(match_id, n_minutes=None, phase=None, shards=None):
+    """Model 2 for one match, flattened to one row per player (runs in a worker)."""
+    meta = load_match_metadata(match_id)
+    data = compute_model2(load_tracking(match_id=match_id), meta, n_minutes=n_minutes, phase=phase, shards=shards)
+    return [dict(player, team=team["name"]) for team in data["teams"].values() for player in team["players"]]
+
+
+def aggregate(rows_by_match):
+    """Season rows per player: summed totals, matches played and per-match averages."""
+    players = {}
+    for match_id, rows in rows_by_match:
+        for row in rows:
+            p = players.setdefault(row["player_id"], {
+                "player_id": row["player_id"], "name": row["name"], "teams": [], "matches": 0,
+                "fatigue_score": 0.0, **{f: 0.0 for f in TOTAL_FIELDS},
+            })
+            p["matches"] += 1
+            p["name"] = p["name"] or row["name"]
+            if row["team"] not in p["teams"]:
+                p["teams"].append(row["team"])
+            for f in TOTAL_FIELDS:
+                p[f] += row[f]
+            p["fatigue_score"] += row["fatigue_score"]
+    for p in players.values():
+        p["fatigue_score"] = round(p["fatigue_score"] / p["matches"], 3)
+        p["distance_km_per_match"] = round(p["distance_km"] / p["matches"], 3)
+        for f in TOTAL_FIELDS:
+            p[f] = round(p[f], 3)
+    return sorted(players.values(), key=lambda p: -p["distance_km"])
+
+
+def _workers(workers, n_matches):
+    workers = Config.SEASON_WORKERS if workers is None else workers
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return max(1, min(workers, n_matches))
+
+
+def season_totals(match_ids, n_minutes=None, phase=None, workers=None, progress=None):
+    """Per-player totals over match_ids, each match analysed on its own.
+
+    Returns {"matches", "failed": {match_id: error}, "players"}; a match that
+    fails for any reason (bad data, a worker that died) is reported rather
+    than failing the season. progress(fraction, stage)
+    is called as matches finish.
+    """
+    match_ids = list(match_ids)
+    progress = progress or (lambda fraction, stage=None: None)
+    workers = _workers(workers, len(match_ids))
+    done, failed = [], {}
+
+    def finished(match_id, rows=None, error=None):
+        if error is None:
+            done.append((match_id, rows))
+        else:
+            failed[match_id] = f"{type(error).__name__}: {error}"
+            log.warning("Season match %s failed: %s", match_id, error, extra={"match_id": match_id})
+        n = len(done) + len(failed)
+        progress(n / len(match_ids), f"{n}/{len(match_ids)} matches")
+
+    if workers == 1:
+        for match_id in match_ids:
+            try:
+                rows = match_player_rows(match_id, n_minutes, phase)
+            except Exception as e:
+                finished(match_id, error=e)
+            else:
+                finished(match_id, rows)
+    else:
+        pending = {}
+        queue = iter(match_ids)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            while True:
+                # top the pool up, never more matches in flight than workers
+                while len(pending) < workers:
+                    match_id = next(queue, None)
+                    if match_id is None:
+                        break
+                    try:
+                        # serial Model 2 inside a worker: a shard pool per worker would nest pools
+                        pending[pool.submit(match_player_rows, match_id, n_minutes, phase, 1)] = match_id
+                    except BrokenProcessPool as e:
+                        finished(match_id, error=e)
+                if not pending:
+                    break
+                ready, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in ready:
+                    match_id = pending.pop(future)
+                    try:
+                        rows = future.result()
+                    except Exception as e:
+                        finished(match_id, error=e)
+                    else:
+                        finished(match_id, rows)
+
+    done.sort(key=lambda item: match_ids.index(item[0]))
+    return {
+        "matches": [match_id for match_id, _ in done],
+        "failed": failed,
+        "players": aggregate(done),
+    }
@@ -0,0 +1,162 @@
+# timeseries.py - server-side reduction of per-frame metric series
+# Series are lists of floats with None for frames where the metric is undefined.
+
+import numpy as np
+
+
+def as_array(values):
+    return np.array([np.nan if v is None else v for v in values], dtype=float)
+
+
+def as_series(values):
+    return [None if np.isnan(v) else float(v) for v in values]
+
+
+def is_series(values):
+    return isinstance(values, list) and all(v is None or isinstance(v, (int, float)) for v in values)
+
+
+def downsample_mean(values, max_points):
+    """Bucket means (NaN ignored) so a series has at most max_points values."""
+    values = as_array(values)
+    n = len(values)
+    if max_points is None or n <= max_points:
+        return as_series(values)
+    edges = np.linspace(0, n, max_points + 1).astype(int)
+    valid = ~np.isnan(values)
+    sums = np.add.reduceat(np.where(valid, values, 0.0), edges[:-1])
+    counts = np.add.reduceat(valid.astype(int), edges[:-1])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return as_series(sums / counts)
+
+
+def iter_series(node, prefix=""):
+    """(dotted name, values) for every series in a nested dict."""
+    if isinstance(node, dict):
+        for k, v in node.items():
+            yield from iter_series(v, f"{prefix}.{k}" if prefix else str(k))
+    elif is_series(node):
+        yield prefix, node
+
+
+def downsample_tree(node, max_points):
+    """Copy of a nested dict with every series in it reduced to max_points."""
+    if isinstance(node, dict):
+        return {k: downsample_tree(v, max_points) for k, v in node.items()}
+    if is_series(node) and len(node) > max_points:
+        return downsample_mean(node, max_points)
+    return node
+
+
+# ------------------------------------------------
+# Pyramid of per-bucket aggregates
+# ------------------------------------------------
+LEVELS = (1, 10, 60)  # seconds per bucket
+STATS = ("min", "mean", "max")
+
+
+def aggregate(values, bucket):
+    """min / mean / max of consecutive buckets of `bucket` samples, NaN ignored."""
+    values = np.asarray(values, dtype=float)
+    starts = np.arange(0, len(values), bucket)
+    if not len(starts):
+        return {stat: np.empty(0) for stat in STATS}
+    valid = ~np.isnan(values)
+    counts = np.add.reduceat(valid.astype(int), starts)
+    sums = np.add.reduceat(np.where(valid, values, 0.0), starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = sums / counts
+    # fmin/fmax skip NaN unless the whole bucket is NaN
+    return {"min": np.fmin.reduceat(values, starts), "mean": mean, "max": np.fmax.reduceat(values, starts)}
+
+
+def build_pyramid(values, fps, levels=LEVELS):
+    """{"raw": values, level_seconds: {"min", "mean", "max"}} for one per-frame series."""
+    raw = as_array(values)
+    pyramid = {"raw": raw}
+    for level in levels:
+        pyramid[level] = aggregate(raw, int(level * fps))
+    return pyramid
+
+
+def pyramid_arrays(name, pyramid):
+    """Flat {array name: array} for np.savez."""
+    out = {f"{name}__raw": pyramid["raw"]}
+    for level, stats in pyramid.items():
+        if level != "raw":
+            out.update({f"{name}__{level}__{stat}": a for stat, a in stats.items()})
+    return out
+
+
+def load_pyramids(arrays):
+    """Inverse of pyramid_arrays over a loaded npz: {name: pyramid}."""
+    pyramids = {}
+    for key in arrays.files:
+        name, _, rest = key.partition("__")
+        pyr = pyramids.setdefault(name, {})
+        if rest == "raw":
+            pyr["raw"] = arrays[key]
+        else:
+            level, stat = rest.split("__")
+            pyr.setdefault(int(level), {})[stat] = arrays[key]
+    return pyramids
+
+
+# ------------------------------------------------
+# Largest-Triangle-Three-Buckets
+# ------------------------------------------------
+def lttb(t, y, n_out):
+    """Indices of n_out points of (t, y) chosen by Largest-Triangle-Three-Buckets.
+
+    Keeps the visual shape (peaks and troughs) of a series far better than
+    striding or averaging. NaN points are never chosen.
+    """
+    keep = np.flatnonzero(~np.isnan(y))
+    if n_out >= len(keep) or n_out < 3:
+        return keep
+    t, y = t[keep], y[keep]
+    n = len(keep)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    chosen = np.empty(n_out, dtype=int)
+    chosen[0], chosen[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_lo, nxt_hi = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_t, avg_y = t[nxt_lo:nxt_hi].mean(), y[nxt_lo:nxt_hi].mean()
+        area = np.abs((t[a] - avg_t) * (y[lo:hi] - y[a]) - (t[a] - t[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        chosen[i + 1] = a
+    return keep[chosen]
+
+
+def query(pyramid, fps, start=None, end=None, points=500):
+    """About `points` samples of one series between start and end (seconds).
+
+    Reads the coarsest pyramid level that still has at least `points` buckets
+    in the window (raw frames for short windows), then applies LTTB to it, so
+    the work is bounded by a small multiple of `points` rather than by the
+    length of the match.
+    """
+    raw = pyramid["raw"]
+    duration = len(raw) / fps
+    start = max(0.0, float(start or 0.0))
+    end = min(duration, float(end if end is not None else duration))
+
+    levels = sorted((k for k in pyramid if k != "raw"), reverse=True)
+    level = next((lv for lv in levels if (end - start) / lv >= points), None)
+
+    if level is None:
+        lo, hi = int(start * fps), int(np.ceil(end * fps))
+        t = np.arange(lo, hi) / fps
+        y = raw[lo:hi]
+        idx = lttb(t, y, points)
+        return {"start": start, "end": end, "resolution_s": 1.0 / fps,
+                "t": t[idx].tolist(), "value": as_series(y[idx])}
+
+    stats = pyramid[level]
+    lo, hi = int(start // level), int(np.ceil(end / level))
+    t = (np.arange(lo, hi) + 0.5) * level
+    idx = lttb(t, stats["mean"][lo:hi], points)
+    return {"start": start, "end": end, "resolution_s": level, "t": t[idx].tolist(),
+            **{("value" if stat == "mean" else stat): as_series(stats[stat][lo:hi][idx]) for stat in STATS}}
@@ -0,0 +1,122 @@
+# tracking_json.py - decoding the tracking JSONL
+# Decoding is most of the cost of reading a match cold, so it uses the fastest
+# JSON decoder installed. orjson takes bytes: lines are read in large blocks and
+# split in bytes, with no text decoding at all. The stdlib decoder wants str, so
+# for it the file is read in text mode line by line; splitting blocks and then
+# decoding every line is slower there. Both decode whole lines; the columnar
+# cache then keeps only the fields the models read. project_frame trims frame
+# dicts the same way, but rebuilding every player dict in Python costs more
+# than decoding it (see benchmarks/json_decoders.py), so it is off unless
+# asked for.
+
+import json
+
+from config import Config
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+BLOCK_SIZE = 1 << 24  # bytes read per block when splitting lines
+
+
+def _stdlib_loads(line):
+    # json.loads sniffs the encoding of bytes first; decoding ourselves is quicker
+    return json.loads(line.decode("utf-8"))
+
+
+# name -> loads(bytes); fastest first
+BACKENDS = {}
+if orjson is not None:
+    BACKENDS["orjson"] = orjson.loads
+BACKENDS["stdlib"] = _stdlib_loads
+
+BALL_FIELDS = ("x", "y", "z")
+PLAYER_FIELDS = ("player_id", "x", "y")
+
+
+def backend_name(name=None):
+    """Decoder to use: name, else Config.JSON_DECODER; "auto" picks the fastest installed."""
+    name = name or Config.JSON_DECODER
+    if name == "auto":
+        return next(iter(BACKENDS))
+    if name not in BACKENDS:
+        raise ValueError(f"JSON decoder {name!r} is not available (have: {', '.join(BACKENDS)})")
+    return name
+
+
+def get_loads(name=None):
+    return BACKENDS[backend_name(name)]
+
+
+def project_frame(fr):
+    """The parts of a decoded frame the models use: frame, timestamp, period,
+    ball_data x/y/z and player_data player_id/x/y."""
+    ball = fr.get("ball_data") or {}
+    return {
+        "frame": fr.get("frame"),
+        "timestamp": fr.get("timestamp"),
+        "period": fr.get("period"),
+        "ball_data": {k: ball.get(k) for k in BALL_FIELDS},
+        "player_data": [{k: p.get(k) for k in PLAYER_FIELDS} for p in fr.get("player_data") or []],
+    }
+
+
+def iter_lines(path, block_size=BLOCK_SIZE):
+    """(offset, length, line) for every non-blank line of a file.
+
+    length counts the line ending, so offset + length is where the next line
+    starts - the same numbers the frame index stores.
+    """
+    with open(path, "rb") as f:
+        pos = 0
+        tail = b""
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            lines = (tail + block).split(b"\n")
+            tail = lines.pop()
+            for raw in lines:
+                line = raw.strip()
+                if line:
+                    yield pos, len(raw) + 1, line
+                pos += len(raw) + 1
+        if tail.strip():
+            yield pos, len(tail), tail.strip()
+
+
+def iter_text_lines(path):
+    """iter_lines for the stdlib decoder: the same numbers, lines as str."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        pos = 0
+        for raw in f:
+            size = len(raw) if raw.isascii() else len(raw.encode("utf-8"))
+            line = raw.strip()
+            if line:
+                yield pos, size, line
+            pos += size
+
+
+def iter_records(path, backend=None):
+    """(offset, length, frame dict) for every non-blank line of a file."""
+    name = backend_name(backend)
+    if name == "stdlib":
+        return ((pos, size, json.loads(line)) for pos, size, line in iter_text_lines(path))
+    loads = BACKENDS[name]
+    return ((pos, size, loads(line)) for pos, size, line in iter_lines(path))
+
+
+def decode_lines(lines, backend=None, project=False):
+    """Frame dicts from raw JSON lines."""
+    loads = get_loads(backend)
+    for line in lines:
+        fr = loads(line)
+        yield project_frame(fr) if project else fr
+
+
+def iter_frames(path, backend=None, project=False):
+    """Every frame of a tracking JSONL, in file order."""
+    for _, _, fr in iter_records(path, backend):
+        yield project_frame(fr) if project else fr
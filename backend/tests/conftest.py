@@ -0,0 +1,36 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND = Path(__file__).resolve().parents[1]
+if str(BACKEND) not in sys.path:
+    sys.path.insert(0, str(BACKEND))
+
+from benchmarks.synthetic import generate_frames, write_jsonl  # noqa: E402
+from config import Config  # noqa: E402
+
+MATCH_ID = "900000002"
+
+
+@pytest.fixture
+def match_id():
+    return MATCH_ID
+
+
+@pytest.fixture(scope="session")
+def synthetic_jsonl(tmp_path_factory):
+    """Four minutes (two periods) of synthetic tracking with dropouts, written once."""
+    path = tmp_path_factory.mktemp("data") / f"{MATCH_ID}_tracking_extrapolated.jsonl"
+    write_jsonl(path, generate_frames(minutes=4, dropout=0.05, seed=1))
+    return path
+
+
+@pytest.fixture
+def tracking_file(synthetic_jsonl, tmp_path, monkeypatch):
+    """The synthetic match linked into a per-test data directory (so its cache
+    and index start empty) with Config.DATA_DIR pointed at it."""
+    path = tmp_path / synthetic_jsonl.name
+    path.symlink_to(synthetic_jsonl)
+    monkeypatch.setattr(Config, "DATA_DIR", str(tmp_path))
+    return path
@@ -0,0 +1,69 @@
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+import app as app_module  # noqa: E402
+from config import Config  # noqa: E402
+from utils.profiling import ProfilerBusy  # noqa: E402
+
+
+@pytest.fixture
+def client(monkeypatch):
+    users = mongomock.MongoClient().db.users
+    monkeypatch.setattr(app_module, "users", users)
+    monkeypatch.setattr(Config, "ADMIN_EMAILS", {"admin@example.com"})
+    monkeypatch.setattr(app_module.results, "invalidate", lambda model=None: 3)
+    return app_module.app.test_client(), users
+
+
+def auth(users, email):
+    uid = users.insert_one({"name": email, "email": email}).inserted_id
+    return {"Authorization": f"Bearer {app_module.create_token(str(uid))}"}
+
+
+def test_clearing_results_needs_an_admin(client):
+    http, users = client
+    assert http.delete("/api/analysis/cache/results").status_code == 403
+    assert http.delete("/api/analysis/cache/results", headers=auth(users, "coach@example.com")).status_code == 403
+    r = http.delete("/api/analysis/cache/results", headers=auth(users, "admin@example.com"))
+    assert r.status_code == 200 and r.get_json()["removed"] == 3
+
+
+def test_a_failing_analysis_answers_with_json(client, monkeypatch):
+    http, _ = client
+
+    def fail(kind, data, profile=False):
+        raise OverflowError("cannot convert float infinity to integer")
+
+    monkeypatch.setattr(app_module, "run_queued", fail)
+    r = http.post("/api/analysis/tactical-shape", json={})
+    assert r.status_code == 500 and r.get_json() == {"message": "Analysis failed"}
+
+
+def test_profiling_needs_an_admin(client, monkeypatch):
+    http, users = client
+    calls = []
+    monkeypatch.setattr(app_module, "run_queued",
+                        lambda kind, data, profile=False: calls.append(profile) or {"profile": {"seconds": 1}})
+
+    assert http.post("/api/analysis/tactical-shape?profile=1", json={}).status_code == 403
+    headers = {**auth(users, "coach@example.com"), "X-Profile": "1"}
+    assert http.post("/api/analysis/tactical-shape", json={}, headers=headers).status_code == 403
+    assert calls == []
+
+    headers = {**auth(users, "admin@example.com"), "X-Profile": "1"}
+    r = http.post("/api/analysis/tactical-shape", json={}, headers=headers)
+    assert r.status_code == 200 and r.get_json()["profile"] == {"seconds": 1}
+    assert http.post("/api/analysis/tactical-shape", json={}).status_code == 200
+    assert calls == [True, False]
+
+
+def test_busy_profiler_is_a_conflict(client, monkeypatch):
+    http, users = client
+
+    def busy(kind, data, profile=False):
+        raise ProfilerBusy("Another profile is being captured, try again shortly")
+
+    monkeypatch.setattr(app_module, "run_queued", busy)
+    r = http.post("/api/analysis/tactical-shape?profile=1", json={}, headers=auth(users, "admin@example.com"))
+    assert r.status_code == 409 and "Another profile" in r.get_json()["message"]
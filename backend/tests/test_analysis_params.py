@@ -0,0 +1,31 @@
+import pytest
+
+from utils.analysis_runner import analysis_params
+
+
+@pytest.mark.parametrize("data", [[1], "n_minutes", 5])
+def test_params_must_be_an_object(data):
+    with pytest.raises(ValueError, match="must be an object"):
+        analysis_params("tactical-shape", data)
+
+
+@pytest.mark.parametrize("field, value", [("metrics", "compactness"), ("resolutions", "coarse"), ("metrics", {"a": 1})])
+def test_batch_names_must_be_lists(field, value):
+    with pytest.raises(ValueError, match=f"{field} must be a list"):
+        analysis_params("batch", {field: value})
+
+
+def test_batch_rejects_unknown_names():
+    with pytest.raises(ValueError, match="Unknown metrics: speed"):
+        analysis_params("batch", {"metrics": ["compactness", "speed"]})
+
+
+def test_batch_defaults():
+    params = analysis_params("batch", {"metrics": ["compactness"]})
+    assert params["metrics"] == ["compactness"] and len(params["resolutions"]) == 1
+
+
+@pytest.mark.parametrize("n_minutes", ["inf", "-inf", "nan", float("inf")])
+def test_n_minutes_must_be_finite(n_minutes):
+    with pytest.raises(ValueError, match="finite"):
+        analysis_params("tactical-shape", {"n_minutes": n_minutes})
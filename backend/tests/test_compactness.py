@@ -0,0 +1,11 @@
+import numpy as np
+
+from ml.model1 import _hull_areas
+
+
+def test_hull_area_is_area_not_perimeter():
+    square = [[0, 0], [4, 0], [4, 3], [0, 3], [2, 1]]  # 4 x 3 box plus an inside point
+    xy = np.array([square, square[:2] + [[np.nan, np.nan]] * 3], dtype=float)
+    areas = _hull_areas(xy)
+    assert areas[0] == 12.0
+    assert np.isnan(areas[1])  # fewer than three placed players
@@ -0,0 +1,42 @@
+import logging
+
+import numpy as np
+
+from ml.model1 import attack_signs
+
+PERIODS = np.array([1, 1, 1, 2, 2, 2])
+META = {"home_team_side": ["left_to_right", "right_to_left"]}
+
+
+def positions(x_by_period, players=3):
+    """(frames x players x 2) with every player of a period at the given x."""
+    x = np.array([x_by_period[p] for p in PERIODS], dtype=float)
+    xy = np.zeros((len(PERIODS), players, 2))
+    xy[..., 0] = x[:, None]
+    return xy
+
+
+def test_metadata_sides_flip_at_half_time():
+    assert attack_signs(META, "home", PERIODS).tolist() == [1, 1, 1, -1, -1, -1]
+    assert attack_signs(META, "away", PERIODS).tolist() == [-1, -1, -1, 1, 1, 1]
+
+
+def test_goalkeeper_decides_without_metadata(caplog):
+    # outfield players pushed into the opponents' half, keeper still at home
+    outfield = positions({1: 10.0, 2: -10.0})
+    keeper = positions({1: -50.0, 2: 50.0}, players=1)
+    with caplog.at_level(logging.WARNING, logger="ml.model1"):
+        signs = attack_signs({}, "home", PERIODS, outfield, keeper)
+    assert signs.tolist() == [1, 1, 1, -1, -1, -1]
+    assert "home_team_side" in caplog.text
+
+
+def test_untracked_second_half_is_the_first_flipped():
+    keeper = positions({1: 50.0, 2: np.nan}, players=1)
+    assert attack_signs(None, "away", PERIODS, None, keeper).tolist() == [-1, -1, -1, 1, 1, 1]
+    assert attack_signs(None, None, PERIODS).tolist() == [1, 1, 1, -1, -1, -1]
+
+
+def test_unknown_side_does_not_borrow_the_away_direction():
+    xy = positions({1: -20.0, 2: 20.0})
+    assert attack_signs(META, None, PERIODS, xy).tolist() == [1, 1, 1, -1, -1, -1]
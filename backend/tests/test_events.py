@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+import app as app_module
+from config import Config
+from ml.events import period_seconds
+
+
+def test_restarting_clock_is_left_alone_for_the_whole_period():
+    # second half counted from 0:00; the late times are stoppage, not 45:00 onwards
+    assert period_seconds([2, 2, 2], [60, 2760, 2760]).tolist() == [60, 2760, 2760]
+
+
+def test_running_clock_has_the_period_start_removed():
+    assert period_seconds([1, 2, 2], [30, 2700, 2760]).tolist() == [30, 0, 60]
+
+
+def test_convention_is_read_per_period_and_skips_missing_times():
+    out = period_seconds([1, 2, 2, 3, 3], [50, np.nan, 2790, 10, 5500])
+    assert np.isnan(out[1])
+    assert out[[0, 2, 3, 4]].tolist() == [50, 90, 10, 5500]
+
+
+@pytest.fixture
+def positions_limit(monkeypatch):
+    """Calls /events/positions with a stubbed match and returns the limit positions_around got."""
+    seen = {}
+    monkeypatch.setattr(app_module, "require_match", lambda match_id: match_id)
+    monkeypatch.setattr(app_module, "get_events", lambda match_id: None)
+    monkeypatch.setattr(app_module, "get_tracking", lambda match_id: None)
+    monkeypatch.setattr(app_module, "get_event_join", lambda events, tracking: None)
+    monkeypatch.setattr(app_module, "positions_around",
+                        lambda join, event_type, offsets, tolerance, limit: seen.update(limit=limit) or {})
+    http = app_module.app.test_client()
+
+    def call(query):
+        seen.clear()
+        response = http.get(f"/api/analysis/events/positions?{query}")
+        return response.status_code, seen.get("limit")
+    return call
+
+
+def test_event_positions_limit_is_clamped(positions_limit):
+    cap = Config.EVENT_POSITIONS_MAX_EVENTS
+    assert positions_limit("") == (200, cap)
+    assert positions_limit(f"limit={cap * 100}") == (200, cap)
+    assert positions_limit("limit=5") == (200, 5)
+    assert positions_limit("limit=0")[0] == 400
+
+
+def test_event_positions_cap_events_times_offsets(positions_limit, monkeypatch):
+    monkeypatch.setattr(Config, "EVENT_POSITIONS_MAX_SNAPSHOTS", 1000)
+    status, limit = positions_limit("before=5&after=4.5&step=0.1")  # 96 offsets
+    assert status == 200 and limit * 96 <= 1000 and limit == 10
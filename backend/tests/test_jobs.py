@@ -0,0 +1,52 @@
+import threading
+
+import pytest
+
+from utils.jobs import DONE, FAILED, JobCancelled, JobManager
+
+RESULT = {"data": {"series": list(range(1000))}, "data_url": "/api/analysis/results/k", "files": ["/a.png"]}
+
+
+def test_wait_returns_the_result_or_reraises():
+    manager = JobManager(max_workers=1, max_queued=5)
+    job = manager.submit("x", lambda job: RESULT, {}, keep_result=True)
+    assert manager.wait(job) is RESULT
+    assert job.result is None  # collected, not kept for later polls
+
+    def fail(job):
+        raise ValueError("bad match")
+
+    job = manager.submit("x", fail, {}, keep_result=True)
+    with pytest.raises(ValueError, match="bad match"):
+        manager.wait(job)
+    assert job.status == FAILED
+
+
+def test_status_carries_urls_not_the_result():
+    manager = JobManager(max_workers=1, max_queued=5)
+    job = manager.submit("x", lambda job: RESULT, {})
+    job.future.result()
+    status = job.to_dict()
+    assert status["status"] == DONE and status["progress"] == 1.0
+    assert status["data_url"] == RESULT["data_url"] and status["files"] == RESULT["files"]
+    assert "result" not in status and "data" not in status and job.result is None
+
+
+def test_waiting_callers_share_the_worker_cap():
+    manager = JobManager(max_workers=1, max_queued=5)
+    started, release = threading.Event(), threading.Event()
+
+    def hold(job):
+        started.set()
+        release.wait(5)
+        return {"data_url": "/first"}
+
+    first = manager.submit("x", hold, {}, keep_result=True)
+    started.wait(5)
+    second = manager.submit("x", lambda job: {}, {}, keep_result=True)
+    assert manager.running() == 1 and manager.queue_depth() == 1
+    manager.cancel(second.id)
+    with pytest.raises(JobCancelled):
+        manager.wait(second)
+    release.set()
+    assert manager.wait(first) == {"data_url": "/first"} and first.status == DONE
@@ -0,0 +1,82 @@
+import json
+import logging
+
+import pytest
+
+import app as app_module
+from utils.metrics import STAGE_FRAMES, STAGE_SECONDS, Counter, Gauge, Histogram, Registry
+from utils.telemetry import JsonFormatter, bind, stage
+
+
+def test_registry_renders_the_text_format():
+    registry = Registry()
+    requests = registry.add(Counter("t_requests_total", "Requests.", ("route",)))
+    depth = registry.add(Gauge("t_depth", "Queue depth."))
+    latency = registry.add(Histogram("t_seconds", "Latency.", buckets=(0.1, 1.0)))
+    requests.inc(route="/a")
+    requests.inc(2, route='/b"x')
+    requests.collect(lambda: {("/a",): 10})
+    depth.set(4)
+    depth.dec()
+    for seconds in (0.05, 0.5, 3.0):
+        latency.observe(seconds)
+
+    assert registry.render().splitlines() == [
+        "# HELP t_requests_total Requests.",
+        "# TYPE t_requests_total counter",
+        't_requests_total{route="/a"} 11',
+        't_requests_total{route="/b\\"x"} 2',
+        "# HELP t_depth Queue depth.",
+        "# TYPE t_depth gauge",
+        "t_depth 3",
+        "# HELP t_seconds Latency.",
+        "# TYPE t_seconds histogram",
+        't_seconds_bucket{le="0.1"} 1',
+        't_seconds_bucket{le="1.0"} 2',
+        't_seconds_bucket{le="+Inf"} 3',
+        "t_seconds_sum 3.55",
+        "t_seconds_count 3",
+    ]
+
+
+def test_labels_must_match_the_declared_names():
+    metric = Counter("t_total", "T.", ("stage",))
+    with pytest.raises(ValueError, match="takes labels"):
+        metric.inc(route="/a")
+    with pytest.raises(ValueError):
+        metric.inc()
+
+
+def sample(metric, name, suffix=""):
+    return next((value for sfx, key, _, value in metric.samples() if sfx == suffix and key == (name,)), 0)
+
+
+def test_stage_times_counts_and_logs(caplog):
+    with caplog.at_level(logging.INFO, logger="gaffer.stage"), bind(job_id="j1"):
+        with stage("test.ok", match_id="m") as info:
+            info["frames"] = 250
+        with pytest.raises(KeyError), stage("test.fail"):
+            raise KeyError("x")
+
+    assert sample(STAGE_SECONDS, "test.ok", "_count") == 1
+    assert sample(STAGE_FRAMES, "test.ok") == 250
+    ok, failed = [r for r in caplog.records if r.name == "gaffer.stage"][-2:]
+    assert ok.stage == "test.ok" and ok.frames == 250 and ok.match_id == "m"
+    assert failed.error == "KeyError"
+
+    line = json.loads(JsonFormatter().format(ok))
+    assert line["event"] == "stage" and line["frames"] == 250 and "seconds" in line
+    assert "job_id" not in line  # bound fields are read when the record is formatted, not stored on it
+    with bind(job_id="j1"):
+        assert json.loads(JsonFormatter().format(ok))["job_id"] == "j1"
+
+
+def test_metrics_route_counts_requests():
+    http = app_module.app.test_client()
+    http.get("/metrics")
+    response = http.get("/metrics")
+    assert response.status_code == 200 and response.content_type.startswith("text/plain")
+    body = response.get_data(as_text=True)
+    assert '# TYPE gaffer_http_request_seconds histogram' in body
+    assert 'gaffer_http_request_seconds_count{method="GET",route="/metrics",status="200"}' in body
+    assert "gaffer_http_requests_in_flight 1" in body  # the scrape itself
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import generate_frames
+from ml.model0_load_data import build_tracking_cache, load_tracking
+from ml.model2_real import (
+    FPS, SHARD_MIN_FRAMES, compute_distances_and_sprints, compute_distances_and_sprints_sharded,
+    compute_distances_and_sprints_vectorized,
+)
+
+
+def assert_same_totals(expected, actual):
+    exp_d, exp_s, exp_t = expected
+    got_d, got_s, got_t = actual
+    assert got_d.keys() == exp_d.keys()
+    assert got_s == exp_s
+    assert got_t == exp_t
+    for pid, distance in exp_d.items():
+        assert got_d[pid] == pytest.approx(distance, rel=1e-9)
+
+
+@pytest.fixture(scope="module")
+def gappy_frames():
+    """Two minutes where players drop out for a second at a time, plus one
+    player who is gone for most of the first half of the window."""
+    frames = list(generate_frames(minutes=2, dropout=0.1, seed=3))
+    absent = frames[0]["player_data"][0]["player_id"]
+    for fr in frames[100:1200]:
+        fr["player_data"] = [p for p in fr["player_data"] if p["player_id"] != absent]
+    return frames
+
+
+def test_vectorized_matches_reference_loop_over_gaps(gappy_frames):
+    expected = compute_distances_and_sprints(gappy_frames, FPS)
+    assert sum(expected[1].values()) > 0  # the gaps produce sprint-speed steps to compare
+    assert_same_totals(expected, compute_distances_and_sprints_vectorized(gappy_frames, FPS))
+
+
+def test_vectorized_matches_reference_loop_on_columnar_frames(tracking_file, match_id):
+    build_tracking_cache(tracking_file)
+    frames = load_tracking(use_cache=True, match_id=match_id)
+    assert np.isnan(frames.xy).any()
+    assert_same_totals(compute_distances_and_sprints(frames, FPS),
+                       compute_distances_and_sprints_vectorized(frames, FPS))
+
+
+@pytest.fixture(scope="module")
+def long_frames():
+    frames = list(generate_frames(minutes=14, dropout=0.05, seed=5))
+    assert len(frames) >= SHARD_MIN_FRAMES
+    return frames
+
+
+@pytest.mark.parametrize("segment_starts", [None, [3000, 7001, 10500, 15000]])
+def test_sharded_matches_vectorized(long_frames, segment_starts):
+    # the segment starts fall inside shards and on the 4-shard seam at frame 10500
+    starts = None if segment_starts is None else np.asarray(segment_starts)
+    assert_same_totals(compute_distances_and_sprints_vectorized(long_frames, FPS, starts),
+                       compute_distances_and_sprints_sharded(long_frames, FPS, starts, shards=4))
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from ml.model0_load_data import iter_tracking, open_tracking_cache
+from ml.model3_fixed import (
+    FIELD_X, FIELD_Y, compute_occupancy_grids, map_players_to_teams, occupancy_counts, pitch_extent,
+)
+
+EXTENT = (FIELD_X, FIELD_Y)
+
+
+@pytest.mark.parametrize("grid_size", [(25, 16), (50, 32), (105, 68), (7, 3)])
+def test_bincount_matches_histogram(grid_size):
+    rng = np.random.default_rng(3)
+    points = np.column_stack([rng.uniform(-52.4, 52.4, 5000), rng.uniform(-33.9, 33.9, 5000)])
+    expected, _, _ = np.histogram2d(points[:, 0], points[:, 1], bins=grid_size, range=EXTENT)
+    np.testing.assert_array_equal(occupancy_counts(points, EXTENT, grid_size), expected)
+
+
+def test_points_off_the_pitch_land_in_edge_cells():
+    counts = occupancy_counts(np.array([[-60.0, 0.0], [60.0, 40.0], [52.5, -34.0]]), EXTENT, (10, 4))
+    assert counts.sum() == 3
+    assert counts[0, 2] == 1 and counts[9, 3] == 1 and counts[9, 0] == 1
+
+
+def test_resolutions_from_one_pass(tracking_file):
+    frames = open_tracking_cache(tracking_file)[:500]
+    meta = {"pitch_length": 104.0, "pitch_width": 68.0}
+    home, away = map_players_to_teams(frames, None)
+    grids, extent = compute_occupancy_grids(frames, home, away, meta)
+    assert extent == pitch_extent(meta) == ((-52.0, 52.0), (-34.0, 34.0))
+
+    samples = int(np.asarray(frames.valid).sum())
+    for name, (nx, ny) in {"coarse": (25, 16), "medium": (50, 32), "fine": (104, 68)}.items():
+        g = grids[name]
+        assert g["grid_size"] == (nx, ny)
+        assert g["home"].shape == g["away"].shape == g["pitch_control"].shape == (ny, nx)  # y up for imshow
+        assert g["home"].sum() + g["away"].sum() == samples
+        assert np.all((g["pitch_control"] >= 0) & (g["pitch_control"] <= 1))
+    assert grids["coarse"]["home"].sum() == grids["fine"]["home"].sum()
+
+
+def test_columnar_and_dict_frames_bin_alike(tracking_file):
+    arrays = open_tracking_cache(tracking_file)[:300]
+    dicts = list(iter_tracking(valid_only=False, max_frames=300, tracking_file=tracking_file))
+    home, away = map_players_to_teams(arrays, None)
+    a, _ = compute_occupancy_grids(arrays, home, away, resolutions={"g": (20, 10)})
+    b, _ = compute_occupancy_grids(dicts, home, away, resolutions={"g": (20, 10)})
+    for kind in ("home", "away"):
+        np.testing.assert_array_equal(a["g"][kind], b["g"][kind])
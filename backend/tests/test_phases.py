@@ -0,0 +1,74 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_frames
+from ml.model0_load_data import MATCH_FILE
+from ml.model2_real import compute_model2
+from ml.phases import PhaseIndex, frames_in_ranges, resolve_filter, segment_starts
+from utils.analysis_runner import analysis_params
+
+
+@pytest.mark.parametrize("phase", [{"in_possession": {"a": 1}}, {"in_possession": [["build_up"]]},
+                                   {"team_in_possession": True}, {"out_of_possession": 1.5}])
+def test_filter_values_must_be_strings_numbers_or_lists(phase):
+    with pytest.raises(ValueError, match="must be a string, a number or a list"):
+        resolve_filter(phase)
+    with pytest.raises(ValueError):
+        analysis_params("player-performance", {"phase": phase})
+
+
+def test_filter_accepts_values_and_lists():
+    assert resolve_filter({"in_possession": ["build_up", "create"], "team_in_possession": 100}) == {
+        "in_possession": ["build_up", "create"], "team_in_possession": 100}
+
+
+def test_model2_returns_empty_tables_when_no_phase_matches():
+    with open(MATCH_FILE, "r", encoding="utf-8") as fh:
+        meta = json.load(fh)
+    frames = list(generate_frames(meta, minutes=0.5, seed=2))
+    data = compute_model2(frames, meta, phase={"in_possession": "nonexistent"})
+    assert [t["players"] for t in data["teams"].values()] == [[], []]
+
+
+@pytest.fixture
+def index():
+    # unsorted on purpose; 100-199 and 200-249 touch, 300-399 overlaps 250-349
+    return PhaseIndex(pd.DataFrame({
+        "frame_start": [200, 100, 500, 300, 250],
+        "frame_end": [249, 199, 599, 399, 349],
+        "team_in_possession_phase_type": ["create", "build_up", "build_up", "build_up", "build_up"],
+        "team_out_of_possession_phase_type": ["low_block"] * 5,
+        "team_in_possession_id": [1, 1, 2, 2, 1],
+    }))
+
+
+def test_phase_of_frames(index):
+    rows = index.phase_of([99, 100, 199, 200, 420, 600])
+    assert rows.tolist() == [-1, 0, 0, 1, -1, -1]
+    assert index.phase_at(230)["team_in_possession_phase_type"] == "create"
+    assert index.phase_at(450) is None
+
+
+def test_ranges_merge_touching_and_overlapping_phases(index):
+    assert index.ranges().tolist() == [[100, 399], [500, 599]]
+    assert index.ranges(in_possession="build_up").tolist() == [[100, 199], [250, 399], [500, 599]]
+    assert index.ranges(in_possession="build_up", team_in_possession=1).tolist() == [[100, 199], [250, 349]]
+    assert index.ranges(in_possession="counter").shape == (0, 2)
+
+
+def test_ranges_reject_filters_on_missing_columns():
+    bare = PhaseIndex(pd.DataFrame({"frame_start": [0], "frame_end": [9]}))
+    with pytest.raises(ValueError, match="no team_in_possession_phase_type"):
+        bare.ranges(in_possession="build_up")
+
+
+def test_segment_starts_split_at_range_gaps(index):
+    ranges = index.ranges(in_possession="build_up", team_in_possession=1)
+    frames = [{"frame": f} for f in (150, 151, 199, 260, 261, 349)]
+    assert segment_starts(frames, ranges).tolist() == [3]
+    assert [f["frame"] for f in frames_in_ranges(frames + [{"frame": 400}], ranges)] == [f["frame"] for f in frames]
+    assert segment_starts(frames[:3], ranges).tolist() == []
+    assert np.asarray(segment_starts([], ranges)).size == 0
@@ -0,0 +1,59 @@
+import threading
+import tracemalloc
+
+import pytest
+
+from utils.profiling import ProfilerBusy, capture
+
+
+def inner(n):
+    return sum(i * i for i in range(n))
+
+
+def workload():
+    blocks = [bytearray(64 * 1024) for _ in range(20)]  # still held when the capture ends
+    return inner(200_000), blocks
+
+
+def test_capture_returns_the_result_and_a_report():
+    result, report = capture(workload)
+    assert result[0] == inner(200_000)
+    assert set(report) == {"seconds", "collapsed", "functions", "allocations", "peak_traced_kib"}
+    assert report["peak_traced_kib"] >= 20 * 64
+    assert not tracemalloc.is_tracing()
+
+    weights = [int(line.rsplit(" ", 1)[1]) for line in report["collapsed"]]
+    assert weights == sorted(weights, reverse=True) and all(w > 0 for w in weights)
+    # the generator inside inner() is reached through workload -> inner
+    assert any("(workload);" in line and "(inner);" in line for line in report["collapsed"])
+    assert any(f["function"].endswith("(inner)") for f in report["functions"])
+    assert any("test_profiling.py" in a["site"] for a in report["allocations"])
+
+
+def test_one_capture_at_a_time():
+    started, release = threading.Event(), threading.Event()
+
+    def hold():
+        started.set()
+        release.wait(5)
+
+    thread = threading.Thread(target=capture, args=(hold,))
+    thread.start()
+    started.wait(5)
+    try:
+        with pytest.raises(ProfilerBusy):
+            capture(lambda: None)
+    finally:
+        release.set()
+        thread.join()
+    assert capture(lambda: 1)[0] == 1
+
+
+def test_errors_propagate_and_free_the_profiler():
+    def fail():
+        raise ValueError("bad match")
+
+    with pytest.raises(ValueError, match="bad match"):
+        capture(fail)
+    assert capture(lambda: 2)[0] == 2
+    assert not tracemalloc.is_tracing()
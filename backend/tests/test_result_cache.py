@@ -0,0 +1,131 @@
+import os
+import shutil
+import time
+
+from utils import result_cache
+from utils.result_cache import ResultCache
+
+
+def cache(tmp_path, budget=1 << 20):
+    store = ResultCache(tmp_path / "results", budget, gc_interval=3600)
+    store._wake_gc = lambda: None  # collect explicitly, not from a background thread
+    return store
+
+
+def test_get_survives_an_entry_removed_underneath_it(tmp_path, monkeypatch):
+    store = cache(tmp_path)
+    store.commit("k", "m", {}, {"v": 1})
+
+    def removed(path):
+        shutil.rmtree(store.entry_dir("k"))
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(result_cache.os, "utime", removed)
+    assert store.get("k") == {"v": 1}
+    assert store.get("k") is None
+
+
+def test_latest_reads_only_the_newest_entry(tmp_path, monkeypatch):
+    store = cache(tmp_path)
+    for i in range(5):
+        store.commit(f"k{i}", "a" if i % 2 == 0 else "b", {}, {"i": i})
+    reads = []
+    read = store._read
+    monkeypatch.setattr(store, "_read", lambda path: reads.append(path) or read(path))
+    assert store.latest("a") == {"i": 4}
+    assert store.latest("b") == {"i": 3}
+    assert store.latest("c") is None
+    assert len(reads) == 2
+
+
+def test_index_follows_other_writers_and_removals(tmp_path):
+    store = cache(tmp_path)
+    store.commit("k1", "a", {}, {"i": 1})
+    other = cache(tmp_path)  # e.g. another server process
+    other.commit("k2", "a", {}, {"i": 2})
+    assert store.latest("a") == {"i": 2}
+    assert store.stats()["entries"] == 2
+
+    shutil.rmtree(store.entry_dir("k2"))
+    assert store.latest("a") == {"i": 1}
+    assert store.invalidate("a") == 1
+    assert store.latest("a") is None and store.stats()["entries"] == 0
+
+
+def test_stats_count_shared_artifacts_once(tmp_path):
+    store = cache(tmp_path)
+    for key in ("k1", "k2"):
+        staged = store.stage()
+        (staged / "plot.png").write_bytes(b"x" * 100)
+        store.commit(key, "a", {}, {}, store.store_artifacts(staged))
+    stats = store.stats()
+    assert stats["entries"] == 2 and stats["artifacts"] == 1
+    assert stats["saved_bytes"] == 100
+
+
+def commit_with_plot(store, key, content, age=0):
+    staged = store.stage()
+    (staged / "plot.png").write_bytes(content)
+    manifest = store.store_artifacts(staged)
+    store.commit(key, "a", {}, {"key": key}, manifest)
+    if age:
+        then = time.time() - age
+        os.utime(store.artifacts.path(manifest[0]["artifact"]), (then, then))
+    return manifest[0]["artifact"]
+
+
+def test_collect_removes_only_old_orphans(tmp_path):
+    store = cache(tmp_path)
+    staged = store.stage()
+    (staged / "lost.png").write_bytes(b"orphan")
+    orphan = store.store_artifacts(staged)[0]["artifact"]
+    kept = commit_with_plot(store, "k", b"kept")
+
+    store.collect(grace=60)
+    assert store.artifacts.exists(orphan)
+    store.collect(grace=0)
+    assert not store.artifacts.exists(orphan) and store.artifacts.exists(kept)
+    assert store.get("k") == {"key": "k"}
+
+
+def test_over_budget_evicts_least_recently_served_artifacts_with_their_results(tmp_path):
+    store = cache(tmp_path)
+    old = commit_with_plot(store, "old", b"o" * 4000, age=600)
+    new = commit_with_plot(store, "new", b"n" * 4000)
+    store.budget_bytes = 6000
+
+    store.collect(grace=0)
+    assert not store.artifacts.exists(old) and store.get("old") is None
+    assert store.artifacts.exists(new) and store.get("new") == {"key": "new"}
+    assert store.evictions == 1
+
+
+def test_over_budget_evicts_least_recently_used_json_results(tmp_path):
+    store = cache(tmp_path)
+    for i, key in enumerate(("a", "b", "c")):
+        store.commit(key, "m", {}, {"pad": "x" * 1000})
+        then = time.time() - 600 + i
+        os.utime(store.entry_dir(key) / store.RESULT_FILE, (then, then))
+    store.get("a")  # serving a result marks it used
+    store.budget_bytes = 2500
+
+    store.collect(grace=0)
+    assert store.entry("b") is None
+    assert store.entry("a") is not None and store.entry("c") is not None
+
+
+def test_result_is_dropped_when_its_artifact_was_collected(tmp_path):
+    store = cache(tmp_path)
+    name = commit_with_plot(store, "k", b"plot")
+    store.artifacts.remove(name)
+    assert store.get("k") is None
+    assert not store.entry_dir("k").exists()
+
+
+def test_collect_clears_abandoned_staging(tmp_path):
+    store = cache(tmp_path)
+    abandoned, fresh = store.stage(), store.stage()
+    then = time.time() - 7200
+    os.utime(abandoned, (then, then))
+    store.collect(grace=0)
+    assert not abandoned.exists() and fresh.exists()
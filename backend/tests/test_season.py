@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+from ml import season
+
+
+def fake_player_rows(match_id, n_minutes=None, phase=None, shards=None):
+    if match_id == "sharded" and shards != 1:
+        raise AssertionError("season workers must not start a shard pool")
+    if match_id == "bad-data":
+        raise KeyError("player_id")
+    if match_id == "worker-dies":
+        os._exit(1)
+    return [{"player_id": 7, "name": "Seven", "team": "Home", "distance_km": 10.0,
+             "sprint_seconds": 30.0, "fatigue_score": 0.5}]
+
+
+@pytest.fixture(autouse=True)
+def fake_matches(monkeypatch):
+    monkeypatch.setattr(season, "match_player_rows", fake_player_rows)
+
+
+def test_serial_run_records_any_exception():
+    out = season.season_totals(["m1", "bad-data", "m2"], workers=1)
+    assert out["matches"] == ["m1", "m2"]
+    assert out["failed"] == {"bad-data": "KeyError: 'player_id'"}
+    assert out["players"][0]["matches"] == 2
+
+
+def test_pool_run_records_any_exception():
+    out = season.season_totals(["m1", "bad-data", "sharded", "m2"], workers=2)
+    assert out["matches"] == ["m1", "sharded", "m2"]
+    assert out["failed"] == {"bad-data": "KeyError: 'player_id'"}
+
+
+def test_pool_run_survives_a_dead_worker():
+    # matches in flight when the worker dies fail too; none may be lost
+    ids = ["m1", "worker-dies", "m2", "m3"]
+    out = season.season_totals(ids, workers=2)
+    assert sorted(out["matches"] + list(out["failed"])) == sorted(ids)
+    assert out["failed"]["worker-dies"].startswith("BrokenProcessPool")
@@ -0,0 +1,26 @@
+import pytest
+
+import app as app_module
+from config import Config
+
+
+@pytest.fixture
+def http():
+    return app_module.app.test_client()
+
+
+def test_series_are_reduced_by_default(http, monkeypatch):
+    n = Config.SERIES_MAX_POINTS * 3
+    result = {"model": "tactical-shape", "data": {"series": {"compactness": {"A": list(range(n))}}}}
+    monkeypatch.setattr(app_module, "run_queued", lambda kind, data, profile=False: result)
+
+    body = http.post("/api/analysis/tactical-shape", json={}).get_json()
+    assert len(body["data"]["series"]["compactness"]["A"]) == Config.SERIES_MAX_POINTS
+    body = http.post("/api/analysis/tactical-shape?max_points=10", json={}).get_json()
+    assert len(body["data"]["series"]["compactness"]["A"]) == 10
+
+
+def test_series_window_must_not_end_before_it_starts(http):
+    r = http.get("/api/analysis/results/somekey/series/compactness.A?start=700&end=100")
+    assert r.status_code == 400
+    assert http.get("/api/analysis/results/somekey/series/compactness.A?start=100&end=700").status_code == 404
@@ -0,0 +1,107 @@
+import threading
+
+import pytest
+
+from utils.jobs import JobCancelled
+from utils.single_flight import SingleFlight
+
+
+def run_concurrently(flight, key, fn, n, **kwargs):
+    """Start n callers of flight.do(key, fn); returns their (result, shared) or exception."""
+    out = [None] * n
+
+    def call(i):
+        try:
+            out[i] = flight.do(key, fn, interval=0.01, **kwargs)
+        except Exception as e:
+            out[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    return threads, out
+
+
+def wait_for_waiters(flight, n):
+    while flight.coalesced < n:
+        threading.Event().wait(0.005)
+
+
+def test_concurrent_callers_share_one_run():
+    flight, release, runs = SingleFlight(), threading.Event(), []
+
+    def fn():
+        runs.append(1)
+        release.wait(5)
+        return {"v": 1}
+
+    threads, out = run_concurrently(flight, "k", fn, 5)
+    wait_for_waiters(flight, 4)
+    assert flight.stats()["in_flight"] == 1
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert len(runs) == 1
+    assert all(result == {"v": 1} for result, _ in out)
+    assert sorted(shared for _, shared in out) == [False, True, True, True, True]
+    assert flight.stats() == {"in_flight": 0, "executed": 1, "coalesced": 4}
+
+
+def test_different_keys_and_later_calls_run_again():
+    flight = SingleFlight()
+    assert flight.do("a", lambda: 1) == (1, False)
+    assert flight.do("b", lambda: 2) == (2, False)
+    assert flight.do("a", lambda: 3) == (3, False)
+    assert flight.executed == 3 and flight.coalesced == 0
+
+
+def test_waiters_inherit_errors_unless_told_to_retry():
+    flight, release = SingleFlight(), threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise ValueError("bad match")
+
+    threads, out = run_concurrently(flight, "k", fail, 3)
+    wait_for_waiters(flight, 2)
+    release.set()
+    for t in threads:
+        t.join()
+    assert all(isinstance(e, ValueError) for e in out)
+    assert flight.executed == 1
+
+
+def test_waiter_retries_after_a_cancelled_leader():
+    flight, release, calls = SingleFlight(), threading.Event(), []
+
+    def fn():
+        calls.append(1)
+        if len(calls) == 1:
+            release.wait(5)
+            raise JobCancelled("cancelled")
+        return "done"
+
+    threads, out = run_concurrently(flight, "k", fn, 2, retry_on=(JobCancelled,))
+    wait_for_waiters(flight, 1)
+    release.set()
+    for t in threads:
+        t.join()
+    assert ("done", False) in out and any(isinstance(e, JobCancelled) for e in out)
+    assert flight.executed == 2
+
+
+def test_poll_can_stop_a_waiter():
+    flight, release = SingleFlight(), threading.Event()
+    leader = threading.Thread(target=flight.do, args=("k", lambda: release.wait(5)))
+    leader.start()
+    while not flight.stats()["in_flight"]:
+        threading.Event().wait(0.005)
+
+    def poll():
+        raise JobCancelled("stop waiting")
+
+    with pytest.raises(JobCancelled):
+        flight.do("k", lambda: None, poll=poll, interval=0.01)
+    release.set()
+    leader.join()
@@ -0,0 +1,90 @@
+import io
+
+import numpy as np
+import pytest
+
+from ml.timeseries import aggregate, build_pyramid, downsample_mean, load_pyramids, lttb, pyramid_arrays, query
+
+FPS = 10
+
+
+@pytest.fixture(scope="module")
+def series():
+    """Ten minutes at FPS of a noisy wave with a few untracked stretches and one spike."""
+    rng = np.random.default_rng(0)
+    t = np.arange(600 * FPS) / FPS
+    y = np.sin(t / 30) + rng.normal(0, 0.1, len(t))
+    y[1000:1040] = np.nan
+    y[3333] = 25.0
+    return y
+
+
+def test_aggregate_ignores_nan_per_bucket():
+    stats = aggregate([1.0, np.nan, 3.0, np.nan, np.nan, np.nan, 7.0], 2)
+    assert stats["min"].tolist()[0] == 1.0 and stats["max"].tolist()[0] == 1.0
+    assert stats["mean"].tolist()[1] == 3.0
+    assert np.isnan(stats["mean"][2]) and np.isnan(stats["min"][2])  # all-NaN bucket
+    assert stats["mean"].tolist()[3] == 7.0  # short last bucket
+
+
+def test_pyramid_levels_and_round_trip(series):
+    pyramid = build_pyramid(series.tolist(), FPS)
+    assert [len(pyramid[level]["mean"]) for level in (1, 10, 60)] == [600, 60, 10]
+    assert np.nanmax(pyramid[60]["max"]) == 25.0  # the spike survives the coarsest level
+
+    buf = io.BytesIO()
+    np.savez(buf, **pyramid_arrays("compactness.A", pyramid))
+    buf.seek(0)
+    loaded = load_pyramids(np.load(buf))["compactness.A"]
+    np.testing.assert_array_equal(loaded["raw"], pyramid["raw"])
+    np.testing.assert_array_equal(loaded[10]["min"], pyramid[10]["min"])
+
+
+@pytest.mark.parametrize("n_out", [3, 10, 99, 500])
+def test_lttb_keeps_endpoints_and_point_count(series, n_out):
+    t = np.arange(len(series)) / FPS
+    series = series.copy()
+    series[0] = np.nan  # the first tracked point is the endpoint
+    idx = lttb(t, series, n_out)
+    valid = np.flatnonzero(~np.isnan(series))
+    assert len(idx) == n_out
+    assert idx[0] == valid[0] and idx[-1] == valid[-1]
+    assert np.all(np.diff(idx) > 0) and not np.isnan(series[idx]).any()
+
+
+def test_lttb_keeps_peaks(series):
+    idx = lttb(np.arange(len(series)) / FPS, series, 50)
+    assert 3333 in idx
+
+
+def test_lttb_returns_every_point_when_asked_for_more():
+    y = np.array([1.0, np.nan, 2.0, 3.0])
+    assert lttb(np.arange(4.0), y, 10).tolist() == [0, 2, 3]
+
+
+def test_short_windows_read_raw_frames(series):
+    pyramid = build_pyramid(series, FPS)
+    out = query(pyramid, FPS, start=300, end=330, points=100)
+    assert out["resolution_s"] == 1 / FPS and len(out["t"]) == 100
+    assert out["t"][0] == 300.0 and out["t"][-1] == pytest.approx(330 - 1 / FPS)
+
+
+def test_long_windows_read_the_coarsest_level_with_enough_buckets(series):
+    pyramid = build_pyramid(series, FPS)
+    out = query(pyramid, FPS, points=50)
+    assert out["resolution_s"] == 10 and len(out["t"]) == 50
+    assert out["start"] == 0.0 and out["end"] == 600.0
+    assert out["t"][0] == 5.0 and out["t"][-1] == 595.0  # first and last bucket centres
+    assert all(lo <= v <= hi for lo, v, hi in zip(out["min"], out["value"], out["max"]) if v is not None)
+    assert max(v for v in out["max"] if v is not None) == 25.0
+    assert query(pyramid, FPS, points=500)["resolution_s"] == 1
+
+
+def test_query_window_is_clipped_to_the_match(series):
+    out = query(build_pyramid(series, FPS), FPS, start=-5, end=10_000, points=20)
+    assert out["start"] == 0.0 and out["end"] == 600.0
+
+
+def test_downsample_mean_point_count():
+    assert len(downsample_mean(list(range(1000)), 7)) == 7
+    assert downsample_mean([1.0, None, 3.0], 10) == [1.0, None, 3.0]
@@ -0,0 +1,31 @@
+import pytest
+
+from ml.tracking_json import BACKENDS, iter_frames, iter_lines, iter_records, iter_text_lines
+
+LINES = [
+    '{"frame": 1, "player_data": []}\n',
+    "\n",
+    '{"frame": 2, "note": "Júlio – café"}\r\n',
+    '  {"frame": 3}  \n',
+    '{"frame": 4}',  # no trailing newline
+]
+
+
+@pytest.fixture
+def jsonl(tmp_path):
+    path = tmp_path / "frames.jsonl"
+    path.write_bytes("".join(LINES).encode("utf-8"))
+    return path
+
+
+def test_text_lines_give_the_same_byte_offsets(jsonl):
+    spans = [(pos, size) for pos, size, _ in iter_lines(jsonl, block_size=7)]
+    assert [(pos, size) for pos, size, _ in iter_text_lines(jsonl)] == spans
+    data = jsonl.read_bytes()
+    assert [data[pos:pos + size].strip() for pos, size in spans] == [line for _, _, line in iter_lines(jsonl)]
+
+
+@pytest.mark.parametrize("backend", list(BACKENDS))
+def test_backends_decode_the_same_frames(jsonl, backend):
+    assert [fr["frame"] for _, _, fr in iter_records(jsonl, backend)] == [1, 2, 3, 4]
+    assert list(iter_frames(jsonl, backend)) == list(iter_frames(jsonl, "stdlib"))
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from ml.model0_load_data import (
+    build_frame_index, build_tracking_cache, cache_is_fresh, iter_tracking, load_tracking, read_window,
+)
+
+# (start, end, period); clocks restart at 0 in each period of the synthetic match
+WINDOWS = [
+    (30.0, 60.0, None),
+    (30.0, 60.0, 1),
+    (30.0, 60.0, 2),
+    (None, 45.0, None),
+    (100.0, None, None),
+    (None, None, 2),
+    (500.0, 600.0, None),  # past the end of both periods
+]
+
+
+def frame_numbers(frames):
+    if hasattr(frames, "frame"):
+        return np.asarray(frames.frame).tolist()
+    return [fr["frame"] for fr in frames]
+
+
+@pytest.mark.parametrize("start,end,period", WINDOWS)
+@pytest.mark.parametrize("valid_only", [False, True])
+def test_cache_index_and_stream_agree(tracking_file, start, end, period, valid_only):
+    build_tracking_cache(tracking_file)
+    build_frame_index(tracking_file)
+    assert cache_is_fresh(tracking_file)
+
+    cache = frame_numbers(read_window(start, end, period, valid_only, tracking_file=tracking_file))
+    index = frame_numbers(iter_tracking(start, end, period, valid_only, tracking_file=tracking_file))
+    stream = frame_numbers(iter_tracking(start, end, period, valid_only, tracking_file=tracking_file,
+                                         use_index=False))
+    assert cache == index == stream
+
+
+@pytest.mark.parametrize("start,end,period", WINDOWS)
+def test_load_tracking_same_with_or_without_cache(tracking_file, match_id, start, end, period):
+    uncached = frame_numbers(load_tracking(use_cache=False, start=start, end=end, period=period, match_id=match_id))
+    build_tracking_cache(tracking_file)
+    cached = frame_numbers(load_tracking(use_cache=True, start=start, end=end, period=period, match_id=match_id))
+    assert cached == uncached
+
+
+def test_window_without_period_spans_both_periods(tracking_file, match_id):
+    frames = load_tracking(use_cache=False, start=30.0, end=60.0, match_id=match_id)
+    assert {fr["period"] for fr in frames} == {1, 2}
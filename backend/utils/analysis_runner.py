@@ -0,0 +1,340 @@
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from ml import model1, model2_real, model3_fixed, engine, season
+from ml.model0_load_data import MATCH_ID, data_fingerprint
+from ml.match_store import get_tracking, peek_tracking, get_match_metadata
+from ml.model1 import compute_model1
+from ml.model2_real import compute_model2
+from ml.model3_fixed import compute_model3, DEFAULT_RESOLUTION, GRID_RESOLUTIONS
+from ml.engine import compute_metrics, METRICS
+from ml.match_registry import match_ids, require_match
+from ml.phases import resolve_filter
+from ml.season import season_fingerprint, season_totals
+from ml.timeseries import downsample_tree, iter_series, build_pyramid, pyramid_arrays, load_pyramids, query
+from utils.jobs import jobs, JobCancelled
+from utils.metrics import CACHE_REQUESTS, COALESCED
+from utils.profiling import capture
+from utils.result_cache import result_key, results
+from utils.single_flight import SingleFlight
+from utils.telemetry import stage
+
+# default window per analysis (None = full match)
+DEFAULT_MINUTES = {
+    "tactical-shape": 5,
+    "player-performance": None,
+    "pitch-control": 5,
+    "batch": 5,
+    "season": None,
+}
+
+
+def _no_progress(progress, stage=None):
+    pass
+
+
+def _tactical_shape(params, report):
+    report(0.05, "loading")
+    frames, meta = peek_tracking(params["match_id"]), get_match_metadata(params["match_id"])
+    report(0.2, "computing")
+    data = compute_model1(frames, meta, n_minutes=params["n_minutes"], phase=params.get("phase"))
+    return {"message": "Model 1 complete", "data": data}
+
+
+def _player_performance(params, report):
+    report(0.05, "loading")
+    frames, meta = get_tracking(params["match_id"]), get_match_metadata(params["match_id"])
+    report(0.3, "computing")
+    data = compute_model2(frames, meta, n_minutes=params["n_minutes"], phase=params.get("phase"))
+    return {"message": "Model 2 complete", "data": data}
+
+
+def _pitch_control(params, report):
+    report(0.05, "loading")
+    frames, meta = peek_tracking(params["match_id"]), get_match_metadata(params["match_id"])
+    report(0.2, "computing")
+    data = compute_model3(frames, meta, n_minutes=params["n_minutes"], phase=params.get("phase"))
+    return {"message": "Model 3 complete", "data": data}
+
+
+def _batch(params, report):
+    report(0.05, "loading")
+    frames, meta = get_tracking(params["match_id"]), get_match_metadata(params["match_id"])
+    report(0.2, "computing")
+    data = compute_metrics(frames, meta, params["metrics"], params["n_minutes"], resolutions=params["resolutions"],
+                           phase=params.get("phase"))
+    return {"message": "Batch analysis complete", "data": data}
+
+
+def _season(params, report):
+    report(0.0, "computing")
+    data = season_totals(params["match_ids"], n_minutes=params["n_minutes"], phase=params.get("phase"),
+                         progress=lambda fraction, stage=None: report(0.9 * fraction, stage))
+    return {"message": f"Season totals over {len(data['matches'])} matches", "data": data}
+
+
+ANALYSES = {
+    "tactical-shape": _tactical_shape,
+    "player-performance": _player_performance,
+    "pitch-control": _pitch_control,
+    "batch": _batch,
+    "season": _season,
+}
+
+# modules providing plot_names(data) / render_plot(data, name, path) for an analysis
+PLOTTERS = {
+    "tactical-shape": model1,
+    "player-performance": model2_real,
+    "pitch-control": model3_fixed,
+}
+
+# parts of each analysis' data holding per-frame series (reduced by max_points)
+SERIES = {
+    "tactical-shape": ("series",),
+    "batch": ("compactness", "defensive_line"),
+}
+
+MODEL_VERSIONS = {
+    "tactical-shape": model1.MODEL_VERSION,
+    "player-performance": model2_real.MODEL_VERSION,
+    "pitch-control": model3_fixed.MODEL_VERSION,
+    "batch": engine.MODEL_VERSION,
+    "season": f"{season.MODEL_VERSION}.{model2_real.MODEL_VERSION}",
+}
+
+# identical analyses in progress, keyed like the result cache
+inflight = SingleFlight()
+COALESCED.collect(lambda: {(): inflight.coalesced})
+
+PYRAMID_FILE = "pyramid.npz"
+PYRAMID_CACHE_SIZE = 32  # loaded pyramids kept in memory, by result key
+_pyramids = OrderedDict()
+_pyramids_lock = threading.Lock()
+
+
+def analysis_params(kind, data):
+    """Validated parameters for an analysis from a request body."""
+    if kind not in ANALYSES:
+        raise ValueError(f"Unknown analysis: {kind}")
+    data = data or {}
+    if not isinstance(data, dict):
+        raise ValueError("Analysis parameters must be an object")
+    params = {"n_minutes": data.get("n_minutes", DEFAULT_MINUTES[kind])}
+    if params["n_minutes"] is not None:
+        try:
+            params["n_minutes"] = float(params["n_minutes"])
+        except (TypeError, ValueError):
+            raise ValueError("n_minutes must be a number or null")
+        if not math.isfinite(params["n_minutes"]) or params["n_minutes"] <= 0:
+            raise ValueError("n_minutes must be a positive, finite number")
+    if data.get("phase"):
+        if not isinstance(data["phase"], dict):
+            raise ValueError("phase must be an object, e.g. {\"out_of_possession\": \"low_block\"}")
+        resolve_filter(data["phase"])  # rejects unknown keys
+        params["phase"] = data["phase"]
+    if kind == "season":
+        # every analysable match unless the request names some
+        wanted = data.get("match_ids") or match_ids()
+        if not isinstance(wanted, list):
+            raise ValueError("match_ids must be a list")
+        params["match_ids"] = sorted({require_match(m) for m in wanted})
+        if not params["match_ids"]:
+            raise ValueError("No matches to analyse")
+    else:
+        params["match_id"] = require_match(data.get("match_id") or MATCH_ID)
+    if kind == "batch":
+        params["metrics"] = _names(data, "metrics", METRICS, METRICS)
+        params["resolutions"] = _names(data, "resolutions", GRID_RESOLUTIONS, [DEFAULT_RESOLUTION])
+    return params
+
+
+def _names(data, field, known, default):
+    """data[field] as a list of known names (default when absent or empty)."""
+    names = data.get(field) or default
+    if not isinstance(names, (list, tuple)):
+        raise ValueError(f"{field} must be a list, e.g. {list(default)}")
+    unknown = [n for n in names if not isinstance(n, str) or n not in known]
+    if unknown:
+        raise ValueError(f"Unknown {field}: {', '.join(map(str, unknown))} (have: {', '.join(known)})")
+    return list(names)
+
+
+def _plot_urls(kind, key, data):
+    plots = PLOTTERS.get(kind)
+    return [f"/api/analysis/results/{key}/plots/{name}" for name in plots.plot_names(data)] if plots else []
+
+
+def _compute(kind, params, key, report, fresh=False):
+    cached = None if fresh else results.get(key, record=False)
+    if cached is not None:
+        # finished by an earlier flight between our lookup and this one starting
+        return dict(cached, cached=True)
+
+    with stage(f"analysis.{kind}"):
+        result = ANALYSES[kind](params, report)
+    report(0.95, "saving")
+    result.update(model=kind, key=key, data_url=f"/api/analysis/results/{key}",
+                  files=_plot_urls(kind, key, result["data"]))
+    with stage("store.result", model=kind) as info:
+        manifest = []
+        if kind in SERIES:
+            manifest = _store_pyramids(result)
+        results.commit(key, kind, params, result, manifest)
+        stored = results.entry_dir(key) / results.RESULT_FILE
+        info["bytes_written"] = sum(a["bytes"] for a in manifest) + _file_size(stored)
+    return dict(result, cached=False)
+
+
+def _file_size(path):
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
+
+
+def _store_pyramids(result):
+    """Write the series pyramids of a result as one npz artifact; returns its manifest."""
+    data = result["data"]
+    arrays = {}
+    for part in SERIES[result["model"]]:
+        # model1 keeps everything under "series"; that level adds nothing to the names
+        for name, values in iter_series(data.get(part), "" if part == "series" else part):
+            arrays.update(pyramid_arrays(name, build_pyramid(values, data["fps"])))
+    result["series"] = sorted({name.partition("__")[0] for name in arrays})
+    result["series_url"] = f"/api/analysis/results/{result['key']}/series"
+    staged = results.stage()
+    try:
+        np.savez(staged / PYRAMID_FILE, **arrays)
+        return results.store_artifacts(staged)
+    finally:
+        results.discard(staged)
+
+
+def run_analysis(kind, params, report=_no_progress):
+    """Run one analysis, or return its stored result if the same match data,
+    model version and parameters were already computed.
+
+    Identical requests that arrive while one is still running wait for it
+    rather than computing the same result again. Images are not rendered here;
+    the URLs in "files" render them on first request (see plot_file).
+    """
+    key = analysis_key(kind, params)
+    cached = results.get(key)
+    if cached is not None:
+        report(1.0, "cached")
+        return dict(cached, cached=True, coalesced=False)
+
+    result, shared = inflight.do(
+        key,
+        lambda: _compute(kind, params, key, report),
+        poll=lambda: report(0.0, "waiting for identical analysis"),
+        retry_on=(JobCancelled,),
+    )
+    return dict(result, coalesced=shared)
+
+
+def analysis_key(kind, params):
+    """Result-cache key: the match data, model version and parameters."""
+    fingerprint = season_fingerprint(params["match_ids"]) if kind == "season" else data_fingerprint(params["match_id"])
+    return result_key(fingerprint, kind, MODEL_VERSIONS[kind], params)
+
+
+def profile_analysis(kind, params, report=_no_progress):
+    """Compute an analysis afresh (never from the cache or another flight)
+    under cProfile and tracemalloc; the result gains a "profile" entry (see
+    utils.profiling.capture) that is returned but not cached."""
+    key = analysis_key(kind, params)
+    result, profile = capture(lambda: _compute(kind, params, key, report, fresh=True))
+    return dict(result, coalesced=False, profile=profile)
+
+
+def reduce_result(result, max_points):
+    """Copy of a result with its per-frame series reduced to max_points values."""
+    if not max_points or result.get("model") not in SERIES:
+        return result
+    data = dict(result["data"])
+    for part in SERIES[result["model"]]:
+        if part in data:
+            data[part] = downsample_tree(data[part], max_points)
+    return dict(result, data=data, max_points=max_points)
+
+
+def _result_pyramids(key):
+    with _pyramids_lock:
+        if key in _pyramids:
+            _pyramids.move_to_end(key)
+            CACHE_REQUESTS.inc(cache="pyramids", result="hit")
+            return _pyramids[key]
+    CACHE_REQUESTS.inc(cache="pyramids", result="miss")
+    entry = results.entry(key)
+    if entry is None:
+        return None
+    artifact = next((a["artifact"] for a in entry["manifest"] if a["path"] == PYRAMID_FILE), None)
+    if artifact is None or not results.artifacts.exists(artifact):
+        return None
+    results.artifacts.touch(artifact)
+    with np.load(results.artifacts.path(artifact)) as arrays:
+        loaded = (entry["result"]["data"]["fps"], load_pyramids(arrays))
+    with _pyramids_lock:
+        _pyramids[key] = loaded
+        while len(_pyramids) > PYRAMID_CACHE_SIZE:
+            _pyramids.popitem(last=False)
+    return loaded
+
+
+def series_window(key, name, start=None, end=None, points=500):
+    """About `points` samples of one stored series between start and end
+    (seconds), read from its pyramid; None if the result or series is unknown."""
+    loaded = _result_pyramids(key)
+    if loaded is None or name not in loaded[1]:
+        return None
+    fps, pyramids = loaded
+    return dict(query(pyramids[name], fps, start, end, points), series=name)
+
+
+def plot_file(key, name):
+    """Path of one result image, rendered and stored on first request; None if unknown."""
+    entry = results.entry(key)
+    if entry is None:
+        return None
+    for a in entry["manifest"]:
+        if a["path"] == name and results.artifacts.exists(a["artifact"]):
+            return results.artifacts.path(a["artifact"])
+    plots = PLOTTERS.get(entry["model"])
+    data = entry["result"]["data"]
+    if plots is None or name not in plots.plot_names(data):
+        return None
+
+    def render():
+        staged = results.stage()
+        try:
+            target = staged / name
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with stage(f"plot.{entry['model']}", plot=name) as info:
+                plots.render_plot(data, name, target)
+                info["bytes_written"] = target.stat().st_size
+            manifest = results.store_artifacts(staged)
+            results.add_artifacts(key, manifest)
+        finally:
+            results.discard(staged)
+        return manifest[0]["artifact"]
+
+    artifact, _ = inflight.do(("plot", key, name), render)
+    return results.artifacts.path(artifact)
+
+
+def submit_analysis(kind, data, profile=False, keep_result=False):
+    """Queue an analysis on the job pool; raises ValueError / QueueFull."""
+    params = analysis_params(kind, data)
+    run = profile_analysis if profile else run_analysis
+    return jobs.submit(kind, lambda job: run(kind, params, job.report), params, keep_result)
+
+
+def run_queued(kind, data, profile=False):
+    """Run an analysis on the job pool and wait for its result, so synchronous
+    requests count against ANALYSIS_WORKERS like queued ones; raises
+    ValueError / QueueFull / ProfilerBusy / JobCancelled."""
+    return jobs.wait(submit_analysis(kind, data, profile, keep_result=True))
@@ -0,0 +1,77 @@
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+URL_PREFIX = "/artifacts"
+
+
+def file_digest(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ArtifactStore:
+    """Content-addressed files under root/<aa>/<sha256><ext>.
+
+    A file is stored once however many results produce it; names are the
+    relative blob paths, and a blob's mtime records when it was last served.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self.stored = 0
+        self.deduplicated = 0
+
+    def path(self, name):
+        return self.root / name
+
+    def url(self, name):
+        return f"{URL_PREFIX}/{name}"
+
+    def put(self, src):
+        """Move src into the store and return its name; src is consumed."""
+        src = Path(src)
+        digest = file_digest(src)
+        name = f"{digest[:2]}/{digest}{src.suffix.lower()}"
+        target = self.path(name)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            if target.exists():
+                src.unlink()
+                os.utime(target)
+                self.deduplicated += 1
+            else:
+                os.replace(src, target)
+                self.stored += 1
+        return name
+
+    def exists(self, name):
+        return self.path(name).is_file()
+
+    def touch(self, name):
+        try:
+            os.utime(self.path(name))
+        except OSError:
+            pass
+
+    def remove(self, name):
+        try:
+            self.path(name).unlink()
+        except OSError:
+            pass
+
+    def files(self):
+        """{name: (bytes, last_served)} for every stored blob."""
+        out = {}
+        for p in self.root.glob("??/*"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            out[p.relative_to(self.root).as_posix()] = (st.st_size, st.st_mtime)
+        return out
@@ -0,0 +1,184 @@
+import contextvars
+import datetime
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+from config import Config
+from utils.metrics import JOBS
+from utils.telemetry import bind
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class QueueFull(Exception):
+    pass
+
+
+def _now():
+    return datetime.datetime.utcnow().isoformat() + "Z"
+
+
+class Job:
+    def __init__(self, kind, params, keep_result=False):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.status = QUEUED
+        self.progress = 0.0
+        self.stage = "queued"
+        self.result = None  # only while a waiter (JobManager.wait) has yet to collect it
+        self.keep_result = keep_result
+        self.data_url = None
+        self.files = []
+        self.profile = None
+        self.error = None
+        self.exception = None
+        self.created_at = _now()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        self._cancel = threading.Event()
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    def report(self, progress, stage=None):
+        """Called by the running job between stages; raises JobCancelled if cancelled."""
+        if self._cancel.is_set():
+            raise JobCancelled()
+        self.progress = max(self.progress, min(float(progress), 1.0))
+        if stage:
+            self.stage = stage
+
+    def to_dict(self):
+        """Status for polling; the result itself is fetched from data_url."""
+        out = {
+            "id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "status": self.status,
+            "progress": round(self.progress, 3),
+            "stage": self.stage,
+            "data_url": self.data_url,
+            "files": self.files,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.profile is not None:
+            out["profile"] = self.profile  # profiles are not stored with the result
+        return out
+
+
+class JobManager:
+    """Bounded worker pool for analysis jobs.
+
+    At most max_workers jobs run at once and at most max_queued wait, so
+    heavy analyses cannot tie up every request thread of the web server.
+    Finished jobs are kept (newest keep_finished) so clients can poll them.
+    """
+
+    def __init__(self, max_workers, max_queued, keep_finished=200):
+        self.max_queued = max_queued
+        self.keep_finished = keep_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, kind, fn, params, keep_result=False):
+        """Queue fn(job) and return the Job immediately.
+
+        fn returns an analysis result (already in the result cache); the job
+        keeps only its data_url and files, or the whole result until wait()
+        collects it when keep_result is set.
+        """
+        with self._lock:
+            if self.queue_depth() >= self.max_queued:
+                raise QueueFull(f"{self.max_queued} analysis jobs already queued")
+            job = Job(kind, params, keep_result)
+            self._jobs[job.id] = job
+            self._trim()
+        # the job logs under the submitting request's bound fields (request_id, ...)
+        job.future = self._executor.submit(contextvars.copy_context().run, self._run, job, fn)
+        return job
+
+    def wait(self, job):
+        """Block until job (submitted with keep_result) has finished and return
+        its result; re-raises what the job raised, or JobCancelled if it was
+        cancelled."""
+        try:
+            job.future.result()
+        except CancelledError:
+            raise JobCancelled()
+        if job.status == CANCELLED:
+            raise JobCancelled()
+        if job.exception is not None:
+            raise job.exception
+        result, job.result = job.result, None
+        return result
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None or job.finished:
+            return job
+        job._cancel.set()
+        if job.future is not None and job.future.cancel():
+            # never started
+            self._finish(job, CANCELLED)
+        return job
+
+    def queue_depth(self):
+        return sum(1 for j in list(self._jobs.values()) if j.status == QUEUED)
+
+    def running(self):
+        return sum(1 for j in list(self._jobs.values()) if j.status == RUNNING)
+
+    def _run(self, job, fn):
+        if job._cancel.is_set():
+            self._finish(job, CANCELLED)
+            return
+        job.status = RUNNING
+        job.stage = "starting"
+        job.started_at = _now()
+        try:
+            with bind(job_id=job.id, job_kind=job.kind):
+                result = fn(job)
+        except JobCancelled:
+            self._finish(job, CANCELLED)
+        except Exception as e:
+            job.error = str(e)
+            job.exception = e
+            self._finish(job, FAILED)
+        else:
+            job.data_url = result.get("data_url")
+            job.files = result.get("files") or []
+            job.profile = result.get("profile")
+            if job.keep_result:
+                job.result = result
+            job.progress = 1.0
+            self._finish(job, DONE)
+
+    def _finish(self, job, status):
+        job.status = status
+        job.stage = status
+        job.finished_at = _now()
+
+    def _trim(self):
+        finished = [jid for jid, j in self._jobs.items() if j.finished]
+        for jid in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[jid]
+
+
+jobs = JobManager(Config.ANALYSIS_WORKERS, Config.ANALYSIS_QUEUE_LIMIT)
+JOBS.collect(lambda: {(QUEUED,): jobs.queue_depth(), (RUNNING,): jobs.running()})
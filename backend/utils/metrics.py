@@ -0,0 +1,166 @@
+import math
+import threading
+
+# upper bounds (seconds) of the latency histogram buckets
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """One metric family; values are kept per tuple of label values."""
+
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._values = {}
+        self._sources = []
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def collect(self, fn):
+        """Read values kept elsewhere at scrape time: fn() -> {label values tuple: value}.
+        They are added to whatever was counted here directly."""
+        self._sources.append(fn)
+        return fn
+
+    def samples(self):
+        """[(suffix, label values, extra labels, value)]"""
+        values = dict(self._values)
+        for fn in self._sources:
+            for key, value in fn().items():
+                key = tuple(str(v) for v in key)
+                values[key] = values.get(key, 0) + value
+        return [("", key, (), value) for key, value in sorted(values.items())]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            samples = self.samples()
+        for suffix, key, extra, value in samples:
+            lines.append(f"{self.name}{suffix}{_labels(self.labelnames, key, extra)} {_number(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=TIME_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * len(self.buckets), 0.0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        out = []
+        for key, (counts, total) in sorted(self._values.items()):
+            running = 0
+            for bound, count in zip(self.buckets, counts):
+                running += count
+                out.append(("_bucket", key, (("le", _number(bound)),), running))
+            out.append(("_sum", key, (), total))
+            out.append(("_count", key, (), running))
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        return "\n".join(m.render() for m in self._metrics) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def counter(name, help, labels=()):
+    return REGISTRY.add(Counter(name, help, labels))
+
+
+def gauge(name, help, labels=()):
+    return REGISTRY.add(Gauge(name, help, labels))
+
+
+def histogram(name, help, labels=(), buckets=TIME_BUCKETS):
+    return REGISTRY.add(Histogram(name, help, labels, buckets))
+
+
+# ------------------------------------------------
+# Metrics shared across the app
+# ------------------------------------------------
+STAGE_SECONDS = histogram("gaffer_stage_seconds", "Time spent in each analysis stage.", ("stage",))
+STAGE_FRAMES = counter("gaffer_stage_frames_total", "Tracking frames processed per stage.", ("stage",))
+BYTES_READ = counter("gaffer_bytes_read_total", "Bytes read from match data files per stage.", ("stage",))
+BYTES_WRITTEN = counter("gaffer_bytes_written_total", "Bytes of results and artifacts written per stage.", ("stage",))
+CACHE_REQUESTS = counter("gaffer_cache_requests_total", "Cache lookups by cache and outcome.", ("cache", "result"))
+COALESCED = counter("gaffer_coalesced_requests_total", "Analyses and plots shared with an identical one in flight.")
+MATCH_CACHE_BYTES = gauge("gaffer_match_cache_bytes", "Approximate size of the parsed match data held in memory.")
+JOBS = gauge("gaffer_jobs", "Background analysis jobs by status (queued = queue depth).", ("status",))
+HTTP_SECONDS = histogram("gaffer_http_request_seconds", "HTTP request latency by route.",
+                         ("method", "route", "status"))
+HTTP_IN_FLIGHT = gauge("gaffer_http_requests_in_flight", "HTTP requests being served.")
+
+
+def render():
+    return REGISTRY.render()
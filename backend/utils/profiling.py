@@ -0,0 +1,128 @@
+# profiling.py - on-demand profile of one analysis
+# An admin can ask for an analysis to run under cProfile and tracemalloc. The
+# result then carries the collapsed call stacks (input for flamegraph.pl or
+# speedscope), the most expensive functions and the top allocation sites.
+# Nothing here runs unless a profile is asked for, so other requests pay nothing.
+
+import cProfile
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+from config import BASE_DIR
+
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 25
+MIN_STACK_SECONDS = 0.0005  # collapsed stacks cheaper than this are left out
+MAX_STACK_DEPTH = 64
+
+# both profilers are process-wide, so one capture at a time
+_lock = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+def _where(filename):
+    if filename.startswith(BASE_DIR):
+        return os.path.relpath(filename, BASE_DIR)
+    return "/".join(filename.replace("\\", "/").split("/")[-2:])
+
+
+def _label(func):
+    filename, line, name = func
+    if filename == "~":  # built-in, e.g. <method 'sort' of 'list' objects>
+        return name
+    return f"{_where(filename)}:{line}({name})"
+
+
+def collapsed_stacks(stats, min_seconds=MIN_STACK_SECONDS, max_depth=MAX_STACK_DEPTH):
+    """Flamegraph-ready "root;...;leaf <microseconds>" lines, largest first.
+
+    cProfile keeps caller -> callee edges rather than whole stacks, so the
+    time of a function called from several places is split over the paths to
+    it in proportion to what each caller spent in it.
+    """
+    table = stats.stats  # func -> (primitive calls, calls, self s, cumulative s, {caller: edge})
+    callees = {}
+    for func, (_, _, _, _, callers) in table.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+    totals = {}
+
+    def walk(func, funcs, labels, share):
+        funcs, labels = funcs + (func,), labels + (_label(func),)
+        self_seconds = table[func][2] * share
+        if self_seconds > 0:
+            stack = ";".join(labels)
+            totals[stack] = totals.get(stack, 0.0) + self_seconds
+        if len(funcs) >= max_depth:
+            return
+        for callee, edge_seconds in callees.get(func, ()):
+            callee_seconds = table[callee][3]
+            if callee in funcs or callee_seconds <= 0 or edge_seconds * share < min_seconds:
+                continue
+            walk(callee, funcs, labels, share * min(1.0, edge_seconds / callee_seconds))
+
+    for func, entry in table.items():
+        if not entry[4] and entry[3] >= min_seconds:
+            walk(func, (), (), 1.0)
+    return [f"{stack} {round(seconds * 1e6)}" for stack, seconds in
+            sorted(totals.items(), key=lambda item: -item[1]) if seconds >= min_seconds]
+
+
+def top_functions(stats, n=TOP_FUNCTIONS):
+    rows = sorted(stats.stats.items(), key=lambda item: -item[1][3])[:n]
+    return [{"function": _label(func), "calls": calls, "self_s": round(tt, 6), "cumulative_s": round(ct, 6)}
+            for func, (_, calls, tt, ct, _) in rows]
+
+
+def top_allocations(snapshot, n=TOP_ALLOCATIONS):
+    """Lines holding the most memory when the capture ended."""
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__),
+                                       tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")])
+    return [{"site": f"{_where(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+             "kib": round(stat.size / 1024, 1), "blocks": stat.count}
+            for stat in snapshot.statistics("lineno")[:n]]
+
+
+def capture(fn):
+    """Run fn() under cProfile and tracemalloc; returns (its result, report).
+
+    cProfile sees only the calling thread: time spent in process pools shows
+    up as waiting on them. tracemalloc counts every thread, so allocations of
+    concurrent requests can appear among the sites. Raises ProfilerBusy if
+    another capture is running.
+    """
+    if not _lock.acquire(blocking=False):
+        raise ProfilerBusy("Another profile is being captured, try again shortly")
+    try:
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            result = fn()
+        finally:
+            profiler.disable()
+            seconds = time.perf_counter() - start
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            if not was_tracing:
+                tracemalloc.stop()
+        stats = pstats.Stats(profiler)
+        return result, {
+            "seconds": round(seconds, 6),
+            "collapsed": collapsed_stacks(stats),
+            "functions": top_functions(stats),
+            "allocations": top_allocations(snapshot),
+            "peak_traced_kib": round(peak / 1024, 1),
+        }
+    finally:
+        _lock.release()
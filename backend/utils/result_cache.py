@@ -0,0 +1,307 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from config import Config
+from utils.artifact_store import ArtifactStore
+from utils.metrics import CACHE_REQUESTS
+
+
+def result_key(fingerprint, model, version, params):
+    """Content address of one analysis result."""
+    blob = json.dumps({"data": fingerprint, "model": model, "version": version, "params": params},
+                      sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+class ResultCache:
+    """Analysis results stored on disk as one manifest per job.
+
+    Files a job renders (in its own scratch folder) are moved into a shared
+    ArtifactStore, where identical files are kept once, and the job's
+    result.json, listing the artifacts it produced, lives in root/jobs/<key>/.
+    A background collector removes unreferenced artifacts and, when the store
+    grows past its byte budget, evicts the least recently served artifacts
+    together with the results that reference them.
+
+    latest() and stats() answer from an in-memory summary of each entry
+    (model, creation time, sizes); a refresh only lists root/jobs and reads
+    the result.json of keys it has not seen yet, so entries written by other
+    processes still show up.
+    """
+
+    RESULT_FILE = "result.json"
+    ORPHAN_GRACE = 60  # seconds before an unreferenced artifact may be collected
+
+    def __init__(self, root, budget_bytes, gc_interval=300):
+        self.root = Path(root)
+        self.artifacts = ArtifactStore(self.root / "artifacts")
+        self.budget_bytes = budget_bytes
+        self.gc_interval = gc_interval
+        self._lock = threading.Lock()
+        self._index_lock = threading.Lock()
+        self._index = {}
+        self._gc_wake = threading.Event()
+        self._gc_thread = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def entry_dir(self, key):
+        return self.root / "jobs" / key
+
+    def _read(self, path):
+        with open(path, "r", encoding="utf-8") as fh:
+            return json.load(fh)
+
+    def get(self, key, record=True):
+        path = self.entry_dir(key) / self.RESULT_FILE
+        try:
+            entry = self._read(path)
+        except (OSError, ValueError):
+            entry = None
+        if entry is not None and not all(self.artifacts.exists(a["artifact"]) for a in entry["manifest"]):
+            # an artifact was collected underneath this result
+            shutil.rmtree(path.parent, ignore_errors=True)
+            entry = None
+        if record:
+            with self._lock:
+                if entry is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+        if entry is None:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass  # removed by a concurrent collection or invalidation
+        return entry["result"]
+
+    def stage(self):
+        """Fresh per-job folder to render a result into."""
+        path = self.root / "staging" / uuid.uuid4().hex
+        path.mkdir(parents=True)
+        return path
+
+    def discard(self, staged):
+        shutil.rmtree(staged, ignore_errors=True)
+
+    def store_artifacts(self, staged):
+        """Move every file the job wrote into the artifact store; returns the manifest."""
+        staged = Path(staged)
+        manifest = []
+        for p in sorted(staged.rglob("*")):
+            if not p.is_file():
+                continue
+            size = p.stat().st_size
+            rel = p.relative_to(staged).as_posix()
+            name = self.artifacts.put(p)
+            manifest.append({"path": rel, "artifact": name, "url": self.artifacts.url(name), "bytes": size})
+        return manifest
+
+    def commit(self, key, model, params, result, manifest=()):
+        entry = {"key": key, "model": model, "params": params, "created_at": time.time(),
+                 "manifest": list(manifest), "result": result}
+        staged = self.stage()
+        with open(staged / self.RESULT_FILE, "w", encoding="utf-8") as fh:
+            json.dump(entry, fh)
+        target = self.entry_dir(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            if target.exists():
+                # someone else finished the same analysis first
+                shutil.rmtree(staged, ignore_errors=True)
+            else:
+                os.replace(staged, target)
+                self._index_entry(key, entry, target / self.RESULT_FILE)
+        self._wake_gc()
+        return result
+
+    def entry(self, key):
+        """Full stored entry (manifest included) without counting a hit."""
+        try:
+            return self._read(self.entry_dir(key) / self.RESULT_FILE)
+        except (OSError, ValueError):
+            return None
+
+    def add_artifacts(self, key, manifest):
+        """Record files rendered after the result was committed (e.g. lazy plots)."""
+        path = self.entry_dir(key) / self.RESULT_FILE
+        with self._lock:
+            try:
+                entry = self._read(path)
+            except (OSError, ValueError):
+                return False
+            paths = {a["path"] for a in manifest}
+            entry["manifest"] = [a for a in entry["manifest"] if a["path"] not in paths] + list(manifest)
+            tmp = path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump(entry, fh)
+            os.replace(tmp, path)
+            self._index_entry(key, entry, path)
+        self._wake_gc()
+        return True
+
+    def entries(self):
+        out = []
+        for result_file in (self.root / "jobs").glob(f"*/{self.RESULT_FILE}"):
+            try:
+                entry = self._read(result_file)
+                st = result_file.stat()
+                entry["last_used"] = st.st_mtime
+                entry["bytes"] = st.st_size
+            except (OSError, ValueError):
+                continue
+            out.append(entry)
+        return out
+
+    def _index_entry(self, key, entry, path):
+        try:
+            size = path.stat().st_size
+        except OSError:
+            return
+        with self._index_lock:
+            self._index[key] = {
+                "model": entry["model"],
+                "created_at": entry["created_at"],
+                "bytes": size,
+                "referenced": sum(a["bytes"] for a in entry["manifest"]),
+            }
+
+    def summaries(self):
+        """{key: summary} for every stored entry, reading only entries not seen before."""
+        try:
+            keys = set(os.listdir(self.root / "jobs"))
+        except OSError:
+            keys = set()
+        with self._index_lock:
+            for gone in self._index.keys() - keys:
+                del self._index[gone]
+            new = keys - self._index.keys()
+        for key in new:
+            path = self.entry_dir(key) / self.RESULT_FILE
+            try:
+                entry = self._read(path)
+            except (OSError, ValueError):
+                continue  # still being written, or already removed
+            self._index_entry(key, entry, path)
+        with self._index_lock:
+            return {key: dict(s) for key, s in self._index.items() if key in keys}
+
+    def latest(self, model):
+        summaries = {k: s for k, s in self.summaries().items() if s["model"] == model}
+        for key in sorted(summaries, key=lambda k: summaries[k]["created_at"], reverse=True):
+            entry = self.entry(key)
+            if entry is not None:
+                return entry["result"]
+        return None
+
+    def invalidate(self, model=None):
+        """Delete cached results (all, or one model's); returns how many were removed.
+
+        Their artifacts are reclaimed by the next collection.
+        """
+        removed = 0
+        with self._lock:
+            for key, summary in self.summaries().items():
+                if model is None or summary["model"] == model:
+                    shutil.rmtree(self.entry_dir(key), ignore_errors=True)
+                    removed += 1
+        self._wake_gc()
+        return removed
+
+    def collect(self, grace=ORPHAN_GRACE):
+        """Delete unreferenced artifacts, then evict least recently served ones
+        (and every result using them) until the store fits the budget."""
+        with self._lock:
+            now = time.time()
+            entries = self.entries()
+            blobs = self.artifacts.files()
+            users = {}
+            for entry in entries:
+                for a in entry["manifest"]:
+                    users.setdefault(a["artifact"], set()).add(entry["key"])
+
+            used = sum(e["bytes"] for e in entries)
+            for name, (size, mtime) in blobs.items():
+                if name not in users and now - mtime >= grace:
+                    self.artifacts.remove(name)
+                else:
+                    used += size
+
+            dropped = set()
+            for name in sorted(users, key=lambda n: blobs.get(n, (0, 0))[1]):
+                if used <= self.budget_bytes:
+                    break
+                for key in users[name] - dropped:
+                    shutil.rmtree(self.entry_dir(key), ignore_errors=True)
+                    dropped.add(key)
+                    self.evictions += 1
+                self.artifacts.remove(name)
+                used -= blobs.get(name, (0, 0))[0]
+
+            for entry in sorted(entries, key=lambda e: e["last_used"]):
+                # results without images still hold their JSON
+                if used <= self.budget_bytes:
+                    break
+                if entry["key"] not in dropped:
+                    shutil.rmtree(self.entry_dir(entry["key"]), ignore_errors=True)
+                    dropped.add(entry["key"])
+                    self.evictions += 1
+                    used -= entry["bytes"]
+
+            # artifacts only the evicted results referenced
+            for name, keys in users.items():
+                if keys <= dropped and self.artifacts.exists(name):
+                    self.artifacts.remove(name)
+
+            for staged in (self.root / "staging").glob("*"):
+                # scratch folders left behind by a crashed worker
+                if now - staged.stat().st_mtime >= max(grace, 3600):
+                    shutil.rmtree(staged, ignore_errors=True)
+
+    def _wake_gc(self):
+        if self._gc_thread is None:
+            with self._lock:
+                if self._gc_thread is None:
+                    self._gc_thread = threading.Thread(target=self._gc_loop, name="result-gc", daemon=True)
+                    self._gc_thread.start()
+        self._gc_wake.set()
+
+    def _gc_loop(self):
+        while True:
+            self._gc_wake.wait(self.gc_interval)
+            self._gc_wake.clear()
+            try:
+                self.collect()
+            except OSError:
+                pass
+
+    def stats(self):
+        summaries = self.summaries().values()
+        blobs = self.artifacts.files()
+        referenced = sum(s["referenced"] for s in summaries)
+        stored = sum(size for size, _ in blobs.values())
+        return {
+            "entries": len(summaries),
+            "artifacts": len(blobs),
+            "used_bytes": stored + sum(s["bytes"] for s in summaries),
+            "saved_bytes": max(0, referenced - stored),
+            "budget_bytes": self.budget_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "artifacts_stored": self.artifacts.stored,
+            "artifacts_deduplicated": self.artifacts.deduplicated,
+        }
+
+
+results = ResultCache(Path(Config.OUTPUT_DIR) / "results", Config.RESULT_CACHE_MB * 1024 * 1024,
+                      Config.RESULT_GC_SECONDS)
+CACHE_REQUESTS.collect(lambda: {("results", "hit"): results.hits, ("results", "miss"): results.misses})
@@ -0,0 +1,64 @@
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time.
+
+    Callers arriving while a call for the same key is in flight wait for it
+    and share its result (or its exception) instead of running fn again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, poll=None, interval=0.25, retry_on=()):
+        """Return (result, shared). shared is True when another caller computed it.
+
+        poll() is called every interval seconds while waiting (it may raise to
+        stop waiting). If the in-flight call fails with one of retry_on, a
+        waiter retries instead of inheriting the error.
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                    self.executed += 1
+                else:
+                    self.coalesced += 1
+
+            if leader:
+                try:
+                    call.result = fn()
+                except BaseException as e:
+                    call.error = e
+                    raise
+                finally:
+                    with self._lock:
+                        del self._calls[key]
+                    call.done.set()
+                return call.result, False
+
+            while not call.done.wait(interval):
+                if poll is not None:
+                    poll()
+            if call.error is None:
+                return call.result, True
+            if not isinstance(call.error, retry_on):
+                raise call.error
+
+    def stats(self):
+        with self._lock:
+            in_flight = len(self._calls)
+        return {"in_flight": in_flight, "executed": self.executed, "coalesced": self.coalesced}
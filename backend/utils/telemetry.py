@@ -0,0 +1,151 @@
+# telemetry.py - structured logs and stage timings
+# Every stage of an analysis (loading, frame selection, each metric, plotting,
+# writing results) runs inside stage(), which times it into the
+# gaffer_stage_seconds histogram, counts the frames and bytes it reports and
+# logs one structured record. Records carry the fields bound to the current
+# request or job (request_id, job_id, ...), so one analysis can be followed
+# through the log.
+
+import contextvars
+import json
+import logging
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+
+from config import Config
+from utils.metrics import BYTES_READ, BYTES_WRITTEN, HTTP_IN_FLIGHT, HTTP_SECONDS, STAGE_FRAMES, STAGE_SECONDS
+
+log = logging.getLogger("gaffer.stage")
+http_log = logging.getLogger("gaffer.http")
+
+_context = contextvars.ContextVar("telemetry_context", default={})
+
+# attributes every LogRecord has; anything else came in through extra=
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+def record_fields(record):
+    """Bound context plus the extra= fields of a record."""
+    fields = dict(_context.get())
+    fields.update((k, v) for k, v in vars(record).items() if k not in _RECORD_ATTRS)
+    return fields
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, message and the record's fields."""
+
+    def format(self, record):
+        out = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        out.update(record_fields(record))
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for local runs: the message followed by key=value fields."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        fields = " ".join(f"{k}={v}" for k, v in record_fields(record).items())
+        return f"{line} {fields}" if fields else line
+
+
+FORMATTERS = {"json": JsonFormatter, "text": TextFormatter}
+_handler = None
+
+
+def configure_logging(level=None, fmt=None):
+    """Send log records to stderr as Config.LOG_FORMAT ("json" or "text") at Config.LOG_LEVEL.
+    Safe to call more than once; the last call wins."""
+    global _handler
+    fmt = fmt or Config.LOG_FORMAT
+    if fmt not in FORMATTERS:
+        raise ValueError(f"Unknown log format {fmt!r} (have: {', '.join(FORMATTERS)})")
+    root = logging.getLogger()
+    if _handler is not None:
+        root.removeHandler(_handler)
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(FORMATTERS[fmt]())
+    root.addHandler(_handler)
+    root.setLevel((level or Config.LOG_LEVEL).upper())
+
+
+@contextmanager
+def bind(**fields):
+    """Add fields to every record logged inside the block (in this thread / context)."""
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+@contextmanager
+def stage(name, **fields):
+    """Time one stage of the work.
+
+    Yields a dict the block may add fields to; frames, bytes_read and
+    bytes_written are also counted into the stage metrics. name is a metric
+    label, so it must come from a small fixed set (e.g. "model1.compactness").
+    """
+    info = dict(fields)
+    start = time.perf_counter()
+    try:
+        yield info
+    except BaseException as e:
+        info["error"] = type(e).__name__
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS.observe(seconds, stage=name)
+        if info.get("frames"):
+            STAGE_FRAMES.inc(info["frames"], stage=name)
+        if info.get("bytes_read"):
+            BYTES_READ.inc(info["bytes_read"], stage=name)
+        if info.get("bytes_written"):
+            BYTES_WRITTEN.inc(info["bytes_written"], stage=name)
+        log.info("%s took %.3f s", name, seconds, extra={"event": "stage", "stage": name,
+                                                         "seconds": round(seconds, 6), **info})
+
+
+def instrument_app(app):
+    """Per-route latency histogram, in-flight gauge and one log record per request."""
+    from flask import g, request
+
+    @app.before_request
+    def _start_request():
+        g.telemetry_start = time.perf_counter()
+        g.telemetry_context = bind(request_id=request.headers.get("X-Request-ID") or uuid.uuid4().hex)
+        g.telemetry_context.__enter__()
+        HTTP_IN_FLIGHT.inc()
+
+    @app.after_request
+    def _observe_request(response):
+        start = g.get("telemetry_start")
+        if start is None:
+            return response
+        seconds = time.perf_counter() - start
+        route = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+        HTTP_SECONDS.observe(seconds, method=request.method, route=route, status=response.status_code)
+        http_log.info("%s %s %s", request.method, request.path, response.status_code,
+                      extra={"event": "request", "method": request.method, "route": route, "path": request.path,
+                             "status": response.status_code, "seconds": round(seconds, 6)})
+        return response
+
+    @app.teardown_request
+    def _end_request(exc):
+        context = g.pop("telemetry_context", None)
+        if context is not None:
+            HTTP_IN_FLIGHT.dec()
+            context.__exit__(None, None, None)
@@ -1,10 +1,9 @@
 console.log("player-performance.js loaded");
 
 // Backend URLs
-const ANALYSIS_API_URL =
-  "http://127.0.0.1:5500/api/analysis/player-performance";
-const IMAGES_API_URL =
-  "http://127.0.0.1:5500/api/analysis/player-performance/images";
+const API_BASE = "http://127.0.0.1:5500";
+const ANALYSIS_API_URL = `${API_BASE}/api/analysis/player-performance?async=1`;
+const POLL_INTERVAL_MS = 1000;
 
 const runBtn = document.getElementById("runModelBtn");
 const resultsContainer = document.getElementById("results");
@@ -13,6 +12,26 @@ function showMessage(msg) {
   alert(msg);
 }
 
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Poll a queued analysis job until it finishes, showing its progress
+async function waitForJob(statusUrl) {
+  while (true) {
+    const res = await fetch(`${API_BASE}${statusUrl}`);
+    const job = await res.json();
+    if (!res.ok) throw new Error(job.message || "Job lookup failed");
+
+    // a finished job carries the result's data_url and plot files
+    if (job.status === "done") return job;
+    if (job.status === "failed") throw new Error(job.error || "Model error");
+    if (job.status === "cancelled") throw new Error("Analysis was cancelled");
+
+    const pct = Math.round((job.progress || 0) * 100);
+    runBtn.innerText = `⏳ ${job.stage} (${pct}%)`;
+    await sleep(POLL_INTERVAL_MS);
+  }
+}
+
 if (runBtn && resultsContainer) {
   runBtn.addEventListener("click", async () => {
     console.log("Run button clicked");
@@ -31,7 +50,7 @@ if (runBtn && resultsContainer) {
       "<p style='text-align:center'>⏳ Running analysis... please wait...</p>";
 
     try {
-      // Run the model backend
+      // Queue the model on the backend; it answers straight away with a job id
       const res = await fetch(ANALYSIS_API_URL, {
         method: "POST",
         headers: {
@@ -44,12 +63,10 @@ if (runBtn && resultsContainer) {
 
       if (!res.ok) throw new Error(data.message || "Model error");
 
-      // Get image URLs
-      const imgRes = await fetch(IMAGES_API_URL);
-      const imgData = await imgRes.json();
-      console.log("Images:", imgData);
+      const result = await waitForJob(data.status_url);
+      console.log("Job result:", result);
 
-      const images = imgData.images || [];
+      const images = result.files || [];
       if (images.length === 0) {
         resultsContainer.innerHTML =
           "<p style='text-align:center;color:#ff6b6b'>No graphs generated.</p>";
@@ -67,7 +84,7 @@ if (runBtn && resultsContainer) {
         html += `
     <div style="background:#040814;padding:12px;border-radius:14px;
                 box-shadow:0 0 12px rgba(0,255,200,0.3);width:420px;">
-      <img src="http://127.0.0.1:5500${url}" 
+      <img src="${API_BASE}${url}" 
            style="width:100%;border-radius:10px;display:block;">
     </div>
     `;